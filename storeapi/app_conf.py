@@ -5,7 +5,7 @@
 
 from functools import lru_cache
 from pathlib import Path
-from typing import Optional
+from typing import Literal, Optional
 
 from pydantic_settings import BaseSettings
 
@@ -26,13 +26,123 @@ class BaseConfig(BaseSettings):
 class GlobalConfig(BaseConfig):
     DATABASE_URL: Optional[str] = None
     DB_FORCE_ROLL_BACK: Optional[bool] = False
+    # apply pending schema migrations in the lifespan; turn off when several
+    # workers start together and run python -m storeapi.database.migrate instead
+    DB_MIGRATE_ON_STARTUP: Optional[bool] = True
+    # connection pool, for SQLite as well as PostgreSQL (asyncpg)
+    DB_MIN_POOL_SIZE: Optional[int] = 1
+    DB_MAX_POOL_SIZE: Optional[int] = 10
+    # seconds to wait for a free connection before answering 503, 0 waits forever
+    DB_POOL_ACQUIRE_TIMEOUT: Optional[float] = 10.0
+    # seconds a statement may run, 0 disables; on SQLite it bounds waiting for a lock
+    DB_STATEMENT_TIMEOUT: Optional[float] = 30.0
+    # seconds an idle connection is kept open for reuse
+    DB_CONNECTION_LIFETIME: Optional[float] = 300.0
+    # high-throughput SQLite profile: WAL, synchronous=NORMAL, mmap and a larger
+    # page cache on every connection (busy_timeout follows DB_STATEMENT_TIMEOUT)
+    SQLITE_TUNED: Optional[bool] = True
+    SQLITE_MMAP_SIZE: Optional[int] = 256 * 1024 * 1024
+    # negative values are KiB, positive values pages
+    SQLITE_CACHE_SIZE: Optional[int] = -64 * 1024
+    # send SQLite writes (and transactions) through one serialized connection
+    SQLITE_SINGLE_WRITER: Optional[bool] = True
+    # read replicas for the read-only post routes, as a JSON list of URLs
+    DATABASE_REPLICA_URLS: Optional[list[str]] = None
+    # seconds after a write during which that client reads from the primary
+    READ_YOUR_WRITES_WINDOW: Optional[float] = 5.0
     LOG_LEVEL: Optional[str] = "INFO"
     LOG_FILE: Optional[str] = "app.log"
     DEV_LOGTAIL_API_KEY: Optional[str] = None
+    # hand log records to a background thread instead of writing them on the event loop
+    LOG_QUEUE_ENABLED: Optional[bool] = False
+    LOG_QUEUE_MAX_SIZE: Optional[int] = 10000
+    # what to do when the queue is full: "drop" the record or "block" the caller
+    LOG_QUEUE_FULL_POLICY: Literal["drop", "block"] = "drop"
+    # queries slower than this many seconds are logged with their SQL, 0 disables
+    SLOW_QUERY_THRESHOLD: Optional[float] = 0.25
+    # warn when one request runs more queries than this (a likely N+1), unset disables
+    QUERY_COUNT_WARNING: Optional[int] = None
+    # token-bucket rate limits and admission control in front of every route, off by default:
+    # clients are keyed by peer IP, so behind a reverse proxy run uvicorn with --proxy-headers
+    # (and --forwarded-allow-ips) first, or every client shares the proxy's bucket
+    RATE_LIMIT_ENABLED: Optional[bool] = False
+    # requests per second and burst, per client IP and per authenticated user; a rate of 0 disables
+    RATE_LIMIT_IP_RATE: Optional[float] = 100.0
+    RATE_LIMIT_IP_BURST: Optional[int] = 200
+    RATE_LIMIT_USER_RATE: Optional[float] = 50.0
+    RATE_LIMIT_USER_BURST: Optional[int] = 100
+    # tighter per-client limits on single routes, as JSON {"METHOD /path": [rate, burst]}
+    RATE_LIMIT_ROUTES: Optional[dict[str, tuple[float, int]]] = {
+        "POST /token": (1.0, 10),
+        "POST /register": (0.2, 5),
+        "POST /like": (10.0, 30),
+    }
+    # requests served at once by a worker before new ones get a 503, 0 disables
+    RATE_LIMIT_MAX_IN_FLIGHT: Optional[int] = 512
+    # buckets kept in memory per worker, the least recently used are evicted beyond this
+    RATE_LIMIT_MAX_BUCKETS: Optional[int] = 100_000
+    # "module:factory" returning a BucketStore shared by all workers, called with
+    # the config; unset keeps the buckets in each worker
+    RATE_LIMIT_STORE: Optional[str] = None
+    # serve Prometheus metrics on GET /metrics
+    METRICS_ENABLED: Optional[bool] = True
+    # bcrypt runs on a worker pool: "thread" or "process"
+    PASSWORD_HASH_EXECUTOR: Literal["thread", "process"] = "thread"
+    PASSWORD_HASH_WORKERS: Optional[int] = 4
+    # hashing requests allowed to wait for a worker before new ones get a 503
+    PASSWORD_HASH_MAX_QUEUE: Optional[int] = 32
+    # authenticated users cached per worker by get_current_user, 0 disables the cache
+    USER_CACHE_MAX_SIZE: Optional[int] = 1024
+    USER_CACHE_TTL: Optional[float] = 60.0
+    # serialized post read responses cached per worker, 0 disables the cache;
+    # the TTL bounds staleness for writes made through other workers
+    RESPONSE_CACHE_MAX_BYTES: Optional[int] = 32 * 1024 * 1024
+    RESPONSE_CACHE_TTL: Optional[float] = 30.0
+    # encode post and comment rows with orjson without validating them against the
+    # response models; turn off to have pydantic validate every response again
+    RESPONSE_FAST_JSON: Optional[bool] = True
+    # how get_current_user resolves access tokens that carry a uid claim:
+    # "lookup" queries users by email, "claims" trusts the signed claims,
+    # "strict" re-reads the user by primary key
+    AUTH_MODE: Literal["lookup", "claims", "strict"] = "lookup"
+    # "hot" sorting: a post scores HOT_POST_WEIGHT for being posted, plus HOT_LIKE_WEIGHT
+    # per like and HOT_COMMENT_WEIGHT per comment, each halving every HOT_HALF_LIFE seconds
+    HOT_POST_WEIGHT: Optional[float] = 1.0
+    HOT_LIKE_WEIGHT: Optional[float] = 1.0
+    HOT_COMMENT_WEIGHT: Optional[float] = 2.0
+    HOT_HALF_LIFE: Optional[float] = 12 * 3600.0
+    # seconds between rebases of the stored hot scores onto a newer epoch; 0 disables the
+    # task, and writes then rebase once the epoch is 64 half-lives old
+    HOT_REBASE_INTERVAL: Optional[float] = 24 * 3600.0
+    # home timelines: post ids kept per user; past TIMELINE_FANOUT_MAX_FOLLOWERS an
+    # author's posts are not copied to every follower but merged in when timelines are read
+    TIMELINE_MAX_LENGTH: Optional[int] = 800
+    TIMELINE_FANOUT_MAX_FOLLOWERS: Optional[int] = 10_000
+    # an author over the limit is only fanned out again once back down to this many
+    # followers, so one hovering at the limit does not switch back and forth
+    TIMELINE_FANOUT_RESUME_FOLLOWERS: Optional[int] = 9_000
+    # seconds between runs of the task that copies such an author's latest posts to
+    # their followers' timelines, TIMELINE_BACKFILL_BATCH followers per transaction, 0 disables the task
+    TIMELINE_BACKFILL_INTERVAL: Optional[float] = 5.0
+    TIMELINE_BACKFILL_BATCH: Optional[int] = 100
+    # seconds between trims of the timelines back to TIMELINE_MAX_LENGTH, 0 disables the task
+    TIMELINE_TRIM_INTERVAL: Optional[float] = 600.0
+    # live post, comment and like events over GET /events (SSE) and /events/ws:
+    # connections per worker before new ones are refused, events a subscriber may
+    # fall behind before it is dropped, and seconds between SSE keepalive comments
+    EVENTS_MAX_SUBSCRIBERS: Optional[int] = 10_000
+    EVENTS_QUEUE_SIZE: Optional[int] = 100
+    EVENTS_KEEPALIVE: Optional[float] = 15.0
+    # buffer likes in memory and write them in bulk from a background task
+    LIKE_WRITE_BEHIND: Optional[bool] = False
+    LIKE_FLUSH_SIZE: Optional[int] = 500
+    LIKE_FLUSH_INTERVAL: Optional[float] = 1.0
+    LIKE_BUFFER_MAX_SIZE: Optional[int] = 50000
 
 
 class DevConfig(GlobalConfig):
     LOG_LEVEL: Optional[str] = "DEBUG"
+    QUERY_COUNT_WARNING: Optional[int] = 10
 
     class Config:
         env_prefix = "DEV_"
@@ -47,15 +157,12 @@ class TestConfig(GlobalConfig):
     class Config:
         env_prefix = "TEST_"
 
-print(f"[DEBUG] TestConfig raw: {TestConfig().model_dump()}")
 
 @lru_cache()
 def get_config():
     env_state = BaseConfig().ENV_STATE
     configs = {"dev": DevConfig, "prod": ProdConfig, "test": TestConfig}
 
-    print(f"ENV_STATE: {env_state}")
-
     if env_state not in configs:
         raise ValueError(f"Invalid ENV_STATE: {env_state}")
     return configs[env_state]()
@@ -0,0 +1,373 @@
+"""
+HTTP load test of the register/login/post/comment/like/list flows, driven
+in-process through httpx.ASGITransport or against a real uvicorn server:
+
+    python -m storeapi.benchmarks.load_test --target asgi --concurrency 16 --requests 2000
+    python -m storeapi.benchmarks.load_test --target uvicorn --output report.json
+    python -m storeapi.benchmarks.load_test --baseline baseline.json --save-baseline
+    python -m storeapi.benchmarks.load_test --baseline baseline.json --tolerance 0.2
+
+Every run starts from an empty SQLite database, migrated by the app's own
+startup, and replays a workload drawn from --seed, so runs with the same
+options send the same mix of requests. The report has p50/p95/p99 latency and
+requests per second per operation and overall. With --baseline the run is
+compared against a saved report and exits with status 1 when a latency grows,
+or the throughput drops, by more than --tolerance.
+
+Baselines are only comparable on the machine (or CI runner) they were saved on.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from pathlib import Path
+
+import httpx
+
+from storeapi.main import app
+
+PROJECT_ROOT = Path(__file__).resolve().parents[2]
+
+# relative weights of the operations in the mixed phase
+DEFAULT_MIX = {"list": 40, "read": 20, "comment": 15, "like": 10, "post": 10, "login": 5}
+PERCENTILES = (50, 95, 99)
+PASSWORD = "load-test-password"
+
+
+def app_environment(database_url: str, env_state: str = "prod") -> dict:
+    """
+    Environment variables that point the app at the benchmark database.
+    """
+    prefix = f"{env_state.upper()}_"
+    return {
+        "ENV_STATE": env_state,
+        f"{prefix}DATABASE_URL": database_url,
+        f"{prefix}DB_MIGRATE_ON_STARTUP": "true",
+        # every request comes from one client, which the rate limits would throttle
+        f"{prefix}RATE_LIMIT_ENABLED": "false",
+        # console logging of every request would dominate the timings; set it to override
+        f"{prefix}LOG_LEVEL": os.environ.get(f"{prefix}LOG_LEVEL", "WARNING"),
+    }
+
+
+def parse_mix(text: str) -> dict[str, int]:
+    """
+    "list=40,like=10" to {"list": 40, "like": 10}.
+    """
+    mix = {}
+    for part in text.split(","):
+        name, _, weight = part.partition("=")
+        name = name.strip()
+        if name not in DEFAULT_MIX:
+            raise ValueError(f"Unknown operation in mix: {name}")
+        mix[name] = int(weight)
+    return mix
+
+
+def build_script(requests: int, users: int, mix: dict[str, int], seed: int) -> list[tuple[str, int, int]]:
+    """
+    The mixed phase as (operation, user index, pick) tuples, where pick chooses
+    the post an operation targets among those that exist when it runs.
+    """
+    rng = random.Random(seed)
+    names = [name for name, weight in mix.items() if weight > 0]
+    weights = [mix[name] for name in names]
+    return [
+        (operation, rng.randrange(users), rng.randrange(1 << 30))
+        for operation in rng.choices(names, weights=weights, k=requests)
+    ]
+
+
+def percentile(sorted_values: list[float], q: float) -> float:
+    """
+    Nearest-rank percentile of an already sorted list.
+    """
+    if not sorted_values:
+        return 0.0
+    rank = max(1, -(-len(sorted_values) * q // 100))
+    return sorted_values[int(rank) - 1]
+
+
+def summarize(latencies: list[float], errors: int, seconds: float) -> dict:
+    ordered = sorted(latencies)
+    summary = {"count": len(ordered), "errors": errors}
+    for q in PERCENTILES:
+        summary[f"p{q}_ms"] = round(percentile(ordered, q) * 1000, 3)
+    summary["requests_per_second"] = round(len(ordered) / seconds, 2) if seconds else 0.0
+    return summary
+
+
+class LoadRecorder:
+    def __init__(self):
+        self.latencies: dict[str, list[float]] = defaultdict(list)
+        self.errors: dict[str, int] = defaultdict(int)
+
+    async def send(self, client: httpx.AsyncClient, operation: str, method: str, url: str, **kwargs) -> httpx.Response:
+        start = time.perf_counter()
+        response = await client.request(method, url, **kwargs)
+        self.latencies[operation].append(time.perf_counter() - start)
+        if response.status_code >= 400:
+            self.errors[operation] += 1
+        return response
+
+
+class LoadUser:
+    def __init__(self, index: int):
+        self.email = f"load-{index}@example.net"
+        self.username = f"load-{index}"
+        self.headers: dict[str, str] = {}
+
+
+async def sign_up(client: httpx.AsyncClient, recorder: LoadRecorder, user: LoadUser) -> None:
+    response = await recorder.send(
+        client, "register", "POST", "/register",
+        json={"username": user.username, "email": user.email, "password": PASSWORD},
+    )
+    response.raise_for_status()
+    await recorder.send(client, "confirm", "GET", response.json()["confirmation_url"])
+    await log_in(client, recorder, user)
+
+
+async def log_in(client: httpx.AsyncClient, recorder: LoadRecorder, user: LoadUser) -> None:
+    response = await recorder.send(
+        client, "login", "POST", "/token", data={"username": user.email, "password": PASSWORD}
+    )
+    response.raise_for_status()
+    user.headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+async def create_post(client: httpx.AsyncClient, recorder: LoadRecorder, user: LoadUser, post_ids: list[int]) -> None:
+    response = await recorder.send(
+        client, "post", "POST", "/post", json={"body": f"Post by {user.username}"}, headers=user.headers
+    )
+    if response.status_code == 201:
+        post_ids.append(response.json()["id"])
+
+
+async def run_operation(
+    client: httpx.AsyncClient,
+    recorder: LoadRecorder,
+    users: list[LoadUser],
+    post_ids: list[int],
+    step: tuple[str, int, int],
+) -> None:
+    operation, user_index, pick = step
+    user = users[user_index]
+    post_id = post_ids[pick % len(post_ids)]
+    if operation == "list":
+        sorting = ("new", "old", "most_likes")[pick % 3]
+        await recorder.send(client, operation, "GET", "/post", params={"sorting": sorting})
+    elif operation == "read":
+        await recorder.send(client, operation, "GET", f"/post/{post_id}")
+    elif operation == "comment":
+        await recorder.send(
+            client, operation, "POST", "/comment",
+            json={"body": f"Comment by {user.username}", "post_id": post_id}, headers=user.headers,
+        )
+    elif operation == "like":
+        await recorder.send(client, operation, "POST", "/like", json={"post_id": post_id}, headers=user.headers)
+    elif operation == "post":
+        await create_post(client, recorder, user, post_ids)
+    elif operation == "login":
+        await log_in(client, recorder, user)
+
+
+async def run_workload(
+    client: httpx.AsyncClient,
+    requests: int = 1000,
+    users: int = 8,
+    concurrency: int = 16,
+    mix: dict[str, int] | None = None,
+    seed: int = 0,
+) -> dict:
+    """
+    Sign up the users (each also writes one post), then run the mixed phase
+    from concurrency workers sharing one script. Returns the report.
+    """
+    recorder = LoadRecorder()
+    load_users = [LoadUser(index) for index in range(users)]
+    post_ids: list[int] = []
+
+    # setup is timed too, but it is reported apart from the mixed phase
+    setup_start = time.perf_counter()
+    await asyncio.gather(*(sign_up(client, recorder, user) for user in load_users))
+    for user in load_users:
+        await create_post(client, recorder, user, post_ids)
+    setup_seconds = time.perf_counter() - setup_start
+    if not post_ids:
+        raise RuntimeError("No post could be created, check the server log")
+    setup = {name: summarize(recorder.latencies.pop(name), recorder.errors.pop(name, 0), setup_seconds)
+             for name in ("register", "confirm", "login", "post") if name in recorder.latencies}
+
+    script = iter(build_script(requests, users, mix or DEFAULT_MIX, seed))
+
+    async def worker() -> None:
+        # the workers share one iterator, so each step runs exactly once
+        for step in script:
+            await run_operation(client, recorder, load_users, post_ids, step)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    seconds = time.perf_counter() - start
+
+    operations = {
+        name: summarize(latencies, recorder.errors.get(name, 0), seconds)
+        for name, latencies in sorted(recorder.latencies.items())
+    }
+    overall = summarize(
+        [value for latencies in recorder.latencies.values() for value in latencies],
+        sum(recorder.errors.values()),
+        seconds,
+    )
+    return {
+        "requests": requests,
+        "users": users,
+        "concurrency": concurrency,
+        "seed": seed,
+        "seconds": round(seconds, 3),
+        "setup": setup,
+        "overall": overall,
+        "operations": operations,
+    }
+
+
+async def run_asgi(database_url: str, env_state: str, **options) -> dict:
+    os.environ.update(app_environment(database_url, env_state))
+
+    async with app.router.lifespan_context(app):
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://loadtest") as client:
+            return await run_workload(client, **options)
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+async def wait_until_serving(client: httpx.AsyncClient, server: subprocess.Popen, timeout: float = 30.0) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if server.poll() is not None:
+            raise RuntimeError(f"uvicorn exited with status {server.returncode}")
+        try:
+            if (await client.get("/")).status_code == 200:
+                return
+        except httpx.TransportError:
+            pass
+        await asyncio.sleep(0.1)
+    raise RuntimeError(f"uvicorn did not answer within {timeout}s")
+
+
+async def run_uvicorn(database_url: str, env_state: str, **options) -> dict:
+    port = free_port()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "storeapi.main:app",
+         "--host", "127.0.0.1", "--port", str(port), "--no-access-log"],
+        cwd=PROJECT_ROOT,
+        env={**os.environ, **app_environment(database_url, env_state)},
+    )
+    try:
+        limits = httpx.Limits(max_connections=options.get("concurrency", 16))
+        async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", limits=limits, timeout=60.0) as client:
+            await wait_until_serving(client, server)
+            return await run_workload(client, **options)
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+
+
+TARGETS = {"asgi": run_asgi, "uvicorn": run_uvicorn}
+
+
+async def run(target: str = "asgi", env_state: str = "prod", **options) -> dict:
+    with tempfile.TemporaryDirectory() as workdir:
+        database_url = f"sqlite:///{Path(workdir) / 'load_test.db'}"
+        report = await TARGETS[target](database_url, env_state, **options)
+    return {"target": target, **report}
+
+
+def compare(report: dict, baseline: dict, tolerance: float = 0.2) -> list[str]:
+    """
+    Regressions of report against baseline: a percentile more than tolerance
+    slower, throughput more than tolerance lower, or more failed requests.
+    """
+    regressions = []
+    sections = {"overall": (report["overall"], baseline["overall"])}
+    for name, previous in baseline.get("operations", {}).items():
+        if name in report["operations"]:
+            sections[name] = (report["operations"][name], previous)
+
+    for name, (current, previous) in sections.items():
+        for q in PERCENTILES:
+            key = f"p{q}_ms"
+            if previous[key] and current[key] > previous[key] * (1 + tolerance):
+                regressions.append(f"{name} {key}: {current[key]:.1f} > {previous[key]:.1f}")
+        rps = "requests_per_second"
+        if current[rps] < previous[rps] * (1 - tolerance):
+            regressions.append(f"{name} {rps}: {current[rps]:.1f} < {previous[rps]:.1f}")
+        if current["errors"] > previous["errors"]:
+            regressions.append(f"{name} errors: {current['errors']} > {previous['errors']}")
+    return regressions
+
+
+def print_table(report: dict) -> None:
+    print(f"{'operation':<12}{'count':>7}{'errors':>8}{'p50':>10}{'p95':>10}{'p99':>10}{'req/s':>9}")
+    for name, row in [*report["operations"].items(), ("overall", report["overall"])]:
+        print(
+            f"{name:<12}{row['count']:>7}{row['errors']:>8}{row['p50_ms']:>8.1f}ms"
+            f"{row['p95_ms']:>8.1f}ms{row['p99_ms']:>8.1f}ms{row['requests_per_second']:>9.1f}"
+        )
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--target", choices=TARGETS, default="asgi")
+    parser.add_argument("--env", dest="env_state", choices=("dev", "prod", "test"), default="prod",
+                        help="config the app runs with")
+    parser.add_argument("--requests", type=int, default=1000, help="requests in the mixed phase")
+    parser.add_argument("--users", type=int, default=8, help="users signed up before the mixed phase")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--mix", type=parse_mix, default=DEFAULT_MIX,
+                        help="operation weights, e.g. list=40,read=20,comment=15,like=10,post=10,login=5")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", type=Path, help="write the JSON report here")
+    parser.add_argument("--baseline", type=Path, help="JSON report to compare against")
+    parser.add_argument("--save-baseline", action="store_true", help="write the report to --baseline instead")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed regression, 0.2 is 20%%")
+    args = parser.parse_args(argv)
+
+    report = asyncio.run(run(
+        args.target,
+        args.env_state,
+        requests=args.requests,
+        users=args.users,
+        concurrency=args.concurrency,
+        mix=args.mix,
+        seed=args.seed,
+    ))
+    print_table(report)
+    if args.output:
+        args.output.write_text(json.dumps(report, indent=2) + "\n")
+
+    if args.baseline and args.save_baseline:
+        args.baseline.write_text(json.dumps(report, indent=2) + "\n")
+    elif args.baseline:
+        regressions = compare(report, json.loads(args.baseline.read_text()), args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
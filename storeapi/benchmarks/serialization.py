@@ -0,0 +1,97 @@
+"""
+Per-row cost of encoding post list responses, from rows fetched out of SQLite:
+
+    python -m storeapi.benchmarks.serialization --rows 1000 --repeat 20
+
+Without ENV_STATE (the repo's .env lives in storeapi/) the dev settings are used.
+
+"fastapi" validates each row against the response_model and goes through
+jsonable_encoder and json.dumps, as FastAPI does for a returned list of Records;
+"type_adapter" validates and encodes with a cached TypeAdapter, as dump_json
+does with RESPONSE_FAST_JSON off; "orjson" is the dump_json fast path.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import tempfile
+import time
+from pathlib import Path
+
+import orjson
+import sqlalchemy
+from fastapi.encoders import jsonable_encoder
+
+from storeapi.benchmarks.sqlite_concurrency import create_schema
+from storeapi.database.database import Database, post_table
+from storeapi.models.post import UserPostWithLikes
+from storeapi.responses import get_type_adapter, to_plain
+
+
+def encode_fastapi(rows: list) -> bytes:
+    models = [UserPostWithLikes.model_validate(dict(row)) for row in rows]
+    return json.dumps(jsonable_encoder(models), separators=(",", ":")).encode("utf-8")
+
+
+def encode_type_adapter(rows: list) -> bytes:
+    adapter = get_type_adapter(list[UserPostWithLikes])
+    return adapter.dump_json(adapter.validate_python(rows, from_attributes=True))
+
+
+def encode_orjson(rows: list) -> bytes:
+    return orjson.dumps([to_plain(UserPostWithLikes, row) for row in rows])
+
+
+ENCODERS = {"fastapi": encode_fastapi, "type_adapter": encode_type_adapter, "orjson": encode_orjson}
+
+
+async def fetch_rows(rows: int, workdir: Path) -> list:
+    url = f"sqlite:///{workdir / 'serialization.db'}"
+    create_schema(url, posts=rows)
+    db = Database(url, single_writer=False)
+    await db.connect()
+    try:
+        return await db.fetch_all(sqlalchemy.select(post_table))
+    finally:
+        await db.disconnect()
+
+
+def time_encoder(encode, rows: list, repeat: int) -> float:
+    """
+    Best of repeat runs, in microseconds per row.
+    """
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        encode(rows)
+        best = min(best, time.perf_counter() - start)
+    return best / len(rows) * 1_000_000
+
+
+def run(rows: int = 1000, repeat: int = 20) -> dict[str, float]:
+    with tempfile.TemporaryDirectory() as workdir:
+        records = asyncio.run(fetch_rows(rows, Path(workdir)))
+    bodies = {name: json.loads(encode(records)) for name, encode in ENCODERS.items()}
+    if any(body != bodies["fastapi"] for body in bodies.values()):
+        raise AssertionError("Encoders disagree on the response body")
+    return {name: time_encoder(encode, records, repeat) for name, encode in ENCODERS.items()}
+
+
+def main() -> None:
+    # the benchmark builds its own databases, so it only needs some environment's settings
+    os.environ.setdefault("ENV_STATE", "dev")
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    results = run(args.rows, args.repeat)
+    baseline = results["fastapi"]
+    print(f"{'encoder':<14}{'us/row':>9}{'speedup':>9}")
+    for name, cost in results.items():
+        print(f"{name:<14}{cost:>9.2f}{baseline / cost:>8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
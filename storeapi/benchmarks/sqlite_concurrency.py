@@ -0,0 +1,117 @@
+"""
+Concurrent reads and writes against a file SQLite database, with SQLite's
+defaults, with the tuned profile, and with the tuned profile plus the single
+writer connection:
+
+    python -m storeapi.benchmarks.sqlite_concurrency --writers 4 --readers 8 --ops 200
+
+Settings come from ENV_STATE as for the app. The repo's .env lives in storeapi/,
+so when run from the repo root without ENV_STATE the dev settings are used.
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import tempfile
+import time
+from pathlib import Path
+
+import sqlalchemy
+
+from storeapi.app_conf import get_config
+from storeapi.database.database import Database, metadata, post_table, user_table
+
+MODES = {
+    "default": {"SQLITE_TUNED": False, "SQLITE_SINGLE_WRITER": False},
+    "tuned": {"SQLITE_TUNED": True, "SQLITE_SINGLE_WRITER": False},
+    "tuned+writer": {"SQLITE_TUNED": True, "SQLITE_SINGLE_WRITER": True},
+}
+
+
+def create_schema(url: str, posts: int) -> None:
+    engine = sqlalchemy.create_engine(url)
+    metadata.create_all(engine)
+    with engine.begin() as conn:
+        conn.execute(user_table.insert().values(id=1, email="bench@example.net"))
+        if posts:
+            conn.execute(post_table.insert(), [{"body": f"Post {i}", "user_id": 1} for i in range(posts)])
+    engine.dispose()
+
+
+async def write(db: Database, ops: int, latencies: list[float]) -> None:
+    for i in range(ops):
+        start = time.perf_counter()
+        async with db.transaction():
+            post_id = await db.execute(post_table.insert().values(body=f"Bench {i}", user_id=1))
+            await db.execute(post_table.update().where(post_table.c.id == post_id).values(likes=post_table.c.likes + 1))
+        latencies.append(time.perf_counter() - start)
+
+
+async def read(db: Database, ops: int, latencies: list[float]) -> None:
+    query = sqlalchemy.select(post_table).order_by(post_table.c.id.desc()).limit(20)
+    for _ in range(ops):
+        start = time.perf_counter()
+        await db.fetch_all(query)
+        latencies.append(time.perf_counter() - start)
+
+
+def p95(latencies: list[float]) -> float:
+    return statistics.quantiles(latencies, n=20)[-1] if len(latencies) > 1 else sum(latencies)
+
+
+async def run_mode(mode: str, writers: int, readers: int, ops: int, workdir: Path) -> dict:
+    url = f"sqlite:///{workdir / f'{mode}.db'}"
+    create_schema(url, posts=1000)
+    config = get_config().model_copy(update=MODES[mode])
+    db = Database(url, config=config)
+    await db.connect()
+
+    write_latencies, read_latencies = [], []
+    start = time.perf_counter()
+    try:
+        await asyncio.gather(
+            *(write(db, ops, write_latencies) for _ in range(writers)),
+            *(read(db, ops, read_latencies) for _ in range(readers)),
+        )
+    finally:
+        elapsed = time.perf_counter() - start
+        await db.disconnect()
+
+    return {
+        "mode": mode,
+        "seconds": elapsed,
+        "writes_per_second": len(write_latencies) / elapsed,
+        "reads_per_second": len(read_latencies) / elapsed,
+        "write_p95_ms": p95(write_latencies) * 1000,
+        "read_p95_ms": p95(read_latencies) * 1000,
+    }
+
+
+async def run(writers: int = 4, readers: int = 8, ops: int = 200, modes=tuple(MODES)) -> list[dict]:
+    with tempfile.TemporaryDirectory() as workdir:
+        return [await run_mode(mode, writers, readers, ops, Path(workdir)) for mode in modes]
+
+
+def main() -> None:
+    # the benchmark builds its own databases, so it only needs some environment's settings
+    os.environ.setdefault("ENV_STATE", "dev")
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--writers", type=int, default=4)
+    parser.add_argument("--readers", type=int, default=8)
+    parser.add_argument("--ops", type=int, default=200, help="operations per task")
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args.writers, args.readers, args.ops))
+    baseline = results[0]["seconds"]
+    print(f"{'mode':<14}{'seconds':>9}{'writes/s':>10}{'reads/s':>10}{'write p95':>11}{'read p95':>10}{'speedup':>9}")
+    for result in results:
+        print(
+            f"{result['mode']:<14}{result['seconds']:>9.2f}{result['writes_per_second']:>10.0f}"
+            f"{result['reads_per_second']:>10.0f}{result['write_p95_ms']:>9.1f}ms{result['read_p95_ms']:>8.1f}ms"
+            f"{baseline / result['seconds']:>8.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
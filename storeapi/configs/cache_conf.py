@@ -0,0 +1,217 @@
+import time
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Any, Hashable, Iterable, NamedTuple
+
+from storeapi.app_conf import get_config
+
+_MISSING = object()
+
+
+class LRUCache:
+    """
+    Bounded in-process cache with least-recently-used eviction and a per-entry TTL.
+    Entries live only in this worker, so the TTL bounds how stale a value can get
+    when another worker changes the underlying row.
+    """
+
+    def __init__(self, max_size: int = 1024, ttl: float = 60.0, clock=time.monotonic):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.clock = clock
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict[Hashable, tuple[float, Any]] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        entry = self._entries.get(key, _MISSING)
+        if entry is _MISSING:
+            self.misses += 1
+            return default
+
+        expires_at, value = entry
+        if expires_at <= self.clock():
+            self._discard(key)
+            self.misses += 1
+            return default
+
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key: Hashable, value: Any) -> None:
+        if self.max_size <= 0:
+            return
+        self._discard(key)
+        self._entries[key] = (self.clock() + self.ttl, value)
+        while len(self._entries) > self.max_size:
+            self._discard(next(iter(self._entries)))
+
+    def invalidate(self, key: Hashable) -> None:
+        self._discard(key)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def _discard(self, key: Hashable) -> None:
+        self._entries.pop(key, None)
+
+    @property
+    def hit_ratio(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def stats(self) -> dict:
+        return {
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hit_ratio,
+        }
+
+
+class CachedResponse(NamedTuple):
+    body: bytes
+    etag: str
+    media_type: str = "application/json"
+    headers: dict | None = None
+
+
+class ResponseCache(LRUCache):
+    """
+    LRU cache of serialized responses bounded by total body size. Every entry is
+    stored under a set of tags naming the data it was built from, so writes can
+    drop exactly the responses they affect with invalidate_tags.
+
+    A response read from the database before a write but stored after the write
+    invalidated its tags would bring the old data back. Readers take the
+    generation before reading and pass it to set as `since`; invalidate_tags
+    leaves a tombstone per tag, and set skips a response whose tags were
+    invalidated after `since`. Only the newest max_tombstones are kept: a reader
+    older than the ones dropped is not cached at all.
+    """
+
+    def __init__(
+        self,
+        max_bytes: int = 32 * 1024 * 1024,
+        ttl: float = 30.0,
+        clock=time.monotonic,
+        max_tombstones: int = 10_000,
+    ):
+        super().__init__(max_size=max_bytes, ttl=ttl, clock=clock)
+        self.max_bytes = max_bytes
+        self.size_bytes = 0
+        self.max_tombstones = max_tombstones
+        self.generation = 0
+        self._tags: dict[str, set[Hashable]] = {}
+        self._entry_tags: dict[Hashable, frozenset[str]] = {}
+        # generation each tag was last invalidated in, oldest first
+        self._tombstones: dict[str, int] = {}
+        self._oldest_tombstone = 0
+
+    def set(self, key: Hashable, value: CachedResponse, tags: Iterable[str] = (), since: int | None = None) -> None:
+        if self.max_bytes <= 0 or len(value.body) > self.max_bytes:
+            return
+        tags = frozenset(tags)
+        if since is not None and self.invalidated_since(tags, since):
+            return
+        self._discard(key)
+        self._entries[key] = (self.clock() + self.ttl, value)
+        self.size_bytes += len(value.body)
+
+        self._entry_tags[key] = tags
+        for tag in tags:
+            self._tags.setdefault(tag, set()).add(key)
+
+        while self.size_bytes > self.max_bytes:
+            self._discard(next(iter(self._entries)))
+
+    def invalidated_since(self, tags: Iterable[str], generation: int) -> bool:
+        """
+        Whether any of tags may have been invalidated after generation.
+        """
+        if generation < self._oldest_tombstone:
+            return True
+        return any(self._tombstones.get(tag, 0) > generation for tag in tags)
+
+    def invalidate_tags(self, *tags: str) -> None:
+        self.generation += 1
+        for tag in tags:
+            for key in list(self._tags.get(tag, ())):
+                self._discard(key)
+            self._tombstones.pop(tag, None)
+            self._tombstones[tag] = self.generation
+        while len(self._tombstones) > self.max_tombstones:
+            tag = next(iter(self._tombstones))
+            self._oldest_tombstone = self._tombstones.pop(tag)
+
+    def clear(self) -> None:
+        super().clear()
+        self.size_bytes = 0
+        self._tags.clear()
+        self._entry_tags.clear()
+
+    def _discard(self, key: Hashable) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        self.size_bytes -= len(entry[1].body)
+        for tag in self._entry_tags.pop(key, ()):
+            keys = self._tags[tag]
+            keys.discard(key)
+            if not keys:
+                del self._tags[tag]
+
+    def stats(self) -> dict:
+        return {**super().stats(), "max_size": self.max_bytes, "size_bytes": self.size_bytes}
+
+
+# Response cache tags. A post list page is tagged with every post on it; pages whose
+# membership can change when posts are created or liked also carry a list tag.
+NEW_POSTS_TAG = "posts:new"
+POST_RANKING_TAG = "posts:ranking"
+HOT_POSTS_TAG = "posts:hot"
+
+
+def post_tag(post_id: int) -> str:
+    return f"post:{post_id}"
+
+
+def comments_tag(post_id: int) -> str:
+    return f"comments:{post_id}"
+
+
+@lru_cache()
+def get_user_cache() -> LRUCache:
+    """
+    Verified user rows keyed by email, used by get_current_user.
+    """
+    config = get_config()
+    return LRUCache(max_size=config.USER_CACHE_MAX_SIZE, ttl=config.USER_CACHE_TTL)
+
+
+@lru_cache()
+def get_response_cache() -> ResponseCache:
+    """
+    Serialized GET /post responses, invalidated by the writes that change them.
+    """
+    config = get_config()
+    return ResponseCache(max_bytes=config.RESPONSE_CACHE_MAX_BYTES, ttl=config.RESPONSE_CACHE_TTL)
+
+
+def invalidate_posts_created() -> None:
+    get_response_cache().invalidate_tags(NEW_POSTS_TAG, POST_RANKING_TAG, HOT_POSTS_TAG)
+
+
+def invalidate_posts_liked(post_ids: Iterable[int]) -> None:
+    get_response_cache().invalidate_tags(
+        POST_RANKING_TAG, HOT_POSTS_TAG, *(post_tag(post_id) for post_id in post_ids)
+    )
+
+
+def invalidate_posts_commented(post_ids: Iterable[int]) -> None:
+    get_response_cache().invalidate_tags(HOT_POSTS_TAG, *(comments_tag(post_id) for post_id in post_ids))
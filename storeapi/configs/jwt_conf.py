@@ -34,7 +34,16 @@ def confirm_token_expires() -> int:
 
 logger = logging.getLogger(__name__)
 
-def create_access_token(email: str):
+def create_access_token(
+    email: str,
+    user_id: int | None = None,
+    username: str | None = None,
+    confirmed: bool | None = None,
+):
+    """
+    When user_id is given the token also carries the user's id, username and
+    confirmation state, so get_current_user can authenticate without a lookup.
+    """
     logger.debug("Creating access token for email: %s", email, extra={"email": email})
     expire = datetime.datetime.now(datetime.UTC) + timedelta(minutes=access_token_expires())
     jwt_data = {
@@ -42,6 +51,8 @@ def create_access_token(email: str):
         "exp": expire,
         "type": "access",
     }
+    if user_id is not None:
+        jwt_data.update({"uid": user_id, "username": username, "confirmed": bool(confirmed)})
     encoded_jwt = jwt.encode(jwt_data, key=SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
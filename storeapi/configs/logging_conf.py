@@ -1,13 +1,14 @@
 import logging
 import os
+import queue
 from logging.config import dictConfig
+from logging.handlers import QueueHandler, QueueListener
 
-from storeapi.app_conf import DevConfig, get_config
+from asgi_correlation_id import CorrelationIdFilter
 
-logging_handler = ["console_handler", "rotating_file_handler"]
+from storeapi.app_conf import get_config
 
-if isinstance(get_config(), DevConfig):
-    logging_handler = ["console_handler", "rotating_file_handler"]
+logging_handler = ["console_handler", "rotating_file_handler"]
 
 
 def obfuscated(email: str, length: int = 3) -> str:
@@ -32,7 +33,104 @@ class EmailObfuscationFilter(logging.Filter):
         return True
 
 
+class BoundedQueueHandler(QueueHandler):
+    """
+    QueueHandler over a bounded queue. When the queue is full the record is
+    either dropped and counted, or the caller blocks until the listener catches up.
+    """
+
+    def __init__(self, log_queue: queue.Queue, policy: str = "drop"):
+        super().__init__(log_queue)
+        if policy not in ("drop", "block"):
+            raise ValueError(f"Invalid log queue policy: {policy}")
+        self.policy = policy
+        self.dropped = 0
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        if self.policy == "block":
+            self.queue.put(record)
+            return
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class PrefilteredQueueListener(QueueListener):
+    """
+    QueueListener that hands records to its handlers without running their filters.
+    The queue handler already ran them on the logging thread; on the listener
+    thread the correlation id contextvar is unset, so running them again would
+    blank it.
+    """
+
+    def handle(self, record: logging.LogRecord) -> None:
+        for handler in self.handlers:
+            if record.levelno >= handler.level:
+                handler.acquire()
+                try:
+                    handler.emit(record)
+                finally:
+                    handler.release()
+
+
+_queue_handler: BoundedQueueHandler | None = None
+_queue_listener: QueueListener | None = None
+# the handlers each logger had before the queue was installed
+_direct_handlers: dict[str, list[logging.Handler]] = {}
+
+
+def log_records_dropped() -> int:
+    return _queue_handler.dropped if _queue_handler is not None else 0
+
+
+def _install_log_queue(logger_names: list[str], max_size: int, policy: str) -> None:
+    """
+    Move every handler of the given loggers behind a single BoundedQueueHandler
+    and start a QueueListener thread that feeds them.
+    """
+    global _queue_handler, _queue_listener
+
+    handlers = []
+    for name in logger_names:
+        _direct_handlers[name] = logging.getLogger(name).handlers
+        for handler in _direct_handlers[name]:
+            if handler not in handlers:
+                handlers.append(handler)
+
+    log_queue = queue.Queue(maxsize=max_size)
+    _queue_handler = BoundedQueueHandler(log_queue, policy)
+    # Filters read the correlation id from a contextvar, so they must run on the
+    # logging thread, not on the listener thread where the contextvar is unset.
+    _queue_handler.addFilter(CorrelationIdFilter(uuid_length=32))
+    _queue_handler.addFilter(EmailObfuscationFilter(length=3))
+
+    for name in logger_names:
+        logging.getLogger(name).handlers = [_queue_handler]
+
+    _queue_listener = PrefilteredQueueListener(log_queue, *handlers, respect_handler_level=True)
+    _queue_listener.start()
+
+
+def shutdown_logging() -> None:
+    """
+    Put the loggers' own handlers back, so records logged from here on are
+    written directly, then stop the queue listener once it has written every
+    queued record. Left on the queue, they would be lost, or with the "block"
+    policy hang the process on a full queue nobody drains.
+    """
+    global _queue_listener
+    for name, handlers in _direct_handlers.items():
+        logging.getLogger(name).handlers = handlers
+    _direct_handlers.clear()
+    if _queue_listener is not None:
+        _queue_listener.stop()
+        _queue_listener = None
+
+
 def configure_logging() -> None:
+    shutdown_logging()
+
     current_dir = os.path.dirname(__file__)
 
     # Ensure the logs directory exists relative to the current file
@@ -109,3 +207,11 @@ def configure_logging() -> None:
             },
         }
     )
+
+    config = get_config()
+    if config.LOG_QUEUE_ENABLED:
+        _install_log_queue(
+            ["uvicorn", "storeapi", "databases", "aiosqlite"],
+            max_size=config.LOG_QUEUE_MAX_SIZE,
+            policy=config.LOG_QUEUE_FULL_POLICY,
+        )
@@ -1,10 +1,16 @@
+import asyncio
 import logging
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from functools import lru_cache
 from typing import Annotated, Literal
 
 from fastapi import Depends, HTTPException, status
 from jose import ExpiredSignatureError, JWTError, jwt
 from passlib.context import CryptContext
 
+from storeapi.app_conf import get_config
+from storeapi.configs.cache_conf import get_user_cache
 from storeapi.configs.jwt_conf import (
     ALGORITHM,
     SECRET_KEY,
@@ -12,6 +18,7 @@ from storeapi.configs.jwt_conf import (
     create_credentials_exception,
 )
 from storeapi.database.database import database, user_table
+from storeapi.metrics import password_hash_duration
 from storeapi.models.user import User
 
 logger = logging.getLogger(__name__)
@@ -25,6 +32,74 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
     return pwd_context.verify(plain_password, hashed_password)
 
 
+class PasswordHasher:
+    """
+    Runs bcrypt on a bounded worker pool so hashing never blocks the event loop.
+    At most `workers + max_queue` calls may be in flight; beyond that callers get
+    a 503 straight away instead of queueing behind a login storm.
+    """
+
+    def __init__(self, executor: str = "thread", workers: int = 4, max_queue: int = 32):
+        if executor not in ("thread", "process"):
+            raise ValueError(f"Invalid password hash executor: {executor}")
+        self.executor_type = executor
+        self.workers = workers
+        self.max_pending = workers + max_queue
+        self.pending = 0
+        self.rejected = 0
+        self._executor: Executor | None = None
+
+    def _get_executor(self) -> Executor:
+        if self._executor is None:
+            if self.executor_type == "process":
+                self._executor = ProcessPoolExecutor(max_workers=self.workers)
+            else:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="bcrypt")
+        return self._executor
+
+    async def run(self, func, *args):
+        if self.pending >= self.max_pending:
+            self.rejected += 1
+            logger.warning("Password hashing queue is full, rejecting request")
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Server is busy, please retry",
+                headers={"Retry-After": "1"},
+            )
+
+        self.pending += 1
+        start = time.perf_counter()
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._get_executor(), func, *args)
+        finally:
+            self.pending -= 1
+            password_hash_duration.observe(func.__name__, value=time.perf_counter() - start)
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+
+@lru_cache()
+def get_password_hasher() -> PasswordHasher:
+    config = get_config()
+    return PasswordHasher(
+        executor=config.PASSWORD_HASH_EXECUTOR,
+        workers=config.PASSWORD_HASH_WORKERS,
+        max_queue=config.PASSWORD_HASH_MAX_QUEUE,
+    )
+
+
+async def get_password_hash_async(password: str) -> str:
+    return await get_password_hasher().run(get_password_hash, password)
+
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    return await get_password_hasher().run(verify_password, plain_password, hashed_password)
+
+
 
 async def get_user(email: str) -> User | None:
     logger.debug("Fetching user with email: %s", email, extra={"email": email})
@@ -44,25 +119,55 @@ async def authenticate_user(email: str, password: str):
     user = await get_user(email)
     if not user:
         raise create_credentials_exception("Invalid email or password")
-    if not verify_password(password, user["password"]):
+    if not await verify_password_async(password, user["password"]):
         raise create_credentials_exception("Invalid email or password")
     if not user.confirmed:
         raise create_credentials_exception("User is not confirmed")
     return user
 
 
+async def get_user_by_id(user_id: int) -> User | None:
+    logger.debug("Fetching user with id: %s", user_id)
+
+    query = user_table.select().where(user_table.c.id == user_id)
+    return await database.fetch_one(query)
+
+
 async def get_current_user(token: Annotated[str, Depends(oauth2_scheme)]):
     logger.debug("Getting current user from token: %s", token)
 
-    email = await get_subject_for_token_type(token, "access")
+    payload = decode_token(token, "access")
+    email = payload["sub"]
+
+    # tokens issued before the uid claim existed always take the email lookup
+    auth_mode = get_config().AUTH_MODE
+    if "uid" in payload and auth_mode == "claims":
+        return User(
+            id=payload["uid"],
+            username=payload.get("username") or "",
+            email=email,
+            confirmed=payload.get("confirmed", False),
+        )
+
+    if "uid" in payload and auth_mode == "strict":
+        user = await get_user_by_id(payload["uid"])
+        if user is None or user.email != email:
+            raise create_credentials_exception("could not find user for this token")
+        return user
+
+    user_cache = get_user_cache()
+    user = user_cache.get(email)
+    if user is not None:
+        return user
 
     user = await get_user(email=email)
     if user is None:
         raise create_credentials_exception("could not find user for this token")
+    user_cache.set(email, user)
     return user
 
 
-async def get_subject_for_token_type(token: str, type: Literal["access", "confirmation"] = "access") -> str:
+def decode_token(token: str, type: Literal["access", "confirmation"] = "access") -> dict:
     try:
         payload = jwt.decode(token, key=SECRET_KEY, algorithms=[ALGORITHM])
 
@@ -82,4 +187,8 @@ async def get_subject_for_token_type(token: str, type: Literal["access", "confir
     if token_type is None or token_type != type:
         raise create_credentials_exception(f"Token is not of type '{type}'")
 
-    return email
\ No newline at end of file
+    return payload
+
+
+async def get_subject_for_token_type(token: str, type: Literal["access", "confirmation"] = "access") -> str:
+    return decode_token(token, type)["sub"]
@@ -0,0 +1,55 @@
+import logging
+from collections import Counter
+from typing import Iterable
+
+import sqlalchemy
+
+from storeapi.app_conf import get_config
+from storeapi.database.database import database, post_table
+from storeapi.database.hot import hot_weight
+
+logger = logging.getLogger(__name__)
+
+
+async def find_existing_post_ids(post_ids: Iterable[int]) -> set[int]:
+    """
+    Check which of the given posts exist with a single set-based query.
+    """
+    post_ids = set(post_ids)
+    if not post_ids:
+        return set()
+
+    query = sqlalchemy.select(post_table.c.id).where(post_table.c.id.in_(post_ids))
+    return {row["id"] for row in await database.fetch_all(query)}
+
+
+async def bulk_insert(table: sqlalchemy.Table, rows: list[dict]) -> list[int]:
+    """
+    Insert rows with one multi-row INSERT and return their ids in the order of rows.
+    Ids come from the table's sequence and only grow within a statement, so
+    sorting the RETURNING ids lines them up with the VALUES order.
+    """
+    if not rows:
+        return []
+
+    query = table.insert().values(rows).returning(table.c.id)
+    logger.debug("Bulk inserting %s rows into %s", len(rows), table.name)
+    return sorted(row["id"] for row in await database.fetch_all(query))
+
+
+async def increment_like_counts(likes_per_post: Counter) -> None:
+    """
+    Add the given number of likes to each post's counter, and their weight to its
+    hot score, in a single UPDATE. Call it in the transaction that inserts the likes.
+    """
+    if not likes_per_post:
+        return
+
+    added = sqlalchemy.case(dict(likes_per_post), value=post_table.c.id, else_=0)
+    like_weight = await hot_weight(get_config().HOT_LIKE_WEIGHT)
+    query = (
+        post_table.update()
+        .where(post_table.c.id.in_(likes_per_post.keys()))
+        .values(likes=post_table.c.likes + added, hot_score=post_table.c.hot_score + added * like_weight)
+    )
+    await database.execute(query)
@@ -1,8 +1,13 @@
+import time
+from contextvars import ContextVar
+from typing import Any, AsyncIterator, Awaitable
+
 import databases
 import sqlalchemy
-from sympy import false
 
 from storeapi.app_conf import get_config
+from storeapi.database.query_log import record_query
+from storeapi.metrics import db_query_duration, query_kind
 
 metadata = sqlalchemy.MetaData()
 
@@ -13,6 +18,25 @@ post_table = sqlalchemy.Table(
     sqlalchemy.Column("id", sqlalchemy.Integer, primary_key=True),
     sqlalchemy.Column("body", sqlalchemy.String),
     sqlalchemy.Column("user_id", sqlalchemy.Integer, sqlalchemy.ForeignKey("users.id"), nullable=False),
+    # denormalized count of rows in likes, maintained by like_post and fixed by reconcile
+    sqlalchemy.Column("likes", sqlalchemy.Integer, nullable=False, server_default="0"),
+    # time-decayed score for hot ordering, relative to hot_epoch, see storeapi/database/hot.py
+    sqlalchemy.Column("hot_score", sqlalchemy.Float, nullable=False, server_default="0"),
+)
+
+# serves most_likes ordering (likes desc, id desc) by scanning the index backwards
+sqlalchemy.Index("ix_posts_likes_id", post_table.c.likes, post_table.c.id)
+# and hot ordering (hot_score desc, id desc) the same way
+sqlalchemy.Index("ix_posts_hot_score_id", post_table.c.hot_score, post_table.c.id)
+# an author's posts newest first, for fan-out on read and backfilling a new follower's timeline
+sqlalchemy.Index("ix_posts_user_id_id", post_table.c.user_id, post_table.c.id)
+
+# the single row holding the time the stored hot scores are relative to
+hot_epoch_table = sqlalchemy.Table(
+    "hot_epoch",
+    metadata,
+    sqlalchemy.Column("id", sqlalchemy.Integer, primary_key=True),
+    sqlalchemy.Column("epoch", sqlalchemy.Float, nullable=False),
 )
 
 comment_table = sqlalchemy.Table(
@@ -21,7 +45,7 @@ comment_table = sqlalchemy.Table(
     sqlalchemy.Column("id", sqlalchemy.Integer, primary_key=True),
     sqlalchemy.Column("body", sqlalchemy.String),
     sqlalchemy.Column(
-        "post_id", sqlalchemy.Integer, sqlalchemy.ForeignKey("posts.id"), nullable=False
+        "post_id", sqlalchemy.Integer, sqlalchemy.ForeignKey("posts.id"), nullable=False, index=True
     ),
     sqlalchemy.Column(
         "user_id", sqlalchemy.Integer, sqlalchemy.ForeignKey("users.id"), nullable=False
@@ -33,10 +57,10 @@ like_table = sqlalchemy.Table(
     metadata,
     sqlalchemy.Column("id", sqlalchemy.Integer, primary_key=True),
     sqlalchemy.Column(
-        "post_id", sqlalchemy.Integer, sqlalchemy.ForeignKey("posts.id"), nullable=False
+        "post_id", sqlalchemy.Integer, sqlalchemy.ForeignKey("posts.id"), nullable=False, index=True
     ),
     sqlalchemy.Column(
-        "user_id", sqlalchemy.Integer, sqlalchemy.ForeignKey("users.id"), nullable=False
+        "user_id", sqlalchemy.Integer, sqlalchemy.ForeignKey("users.id"), nullable=False, index=True
     ),
 )
 
@@ -48,26 +72,187 @@ user_table = sqlalchemy.Table(
     sqlalchemy.Column("username", sqlalchemy.String, unique=True),
     sqlalchemy.Column("email", sqlalchemy.String, unique=True),
     sqlalchemy.Column("password", sqlalchemy.String),
-    sqlalchemy.Column("confirmed", sqlalchemy.Boolean, default=false),
+    sqlalchemy.Column("confirmed", sqlalchemy.Boolean, default=False),
+    # denormalized count of rows in follows naming the user as followee, maintained by follow/unfollow
+    sqlalchemy.Column("followers", sqlalchemy.Integer, nullable=False, server_default="0"),
+    # whether the user's new posts are copied to their followers' timelines, see storeapi/database/timelines.py
+    sqlalchemy.Column("fans_out", sqlalchemy.Boolean, nullable=False, server_default=sqlalchemy.true()),
+)
+
+# finds the few authors with more followers than fan-out on write serves
+sqlalchemy.Index("ix_users_followers", user_table.c.followers)
+
+follow_table = sqlalchemy.Table(
+    "follows",
+    metadata,
+    sqlalchemy.Column("follower_id", sqlalchemy.Integer, sqlalchemy.ForeignKey("users.id"), primary_key=True),
+    sqlalchemy.Column("followee_id", sqlalchemy.Integer, sqlalchemy.ForeignKey("users.id"), primary_key=True),
+    sqlite_with_rowid=False,
 )
 
+# the followers of an author, for fanning out their posts
+sqlalchemy.Index("ix_follows_followee_id_follower_id", follow_table.c.followee_id, follow_table.c.follower_id)
 
+# precomputed home timelines: the ids of the posts each user sees, written when a
+# post is created, so a page is one range scan of the primary key
+timeline_table = sqlalchemy.Table(
+    "timelines",
+    metadata,
+    sqlalchemy.Column("user_id", sqlalchemy.Integer, sqlalchemy.ForeignKey("users.id"), primary_key=True),
+    sqlalchemy.Column("post_id", sqlalchemy.Integer, sqlalchemy.ForeignKey("posts.id"), primary_key=True),
+    sqlite_with_rowid=False,
+)
 
+# authors whose posts are fanned out again after they dropped under the fan-out limit,
+# with the follower their older posts were copied up to
+timeline_backfill_table = sqlalchemy.Table(
+    "timeline_backfills",
+    metadata,
+    sqlalchemy.Column("followee_id", sqlalchemy.Integer, sqlalchemy.ForeignKey("users.id"), primary_key=True),
+    sqlalchemy.Column("last_follower_id", sqlalchemy.Integer, nullable=False, server_default="0"),
+)
 
+# the schema is created and evolved by the migrations in storeapi/database/migrations,
+# see storeapi/database/migrate.py; keep these tables in step with them
 
-print(f"haha--{get_config().DATABASE_URL}" )
 
-print("ENV_STATE:--", get_config().ENV_STATE)
+# set while a task runs a transaction on the writer connection
+_writing: ContextVar[bool] = ContextVar("writing", default=False)
 
-engine = sqlalchemy.create_engine(
-    get_config().DATABASE_URL,
-    connect_args=(
-        {"check_same_thread": False} if "sqlite" in get_config().DATABASE_URL else {}
-    ),
-)
 
-metadata.create_all(engine)
+class Database:
+    """
+    Stand-in for databases.Database that is only built from the config when the
+    app first connects (or uses it), so importing this module opens nothing.
+
+    With SQLITE_SINGLE_WRITER, writes and transactions go to a separate
+    one-connection pool, so concurrent writers queue in-process instead of
+    contending for SQLite's write lock, while reads use the regular pool.
+    """
+
+    def __init__(self, url: str | None = None, single_writer: bool = True, config=None):
+        self._url = url
+        self._single_writer = single_writer
+        self._config = config
+        self._database: databases.Database | None = None
+        self._writer: databases.Database | None = None
+
+    def bind(self, url: str | None = None) -> databases.Database:
+        if self._database is None:
+            from storeapi.database.pool import create_database
+            from storeapi.database.sqlite_profile import is_sqlite
+
+            config = self._config or get_config()
+            url = url or self._url or config.DATABASE_URL
+            self._database = create_database(url, config)
+            if self._single_writer and config.SQLITE_SINGLE_WRITER and is_sqlite(url):
+                self._writer = create_database(url, config, max_size=1)
+        return self._database
+
+    def _reader(self) -> databases.Database:
+        database = self.bind()
+        return self._writer if self._writer is not None and _writing.get() else database
+
+    def _writer_or_database(self) -> databases.Database:
+        database = self.bind()
+        return self._writer if self._writer is not None else database
+
+    def pool_stats(self) -> dict:
+        from storeapi.database.pool import pool_stats
+
+        stats = pool_stats(self.bind())
+        if self._writer is not None:
+            stats["writer"] = pool_stats(self._writer)
+        return stats
+
+    @property
+    def is_connected(self) -> bool:
+        return self._database is not None and self._database.is_connected
+
+    async def connect(self) -> None:
+        await self.bind().connect()
+        if self._writer is not None:
+            await self._writer.connect()
+
+    async def disconnect(self) -> None:
+        if self._writer is not None:
+            await self._writer.disconnect()
+        if self._database is not None:
+            await self._database.disconnect()
+
+    async def _timed(self, query, call: Awaitable, values: dict | None = None) -> Any:
+        """
+        Await a database call, recording its time in the metrics and against the current request.
+        """
+        start = time.perf_counter()
+        try:
+            return await call
+        finally:
+            elapsed = time.perf_counter() - start
+            db_query_duration.observe(query_kind(query), value=elapsed)
+            record_query(query, elapsed, values)
+
+    async def fetch_all(self, query, values: dict | None = None) -> list:
+        return await self._timed(query, self._reader().fetch_all(query, values), values)
+
+    async def fetch_one(self, query, values: dict | None = None):
+        return await self._timed(query, self._reader().fetch_one(query, values), values)
+
+    async def fetch_val(self, query, values: dict | None = None, column: Any = 0) -> Any:
+        return await self._timed(query, self._reader().fetch_val(query, values, column=column), values)
+
+    async def iterate(self, query, values: dict | None = None) -> AsyncIterator:
+        # counted, but not timed: a stream's duration is set by the client reading it
+        record_query(query, 0.0, values)
+        async for row in self._reader().iterate(query, values):
+            yield row
+
+    def connection(self) -> databases.core.Connection:
+        return self._reader().connection()
+
+    async def execute(self, query, values: dict | None = None) -> Any:
+        return await self._timed(query, self._writer_or_database().execute(query, values), values)
+
+    async def execute_many(self, query, values: list) -> None:
+        return await self._timed(query, self._writer_or_database().execute_many(query, values))
+
+    def transaction(self, **kwargs) -> "Transaction":
+        return Transaction(self._writer_or_database(), with_writer=self._writer is not None, **kwargs)
+
+    def __getattr__(self, name: str):
+        return getattr(self.bind(), name)
+
+
+class Transaction:
+    """
+    databases transaction that, on the writer, also sends the task's reads to the
+    writer connection until it ends, so they see the transaction's own writes.
+    """
+
+    def __init__(self, database: databases.Database, with_writer: bool = False, **kwargs):
+        self._transaction = database.transaction(**kwargs)
+        self._with_writer = with_writer
+        self._token = None
+
+    async def __aenter__(self):
+        if self._with_writer:
+            self._token = _writing.set(True)
+        try:
+            return await self._transaction.__aenter__()
+        except BaseException:
+            self._reset()
+            raise
+
+    async def __aexit__(self, *exc_info) -> None:
+        try:
+            await self._transaction.__aexit__(*exc_info)
+        finally:
+            self._reset()
 
+    def _reset(self) -> None:
+        if self._token is not None:
+            _writing.reset(self._token)
+            self._token = None
 
 
-database = databases.Database(get_config().DATABASE_URL)
+database = Database()
@@ -0,0 +1,160 @@
+"""
+Time-decayed "hot" scores for posts.
+
+A post's hot score is the sum of HOT_POST_WEIGHT for being posted, HOT_LIKE_WEIGHT
+per like and HOT_COMMENT_WEIGHT per comment, each worth half as much for every
+HOT_HALF_LIFE seconds since it happened.
+
+posts.hot_score stores that sum with every term scaled by 2^((t - epoch) / half_life)
+instead, t being when it happened. That is the decayed score times a factor that
+only depends on the current time, the same for every post, so ordering by the
+column orders by the decayed score. A like or comment then only adds its own term
+to one row: nothing is re-aggregated and nothing decays on a schedule. The stored
+values grow over time, so the background task moves them to a newer epoch every
+HOT_REBASE_INTERVAL with a single UPDATE. Without it (HOT_REBASE_INTERVAL=0) the
+first write after the epoch is MAX_EXPONENT half-lives old does that itself,
+before the scale factor can overflow a float.
+"""
+
+import asyncio
+import logging
+import time
+from collections import Counter
+from functools import lru_cache
+
+import sqlalchemy
+
+from storeapi.app_conf import get_config
+from storeapi.database.database import Database, database, hot_epoch_table, post_table
+
+logger = logging.getLogger(__name__)
+
+# half-lives after which a write rebases the scores itself; a term is then scaled by
+# at most 2^64, far below float overflow (2^1024) even summed over billions of likes
+MAX_EXPONENT = 64.0
+
+
+def select_epoch(lock: str | None = None):
+    """
+    The epoch, locked "share" or "update" on PostgreSQL (SQLite serializes writers anyway).
+    A writer holds the row shared, so a rebase cannot commit between it reading
+    the epoch and adding a term scaled to it.
+    """
+    query = sqlalchemy.select(hot_epoch_table.c.epoch).where(hot_epoch_table.c.id == 1)
+    if lock is not None:
+        query = query.with_for_update(read=lock == "share")
+    return query
+
+
+async def current_epoch(db: Database = database, lock: str | None = None) -> float | None:
+    return await db.fetch_val(select_epoch(lock))
+
+
+def scale(since: float, until: float, half_life: float | None = None) -> float:
+    """
+    Factor that moves a value stored relative to epoch since to epoch until.
+    """
+    return 2.0 ** ((since - until) / (half_life or get_config().HOT_HALF_LIFE))
+
+
+async def hot_weight(weight: float, now: float | None = None) -> float:
+    """
+    weight, for something happening now, as a term of the stored hot scores.
+    Call it in the transaction that writes the term.
+    """
+    now = now or time.time()
+    epoch = await current_epoch(lock="share")
+    if epoch is None:
+        # a schema that was not built by the migrations has no epoch; score in the present
+        return weight
+    if (now - epoch) / get_config().HOT_HALF_LIFE > MAX_EXPONENT:
+        await rebase_hot_scores(min_age=MAX_EXPONENT * get_config().HOT_HALF_LIFE, now=now)
+        # the rebase holds the epoch row until this transaction ends, so this read is the one it left
+        epoch = await current_epoch()
+    return weight * scale(now, epoch)
+
+
+async def add_hot_scores(weights: Counter, per_item: float) -> None:
+    """
+    Add per_item for every count in weights ({post_id: count}) to those posts' hot scores.
+    """
+    if not weights:
+        return
+    unit = await hot_weight(per_item)
+    await database.execute(
+        post_table.update()
+        .where(post_table.c.id.in_(weights.keys()))
+        .values(hot_score=post_table.c.hot_score + sqlalchemy.case(dict(weights), value=post_table.c.id, else_=0) * unit)
+    )
+
+
+async def add_comment_scores(comments_per_post: Counter) -> None:
+    await add_hot_scores(comments_per_post, get_config().HOT_COMMENT_WEIGHT)
+
+
+def rescale_cursor(cursor: dict, epoch: float | None) -> float:
+    """
+    The hot score in a page cursor, moved to epoch if scores were rebased since the cursor was made.
+    """
+    if epoch is None or cursor["epoch"] == epoch:
+        return cursor["score"]
+    return cursor["score"] * scale(cursor["epoch"], epoch)
+
+
+async def rebase_hot_scores(min_age: float = 0.0, now: float | None = None) -> bool:
+    """
+    Move every stored hot score to a new epoch, now, unless the current one is
+    younger than min_age seconds. Returns whether it rebased; with several workers
+    the first one to get there does it and the rest find a fresh epoch.
+    """
+    now = now or time.time()
+    async with database.transaction():
+        epoch = await current_epoch(lock="update")
+        if epoch is None or now - epoch < min_age:
+            return False
+        await database.execute(
+            post_table.update()
+            .where(post_table.c.hot_score != 0)
+            .values(hot_score=post_table.c.hot_score * scale(epoch, now))
+        )
+        await database.execute(hot_epoch_table.update().where(hot_epoch_table.c.id == 1).values(epoch=now))
+    logger.info("Rebased hot scores from epoch %s to %s", epoch, now)
+    return True
+
+
+class HotScoreRebaser:
+    """
+    Background task owned by the lifespan that rebases the hot scores once their
+    epoch is interval seconds old.
+    """
+
+    def __init__(self, interval: float = 86400.0):
+        self.interval = interval
+        self._task: asyncio.Task | None = None
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await rebase_hot_scores(min_age=self.interval)
+            except Exception:
+                logger.exception("Failed to rebase hot scores")
+            # checking often keeps the epoch at most a tenth of an interval late
+            await asyncio.sleep(self.interval / 10)
+
+    def start(self) -> None:
+        if self._task is None and self.interval:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+@lru_cache()
+def get_hot_score_rebaser() -> HotScoreRebaser:
+    return HotScoreRebaser(interval=get_config().HOT_REBASE_INTERVAL)
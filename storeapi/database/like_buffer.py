@@ -0,0 +1,118 @@
+import asyncio
+import logging
+from collections import Counter
+from functools import lru_cache
+
+from storeapi.app_conf import get_config
+from storeapi.configs.cache_conf import invalidate_posts_liked
+from storeapi.database.bulk import find_existing_post_ids, increment_like_counts
+from storeapi.database.database import database, like_table
+from storeapi.events import publish_likes
+
+logger = logging.getLogger(__name__)
+
+
+class LikeBuffer:
+    """
+    Write-behind buffer for likes. like_post appends to it and a background task
+    owned by the lifespan flushes it when it reaches flush_size rows or every
+    flush_interval seconds: one set-based post check, one multi-row INSERT and
+    one counter UPDATE, all in the same transaction.
+    """
+
+    def __init__(self, flush_size: int = 500, flush_interval: float = 1.0, max_size: int = 50000):
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval
+        self.max_size = max_size
+        self.flushed = 0
+        self.discarded = 0
+        self._pending: list[dict] = []
+        self._wakeup: asyncio.Event | None = None
+        self._task: asyncio.Task | None = None
+
+    def __len__(self) -> int:
+        return len(self._pending)
+
+    def add(self, post_id: int, user_id: int) -> bool:
+        """
+        Queue a like, returning False when the buffer is full and the like was not accepted.
+        """
+        if len(self._pending) >= self.max_size:
+            return False
+        self._pending.append({"post_id": post_id, "user_id": user_id})
+        if len(self._pending) >= self.flush_size and self._wakeup is not None:
+            self._wakeup.set()
+        return True
+
+    async def flush(self) -> int:
+        """
+        Write every buffered like and return how many were stored. Likes on posts
+        that no longer exist are discarded.
+        """
+        batch, self._pending = self._pending, []
+        if not batch:
+            return 0
+
+        try:
+            async with database.transaction():
+                existing = await find_existing_post_ids(like["post_id"] for like in batch)
+                rows = [like for like in batch if like["post_id"] in existing]
+                likes_per_post = Counter(like["post_id"] for like in rows)
+                if rows:
+                    await database.execute(like_table.insert().values(rows))
+                    await increment_like_counts(likes_per_post)
+        except BaseException:
+            # keep the likes for the next flush (or the final drain on shutdown) rather than losing them
+            self._pending = batch + self._pending
+            raise
+
+        invalidate_posts_liked(likes_per_post)
+        publish_likes(likes_per_post)
+        self.flushed += len(rows)
+        self.discarded += len(batch) - len(rows)
+        logger.debug("Flushed %s buffered likes", len(rows))
+        return len(rows)
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+
+            try:
+                await self.flush()
+            except Exception:
+                logger.exception("Failed to flush %s buffered likes", len(self._pending))
+
+    def start(self) -> None:
+        if self._task is None:
+            self._wakeup = asyncio.Event()
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """
+        Stop the flush task and drain whatever is still buffered.
+        """
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+
+    def clear(self) -> None:
+        self._pending.clear()
+
+
+@lru_cache()
+def get_like_buffer() -> LikeBuffer:
+    config = get_config()
+    return LikeBuffer(
+        flush_size=config.LIKE_FLUSH_SIZE,
+        flush_interval=config.LIKE_FLUSH_INTERVAL,
+        max_size=config.LIKE_BUFFER_MAX_SIZE,
+    )
@@ -0,0 +1,43 @@
+import logging
+from typing import Iterable
+
+from storeapi.database.database import Database, comment_table, database
+
+logger = logging.getLogger(__name__)
+
+
+def select_comments_for_posts(post_ids: Iterable[int]):
+    return (
+        comment_table.select()
+        .where(comment_table.c.post_id.in_(post_ids))
+        .order_by(comment_table.c.post_id, comment_table.c.id)
+    )
+
+
+class CommentLoader:
+    """
+    DataLoader-style loader for comments. Comments for any number of posts are
+    fetched with one post_id IN (...) query and grouped by post in memory; posts
+    already loaded by this loader are not fetched again.
+    """
+
+    def __init__(self, db: Database = database):
+        self._db = db
+        self._comments: dict[int, list] = {}
+
+    async def load_many(self, post_ids: Iterable[int]) -> list[list]:
+        post_ids = list(post_ids)
+        missing = [post_id for post_id in dict.fromkeys(post_ids) if post_id not in self._comments]
+
+        if missing:
+            query = select_comments_for_posts(missing)
+            logger.debug("Loading comments for %s posts", len(missing))
+            for post_id in missing:
+                self._comments[post_id] = []
+            for comment in await self._db.fetch_all(query):
+                self._comments[comment["post_id"]].append(comment)
+
+        return [self._comments[post_id] for post_id in post_ids]
+
+    async def load(self, post_id: int) -> list:
+        return (await self.load_many([post_id]))[0]
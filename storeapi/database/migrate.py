@@ -0,0 +1,48 @@
+"""
+Apply the schema migrations in storeapi/database/migrations.
+
+The app runs them on startup unless DB_MIGRATE_ON_STARTUP is off; deployments
+running several workers should turn that off and migrate once before starting:
+
+    python -m storeapi.database.migrate [revision]
+"""
+
+import logging
+import sys
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+from storeapi.app_conf import get_config
+
+if TYPE_CHECKING:
+    from alembic.config import Config
+
+logger = logging.getLogger(__name__)
+
+MIGRATIONS_DIR = Path(__file__).resolve().parent / "migrations"
+
+
+def get_alembic_config(url: str | None = None) -> "Config":
+    """
+    Alembic config for the app database, or for url when given. It is built
+    without alembic.ini so running migrations leaves the app's logging alone.
+    """
+    # alembic is imported on first use to keep it off the app's import path
+    from alembic.config import Config
+
+    config = Config()
+    config.set_main_option("script_location", str(MIGRATIONS_DIR))
+    # configparser treats % as interpolation, and database passwords may contain it
+    config.set_main_option("sqlalchemy.url", (url or get_config().DATABASE_URL).replace("%", "%%"))
+    return config
+
+
+def upgrade(url: str | None = None, revision: str = "head") -> None:
+    from alembic import command
+
+    logger.info("Migrating database schema to %s", revision)
+    command.upgrade(get_alembic_config(url), revision)
+
+
+if __name__ == "__main__":
+    upgrade(revision=sys.argv[1] if len(sys.argv) > 1 else "head")
@@ -0,0 +1,57 @@
+from logging.config import fileConfig
+
+from alembic import context
+from sqlalchemy import engine_from_config, pool
+
+from storeapi.app_conf import get_config
+from storeapi.database.database import metadata
+from storeapi.database.sqlite_profile import sqlite_connect_args
+
+config = context.config
+
+# only the alembic CLI loads alembic.ini; the app keeps its own logging setup
+if config.config_file_name is not None:
+    fileConfig(config.config_file_name, disable_existing_loggers=False)
+
+if not config.get_main_option("sqlalchemy.url"):
+    config.set_main_option("sqlalchemy.url", get_config().DATABASE_URL)
+
+target_metadata = metadata
+
+
+def run_migrations_offline() -> None:
+    """
+    Emit the migration SQL for the configured URL without connecting.
+    """
+    context.configure(
+        url=config.get_main_option("sqlalchemy.url"),
+        target_metadata=target_metadata,
+        literal_binds=True,
+        dialect_opts={"paramstyle": "named"},
+        render_as_batch=True,
+    )
+
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+def run_migrations_online() -> None:
+    connectable = engine_from_config(
+        config.get_section(config.config_ini_section, {}),
+        prefix="sqlalchemy.",
+        poolclass=pool.NullPool,
+        connect_args=sqlite_connect_args(config.get_main_option("sqlalchemy.url"), get_config()),
+    )
+
+    with connectable.connect() as connection:
+        # batch mode lets ALTER-heavy migrations run on SQLite too
+        context.configure(connection=connection, target_metadata=target_metadata, render_as_batch=True)
+
+        with context.begin_transaction():
+            context.run_migrations()
+
+
+if context.is_offline_mode():
+    run_migrations_offline()
+else:
+    run_migrations_online()
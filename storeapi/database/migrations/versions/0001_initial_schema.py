@@ -0,0 +1,67 @@
+"""initial schema
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-17 09:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0001"
+down_revision: Union[str, Sequence[str], None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # databases created by the old import-time create_all already have these tables
+    existing = set(sa.inspect(op.get_bind()).get_table_names())
+
+    if "users" not in existing:
+        op.create_table(
+            "users",
+            sa.Column("id", sa.Integer, primary_key=True),
+            sa.Column("username", sa.String, unique=True),
+            sa.Column("email", sa.String, unique=True),
+            sa.Column("password", sa.String),
+            sa.Column("confirmed", sa.Boolean),
+        )
+
+    if "posts" not in existing:
+        op.create_table(
+            "posts",
+            sa.Column("id", sa.Integer, primary_key=True),
+            sa.Column("body", sa.String),
+            sa.Column("user_id", sa.Integer, sa.ForeignKey("users.id"), nullable=False),
+        )
+
+    if "comments" not in existing:
+        op.create_table(
+            "comments",
+            sa.Column("id", sa.Integer, primary_key=True),
+            sa.Column("body", sa.String),
+            sa.Column("post_id", sa.Integer, sa.ForeignKey("posts.id"), nullable=False),
+            sa.Column("user_id", sa.Integer, sa.ForeignKey("users.id"), nullable=False),
+        )
+
+    if "likes" not in existing:
+        op.create_table(
+            "likes",
+            sa.Column("id", sa.Integer, primary_key=True),
+            sa.Column("post_id", sa.Integer, sa.ForeignKey("posts.id"), nullable=False),
+            sa.Column("user_id", sa.Integer, sa.ForeignKey("users.id"), nullable=False),
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table("likes")
+    op.drop_table("comments")
+    op.drop_table("posts")
+    op.drop_table("users")
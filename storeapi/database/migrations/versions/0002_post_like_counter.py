@@ -0,0 +1,40 @@
+"""maintained likes counter on posts
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-17 09:10:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0002"
+down_revision: Union[str, Sequence[str], None] = "0001"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    inspector = sa.inspect(op.get_bind())
+    columns = {column["name"] for column in inspector.get_columns("posts")}
+    indexes = {index["name"] for index in inspector.get_indexes("posts")}
+
+    if "likes" not in columns:
+        op.add_column("posts", sa.Column("likes", sa.Integer, nullable=False, server_default="0"))
+        op.execute(
+            "UPDATE posts SET likes = (SELECT count(likes.id) FROM likes WHERE likes.post_id = posts.id)"
+        )
+
+    if "ix_posts_likes_id" not in indexes:
+        op.create_index("ix_posts_likes_id", "posts", ["likes", "id"])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index("ix_posts_likes_id", table_name="posts")
+    op.drop_column("posts", "likes")
@@ -0,0 +1,31 @@
+"""indexes for comment and like lookups by post and user
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-17 09:20:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0003"
+down_revision: Union[str, Sequence[str], None] = "0002"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index("ix_comments_post_id", "comments", ["post_id"], if_not_exists=True)
+    op.create_index("ix_likes_post_id", "likes", ["post_id"], if_not_exists=True)
+    op.create_index("ix_likes_user_id", "likes", ["user_id"], if_not_exists=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index("ix_likes_user_id", table_name="likes")
+    op.drop_index("ix_likes_post_id", table_name="likes")
+    op.drop_index("ix_comments_post_id", table_name="comments")
@@ -0,0 +1,160 @@
+"""full-text search index over post and comment bodies
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-17 11:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0004"
+down_revision: Union[str, Sequence[str], None] = "0003"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# One search document per post, holding its body and the bodies of its comments,
+# so a post is ranked once however many of its comments match. Triggers keep it
+# in step with every insert, including the batch routes'.
+
+SQLITE_UPGRADE = [
+    # bm25 weighs a match in the post's own body twice one in its comments;
+    # the prefix indexes keep two and three letter prefix queries off a full term scan
+    """
+    CREATE VIRTUAL TABLE post_search USING fts5(
+        body, comments, tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3'
+    )
+    """,
+    "INSERT INTO post_search (post_search, rank) VALUES ('rank', 'bm25(2.0, 1.0)')",
+    """
+    INSERT INTO post_search (rowid, body, comments)
+    SELECT posts.id, coalesce(posts.body, ''),
+           coalesce((SELECT group_concat(comments.body, ' ') FROM comments WHERE comments.post_id = posts.id), '')
+    FROM posts
+    """,
+    """
+    CREATE TRIGGER posts_search_insert AFTER INSERT ON posts BEGIN
+        INSERT INTO post_search (rowid, body, comments) VALUES (new.id, coalesce(new.body, ''), '');
+    END
+    """,
+    """
+    CREATE TRIGGER posts_search_delete AFTER DELETE ON posts BEGIN
+        DELETE FROM post_search WHERE rowid = old.id;
+    END
+    """,
+    """
+    CREATE TRIGGER comments_search_insert AFTER INSERT ON comments BEGIN
+        UPDATE post_search SET comments = comments || ' ' || coalesce(new.body, '') WHERE rowid = new.post_id;
+    END
+    """,
+    """
+    CREATE TRIGGER comments_search_delete AFTER DELETE ON comments BEGIN
+        UPDATE post_search
+        SET comments = coalesce((SELECT group_concat(body, ' ') FROM comments WHERE post_id = old.post_id), '')
+        WHERE rowid = old.post_id;
+    END
+    """,
+]
+
+POSTGRES_UPGRADE = [
+    """
+    CREATE TABLE post_search (
+        post_id INTEGER PRIMARY KEY REFERENCES posts (id) ON DELETE CASCADE,
+        document TSVECTOR NOT NULL
+    )
+    """,
+    "CREATE INDEX ix_post_search_document ON post_search USING gin (document)",
+    """
+    INSERT INTO post_search (post_id, document)
+    SELECT posts.id,
+           setweight(to_tsvector('simple', coalesce(posts.body, '')), 'A')
+           || setweight(to_tsvector('simple', coalesce(
+                (SELECT string_agg(comments.body, ' ') FROM comments WHERE comments.post_id = posts.id), ''
+              )), 'B')
+    FROM posts
+    """,
+    """
+    CREATE FUNCTION posts_search_insert() RETURNS trigger AS $$
+    BEGIN
+        INSERT INTO post_search (post_id, document)
+        VALUES (NEW.id, setweight(to_tsvector('simple', coalesce(NEW.body, '')), 'A'));
+        RETURN NEW;
+    END
+    $$ LANGUAGE plpgsql
+    """,
+    """
+    CREATE TRIGGER posts_search_insert AFTER INSERT ON posts
+    FOR EACH ROW EXECUTE FUNCTION posts_search_insert()
+    """,
+    """
+    CREATE FUNCTION comments_search_insert() RETURNS trigger AS $$
+    BEGIN
+        UPDATE post_search
+        SET document = document || setweight(to_tsvector('simple', coalesce(NEW.body, '')), 'B')
+        WHERE post_id = NEW.post_id;
+        RETURN NEW;
+    END
+    $$ LANGUAGE plpgsql
+    """,
+    """
+    CREATE TRIGGER comments_search_insert AFTER INSERT ON comments
+    FOR EACH ROW EXECUTE FUNCTION comments_search_insert()
+    """,
+    """
+    CREATE FUNCTION comments_search_delete() RETURNS trigger AS $$
+    BEGIN
+        UPDATE post_search
+        SET document = setweight(to_tsvector('simple', coalesce(posts.body, '')), 'A')
+            || setweight(to_tsvector('simple', coalesce(
+                 (SELECT string_agg(comments.body, ' ') FROM comments WHERE comments.post_id = OLD.post_id), ''
+               )), 'B')
+        FROM posts
+        WHERE posts.id = OLD.post_id AND post_search.post_id = OLD.post_id;
+        RETURN OLD;
+    END
+    $$ LANGUAGE plpgsql
+    """,
+    """
+    CREATE TRIGGER comments_search_delete AFTER DELETE ON comments
+    FOR EACH ROW EXECUTE FUNCTION comments_search_delete()
+    """,
+]
+
+SQLITE_DOWNGRADE = [
+    "DROP TRIGGER IF EXISTS comments_search_delete",
+    "DROP TRIGGER IF EXISTS comments_search_insert",
+    "DROP TRIGGER IF EXISTS posts_search_delete",
+    "DROP TRIGGER IF EXISTS posts_search_insert",
+    "DROP TABLE IF EXISTS post_search",
+]
+
+POSTGRES_DOWNGRADE = [
+    "DROP TRIGGER IF EXISTS comments_search_delete ON comments",
+    "DROP TRIGGER IF EXISTS comments_search_insert ON comments",
+    "DROP TRIGGER IF EXISTS posts_search_insert ON posts",
+    "DROP FUNCTION IF EXISTS comments_search_delete()",
+    "DROP FUNCTION IF EXISTS comments_search_insert()",
+    "DROP FUNCTION IF EXISTS posts_search_insert()",
+    "DROP TABLE IF EXISTS post_search",
+]
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    bind = op.get_bind()
+    if "post_search" in sa.inspect(bind).get_table_names():
+        return
+    statements = POSTGRES_UPGRADE if bind.dialect.name == "postgresql" else SQLITE_UPGRADE
+    for statement in statements:
+        op.execute(statement)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    statements = POSTGRES_DOWNGRADE if op.get_bind().dialect.name == "postgresql" else SQLITE_DOWNGRADE
+    for statement in statements:
+        op.execute(statement)
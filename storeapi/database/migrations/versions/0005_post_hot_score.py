@@ -0,0 +1,61 @@
+"""time-decayed hot score on posts
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-17 12:00:00.000000
+
+"""
+import time
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from storeapi.app_conf import get_config
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0005"
+down_revision: Union[str, Sequence[str], None] = "0004"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+
+    if "hot_epoch" not in inspector.get_table_names():
+        hot_epoch = op.create_table(
+            "hot_epoch",
+            sa.Column("id", sa.Integer, primary_key=True),
+            sa.Column("epoch", sa.Float, nullable=False),
+        )
+        op.bulk_insert(hot_epoch, [{"id": 1, "epoch": time.time()}])
+
+    if "hot_score" not in {column["name"] for column in inspector.get_columns("posts")}:
+        op.add_column("posts", sa.Column("hot_score", sa.Float, nullable=False, server_default="0"))
+        # posts have no creation time, so existing ones start out as if everything
+        # about them happened now, at the new epoch, and decay from here on
+        config = get_config()
+        op.execute(
+            sa.text(
+                "UPDATE posts SET hot_score = :post_weight + :like_weight * likes + :comment_weight * "
+                "(SELECT count(comments.id) FROM comments WHERE comments.post_id = posts.id)"
+            ).bindparams(
+                post_weight=config.HOT_POST_WEIGHT,
+                like_weight=config.HOT_LIKE_WEIGHT,
+                comment_weight=config.HOT_COMMENT_WEIGHT,
+            )
+        )
+
+    if "ix_posts_hot_score_id" not in {index["name"] for index in inspector.get_indexes("posts")}:
+        op.create_index("ix_posts_hot_score_id", "posts", ["hot_score", "id"])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index("ix_posts_hot_score_id", table_name="posts")
+    op.drop_column("posts", "hot_score")
+    op.drop_table("hot_epoch")
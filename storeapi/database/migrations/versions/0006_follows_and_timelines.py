@@ -0,0 +1,71 @@
+"""follow graph and precomputed home timelines
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-18 09:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from storeapi.app_conf import get_config
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0006"
+down_revision: Union[str, Sequence[str], None] = "0005"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    inspector = sa.inspect(op.get_bind())
+    tables = set(inspector.get_table_names())
+
+    if "followers" not in {column["name"] for column in inspector.get_columns("users")}:
+        # nobody follows anybody yet
+        op.add_column("users", sa.Column("followers", sa.Integer, nullable=False, server_default="0"))
+
+    if "ix_users_followers" not in {index["name"] for index in inspector.get_indexes("users")}:
+        op.create_index("ix_users_followers", "users", ["followers"])
+
+    if "ix_posts_user_id_id" not in {index["name"] for index in inspector.get_indexes("posts")}:
+        op.create_index("ix_posts_user_id_id", "posts", ["user_id", "id"])
+
+    if "follows" not in tables:
+        op.create_table(
+            "follows",
+            sa.Column("follower_id", sa.Integer, sa.ForeignKey("users.id"), primary_key=True),
+            sa.Column("followee_id", sa.Integer, sa.ForeignKey("users.id"), primary_key=True),
+            sqlite_with_rowid=False,
+        )
+        op.create_index("ix_follows_followee_id_follower_id", "follows", ["followee_id", "follower_id"])
+
+    if "timelines" not in tables:
+        op.create_table(
+            "timelines",
+            sa.Column("user_id", sa.Integer, sa.ForeignKey("users.id"), primary_key=True),
+            sa.Column("post_id", sa.Integer, sa.ForeignKey("posts.id"), primary_key=True),
+            sqlite_with_rowid=False,
+        )
+        # with no follows, a home timeline starts out as the user's own latest posts
+        op.execute(
+            sa.text(
+                "INSERT INTO timelines (user_id, post_id) SELECT user_id, id FROM ("
+                "SELECT user_id, id, row_number() OVER (PARTITION BY user_id ORDER BY id DESC) AS position "
+                "FROM posts) AS ranked WHERE position <= :max_length"
+            ).bindparams(max_length=get_config().TIMELINE_MAX_LENGTH)
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table("timelines")
+    op.drop_index("ix_follows_followee_id_follower_id", table_name="follows")
+    op.drop_table("follows")
+    op.drop_index("ix_posts_user_id_id", table_name="posts")
+    op.drop_index("ix_users_followers", table_name="users")
+    op.drop_column("users", "followers")
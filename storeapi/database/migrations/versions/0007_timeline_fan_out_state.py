@@ -0,0 +1,47 @@
+"""which authors are fanned out, and the timeline backfills still to run
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-18 18:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from storeapi.app_conf import get_config
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0007"
+down_revision: Union[str, Sequence[str], None] = "0006"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    inspector = sa.inspect(op.get_bind())
+
+    if "fans_out" not in {column["name"] for column in inspector.get_columns("users")}:
+        op.add_column("users", sa.Column("fans_out", sa.Boolean, nullable=False, server_default=sa.true()))
+        # the side of the limit each author was on by their follower count until now
+        op.execute(
+            sa.text("UPDATE users SET fans_out = followers <= :max_followers").bindparams(
+                max_followers=get_config().TIMELINE_FANOUT_MAX_FOLLOWERS
+            )
+        )
+
+    if "timeline_backfills" not in inspector.get_table_names():
+        op.create_table(
+            "timeline_backfills",
+            sa.Column("followee_id", sa.Integer, sa.ForeignKey("users.id"), primary_key=True),
+            sa.Column("last_follower_id", sa.Integer, nullable=False, server_default="0"),
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table("timeline_backfills")
+    op.drop_column("users", "fans_out")
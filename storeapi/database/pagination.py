@@ -0,0 +1,26 @@
+import base64
+import binascii
+import json
+
+
+def encode_cursor(**values) -> str:
+    """
+    Encode the keyset position of the last row on a page into an opaque token.
+    """
+    raw = json.dumps(values, separators=(",", ":"), sort_keys=True).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).rstrip(b"=").decode("ascii")
+
+
+def decode_cursor(token: str) -> dict:
+    """
+    Decode a token produced by encode_cursor, raising ValueError if it was tampered with.
+    """
+    padded = token + "=" * (-len(token) % 4)
+    try:
+        values = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+    except (binascii.Error, UnicodeError, ValueError) as e:
+        raise ValueError("Invalid cursor") from e
+
+    if not isinstance(values, dict):
+        raise ValueError("Invalid cursor")
+    return values
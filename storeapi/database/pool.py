@@ -0,0 +1,227 @@
+import asyncio
+import logging
+import time
+from collections import deque
+
+import aiosqlite
+import databases
+from databases.backends.sqlite import SQLitePool
+from fastapi import HTTPException
+
+from storeapi.database.sqlite_profile import connection_factory, sqlite_pragmas
+
+logger = logging.getLogger(__name__)
+
+
+class PoolLimiter:
+    """
+    Caps the number of connections checked out at once. A caller that cannot get
+    one within acquire_timeout seconds gets a 503 instead of queueing forever.
+    """
+
+    def __init__(self, max_size: int = 10, acquire_timeout: float = 10.0):
+        self.max_size = max_size
+        self.acquire_timeout = acquire_timeout
+        self.in_use = 0
+        self.waiters = 0
+        self.timeouts = 0
+        self._slots = asyncio.Semaphore(max_size)
+
+    async def acquire(self) -> None:
+        if not self._slots.locked():
+            # a free slot is taken without suspending, so skip the wait_for task
+            await self._slots.acquire()
+        else:
+            self.waiters += 1
+            try:
+                if self.acquire_timeout:
+                    await asyncio.wait_for(self._slots.acquire(), timeout=self.acquire_timeout)
+                else:
+                    await self._slots.acquire()
+            except asyncio.TimeoutError:
+                self.timeouts += 1
+                logger.warning("No database connection free after %ss", self.acquire_timeout)
+                raise HTTPException(status_code=503, detail="Database busy", headers={"Retry-After": "1"})
+            finally:
+                self.waiters -= 1
+        self.in_use += 1
+
+    def release(self) -> None:
+        self.in_use -= 1
+        self._slots.release()
+
+
+class LimitedConnection:
+    """
+    Backend connection that holds a PoolLimiter slot from acquire to release.
+    """
+
+    def __init__(self, connection, limiter: PoolLimiter):
+        self._connection = connection
+        self._limiter = limiter
+
+    async def acquire(self) -> None:
+        await self._limiter.acquire()
+        try:
+            await self._connection.acquire()
+        except BaseException:
+            self._limiter.release()
+            raise
+
+    async def release(self) -> None:
+        try:
+            await self._connection.release()
+        finally:
+            self._limiter.release()
+
+    def __getattr__(self, name: str):
+        return getattr(self._connection, name)
+
+
+class LimitedBackend:
+    """
+    Wraps a databases backend so every connection it hands out goes through the limiter.
+    """
+
+    def __init__(self, backend, limiter: PoolLimiter):
+        self._backend = backend
+        self.limiter = limiter
+
+    async def connect(self) -> None:
+        await self._backend.connect()
+        if isinstance(self._backend._pool, SQLiteConnectionPool):
+            await self._backend._pool.open()
+
+    async def disconnect(self) -> None:
+        if isinstance(self._backend._pool, SQLiteConnectionPool):
+            await self._backend._pool.close()
+        await self._backend.disconnect()
+
+    def connection(self) -> LimitedConnection:
+        return LimitedConnection(self._backend.connection(), self.limiter)
+
+    def __getattr__(self, name: str):
+        return getattr(self._backend, name)
+
+
+class SQLiteConnectionPool(SQLitePool):
+    """
+    SQLitePool that keeps released connections open for reuse, instead of opening
+    (and starting a thread for) a new one for every request. Connections idle for
+    longer than lifetime seconds are closed rather than reused.
+    """
+
+    def __init__(self, url, min_size: int = 1, max_size: int = 10, lifetime: float = 300.0, clock=time.monotonic, **options):
+        super().__init__(url, **options)
+        self.min_size = min_size
+        self.max_size = max_size
+        self.lifetime = lifetime
+        self.clock = clock
+        self.is_open = False
+        self._idle: deque[tuple[float, aiosqlite.Connection]] = deque()
+
+    def __len__(self) -> int:
+        return len(self._idle)
+
+    async def _connect(self) -> aiosqlite.Connection:
+        connection = aiosqlite.connect(database=self._database, isolation_level=None, **self._options)
+        # an idle pooled connection must not keep the interpreter alive when nobody disconnects
+        connection._thread.daemon = True
+        await connection.__aenter__()
+        return connection
+
+    async def open(self) -> None:
+        self.is_open = True
+        while len(self._idle) < self.min_size:
+            self._idle.append((self.clock(), await self._connect()))
+
+    async def close(self) -> None:
+        self.is_open = False
+        while self._idle:
+            _, connection = self._idle.popleft()
+            await super().release(connection)
+
+    async def acquire(self) -> aiosqlite.Connection:
+        while self._idle:
+            # most recently released first, so surplus connections age out at the other end
+            released_at, connection = self._idle.pop()
+            if self.clock() - released_at < self.lifetime:
+                return connection
+            await super().release(connection)
+        return await self._connect()
+
+    async def release(self, connection: aiosqlite.Connection) -> None:
+        if self.is_open and len(self._idle) < self.max_size:
+            self._idle.append((self.clock(), connection))
+        else:
+            await super().release(connection)
+
+
+def pool_options(url: str, config) -> dict:
+    """
+    Driver options for the configured pool size and timeouts.
+    """
+    if databases.DatabaseURL(url).dialect != "postgresql":
+        options = {}
+        if config.DB_STATEMENT_TIMEOUT:
+            # SQLite has no statement timeout; the closest is how long a statement waits for a lock
+            options["timeout"] = config.DB_STATEMENT_TIMEOUT
+        pragmas = sqlite_pragmas(config)
+        if pragmas:
+            options["factory"] = connection_factory(pragmas)
+        return options
+
+    options = {
+        "min_size": config.DB_MIN_POOL_SIZE,
+        "max_size": config.DB_MAX_POOL_SIZE,
+        "max_inactive_connection_lifetime": config.DB_CONNECTION_LIFETIME,
+    }
+    if config.DB_STATEMENT_TIMEOUT:
+        options["command_timeout"] = config.DB_STATEMENT_TIMEOUT
+        options["server_settings"] = {"statement_timeout": str(int(config.DB_STATEMENT_TIMEOUT * 1000))}
+    return options
+
+
+def create_database(url: str, config, max_size: int | None = None) -> databases.Database:
+    """
+    Build a databases.Database whose connections are limited to max_size
+    (DB_MAX_POOL_SIZE by default), with the SQLite pool replaced by one that reuses connections.
+    This reaches into databases' private attributes, so package-manage.yml pins its version.
+    """
+    max_size = max_size or config.DB_MAX_POOL_SIZE
+    database = databases.Database(url, **pool_options(url, config))
+    backend = database._backend
+    if database.url.dialect == "sqlite":
+        backend._pool = SQLiteConnectionPool(
+            database.url,
+            min_size=min(config.DB_MIN_POOL_SIZE, max_size),
+            max_size=max_size,
+            lifetime=config.DB_CONNECTION_LIFETIME,
+            **backend._options,
+        )
+    database._backend = LimitedBackend(
+        backend, PoolLimiter(max_size=max_size, acquire_timeout=config.DB_POOL_ACQUIRE_TIMEOUT)
+    )
+    return database
+
+
+def pool_stats(database: databases.Database) -> dict:
+    """
+    Live pool numbers: connections checked out, open but idle, and callers waiting for one.
+    """
+    backend = database._backend
+    limiter = backend.limiter
+    stats = {
+        "dialect": database.url.dialect,
+        "max_size": limiter.max_size,
+        "in_use": limiter.in_use,
+        "idle": 0,
+        "waiters": limiter.waiters,
+        "acquire_timeouts": limiter.timeouts,
+    }
+    pool = backend._pool
+    if isinstance(pool, SQLiteConnectionPool):
+        stats["idle"] = len(pool)
+    elif pool is not None and hasattr(pool, "get_idle_size"):
+        stats["idle"] = pool.get_idle_size()
+    return stats
@@ -0,0 +1,73 @@
+import logging
+from contextvars import ContextVar, Token
+
+from asgi_correlation_id import correlation_id
+
+from storeapi.app_conf import get_config
+
+logger = logging.getLogger(__name__)
+
+REDACTED = "[redacted]"
+
+
+class RequestQueries:
+    """
+    Number of queries the current request ran and the time they took.
+    """
+
+    __slots__ = ("count", "seconds")
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+
+
+_request_queries: ContextVar[RequestQueries | None] = ContextVar("request_queries", default=None)
+
+
+def start_request() -> tuple[RequestQueries, Token]:
+    queries = RequestQueries()
+    return queries, _request_queries.set(queries)
+
+
+def end_request(token: Token) -> None:
+    _request_queries.reset(token)
+
+
+def current_request_queries() -> RequestQueries | None:
+    return _request_queries.get()
+
+
+def describe_query(query, values: dict | None = None) -> tuple[str, dict]:
+    """
+    SQL text of query with the names of its bound parameters, values redacted.
+    """
+    if isinstance(query, str):
+        return query, {name: REDACTED for name in values or {}}
+    compiled = query.compile()
+    return str(compiled), {name: REDACTED for name in compiled.params}
+
+
+def record_query(query, seconds: float, values: dict | None = None, count: bool = True) -> None:
+    """
+    Add a query's time to the current request and log it if it was slow. With
+    count=False the query was already counted, and only its time is added.
+    """
+    queries = _request_queries.get()
+    if queries is not None:
+        queries.count += count
+        queries.seconds += seconds
+
+    threshold = get_config().SLOW_QUERY_THRESHOLD
+    if threshold and seconds >= threshold:
+        sql, parameters = describe_query(query, values)
+        logger.warning(
+            "Slow query took %.1f ms",
+            seconds * 1000,
+            extra={
+                "correlation_id": correlation_id.get(),
+                "duration_ms": round(seconds * 1000, 3),
+                "sql": sql,
+                "parameters": parameters,
+            },
+        )
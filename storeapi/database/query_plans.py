@@ -0,0 +1,120 @@
+"""
+Check that the hot queries are served by indexes.
+
+Every query below runs through EXPLAIN against the configured database and the
+check fails when one of them would read a whole table:
+
+    python -m storeapi.database.query_plans
+"""
+
+import sys
+from typing import Any, NamedTuple
+
+import sqlalchemy
+
+from storeapi.app_conf import get_config
+from storeapi.database.database import follow_table, like_table, post_table, user_table
+from storeapi.database.hot import select_epoch
+from storeapi.database.loaders import select_comments_for_posts
+from storeapi.database.sqlite_profile import sqlite_connect_args
+from storeapi.database.timelines import select_fan_out, select_followed_celebrities, select_timeline_page
+from storeapi.database.reconcile import recount_likes
+from storeapi.routers.post import PostSorting, paginate_posts, select_comments_on_post, select_post_and_likes
+
+
+class HotQuery(NamedTuple):
+    name: str
+    query: Any
+    # a first page walks the table in index order and stops at the LIMIT
+    ordered_scan: bool = False
+
+
+def hot_queries() -> list[HotQuery]:
+    def page(sorting: PostSorting, cursor: dict | None = None):
+        return paginate_posts(select_post_and_likes, sorting, cursor).limit(21)
+
+    return [
+        HotQuery("posts new first page", page(PostSorting.new), ordered_scan=True),
+        HotQuery("posts new next page", page(PostSorting.new, {"id": 100})),
+        HotQuery("posts old first page", page(PostSorting.old), ordered_scan=True),
+        HotQuery("posts old next page", page(PostSorting.old, {"id": 100})),
+        HotQuery("posts most_likes first page", page(PostSorting.most_likes), ordered_scan=True),
+        HotQuery("posts most_likes next page", page(PostSorting.most_likes, {"id": 100, "likes": 5})),
+        HotQuery("posts hot first page", page(PostSorting.hot), ordered_scan=True),
+        HotQuery("posts hot next page", page(PostSorting.hot, {"id": 100, "score": 2.5})),
+        HotQuery("hot epoch", select_epoch()),
+        HotQuery("post by id", select_post_and_likes.where(post_table.c.id == 1)),
+        HotQuery("existing post ids", sqlalchemy.select(post_table.c.id).where(post_table.c.id.in_([1, 2, 3]))),
+        HotQuery("comments on post", select_comments_on_post(1)),
+        HotQuery("comments for posts", select_comments_for_posts([1, 2, 3])),
+        HotQuery("like count for post", sqlalchemy.select(recount_likes).select_from(post_table).where(post_table.c.id == 1)),
+        HotQuery("likes by user", like_table.select().where(like_table.c.user_id == 1)),
+        HotQuery("user by email", user_table.select().where(user_table.c.email == "user@example.net")),
+        HotQuery("user by id", user_table.select().where(user_table.c.id == 1)),
+        HotQuery("timeline first page", select_timeline_page(1, [], None, 21)),
+        HotQuery("timeline next page", select_timeline_page(1, [], 100, 21)),
+        HotQuery("followed celebrities", select_followed_celebrities(1)),
+        HotQuery("fan out new posts", select_fan_out([1, 2, 3])),
+        HotQuery("follow", follow_table.select().where(follow_table.c.follower_id == 1, follow_table.c.followee_id == 2)),
+    ]
+
+
+def explain(connection: sqlalchemy.Connection, query) -> list[str]:
+    """
+    Return the plan of query as one line per step.
+    """
+    sql = str(query.compile(dialect=connection.dialect, compile_kwargs={"literal_binds": True}))
+    if connection.dialect.name == "sqlite":
+        return [row[-1] for row in connection.exec_driver_sql(f"EXPLAIN QUERY PLAN {sql}")]
+    return [row[0] for row in connection.exec_driver_sql(f"EXPLAIN {sql}")]
+
+
+def full_scans(plan: list[str], dialect: str, ordered_scan: bool = False) -> list[str]:
+    """
+    Return the plan steps that read a whole table or sort every row of one.
+    """
+    if dialect == "sqlite":
+        return [
+            step
+            for step in plan
+            if "USE TEMP B-TREE" in step or (step.startswith("SCAN ") and not ordered_scan)
+        ]
+    return [step for step in plan if "Seq Scan" in step]
+
+
+def check_query_plans(bind: sqlalchemy.Engine) -> dict[str, list[str]]:
+    """
+    Explain every hot query and return the offending plan steps by query name.
+    """
+    problems = {}
+    with bind.connect() as connection:
+        if bind.dialect.name == "postgresql":
+            # small tables are cheaper to scan, so make the planner show whether an index can be used at all
+            connection.exec_driver_sql("SET enable_seqscan = off")
+        for hot_query in hot_queries():
+            plan = explain(connection, hot_query.query)
+            steps = full_scans(plan, bind.dialect.name, hot_query.ordered_scan)
+            if steps:
+                problems[hot_query.name] = steps
+        connection.rollback()
+    return problems
+
+
+def main() -> int:
+    config = get_config()
+    engine = sqlalchemy.create_engine(config.DATABASE_URL, connect_args=sqlite_connect_args(config.DATABASE_URL, config))
+    try:
+        problems = check_query_plans(engine)
+    finally:
+        engine.dispose()
+
+    for name, steps in problems.items():
+        print(f"{name}: {'; '.join(steps)}")
+    if problems:
+        return 1
+    print("No full table scans in the hot queries")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,54 @@
+"""
+Recompute the denormalized posts.likes counter from the likes table.
+
+Run it after restoring a backup, after bulk imports, or whenever the counter
+is suspected to have drifted:
+
+    python -m storeapi.database.reconcile
+"""
+
+import asyncio
+import logging
+
+import sqlalchemy
+
+from storeapi.database.database import database, like_table, post_table
+
+logger = logging.getLogger(__name__)
+
+
+recount_likes = (
+    sqlalchemy.select(sqlalchemy.func.count(like_table.c.id))
+    .where(like_table.c.post_id == post_table.c.id)
+    .scalar_subquery()
+)
+
+
+async def reconcile_like_counts() -> int:
+    """
+    Reset every drifted posts.likes value to the real count and return how many posts were fixed.
+    """
+    drifted = post_table.c.likes != recount_likes
+
+    async with database.transaction():
+        fixed = await database.fetch_val(
+            sqlalchemy.select(sqlalchemy.func.count()).select_from(post_table).where(drifted)
+        )
+        if fixed:
+            await database.execute(post_table.update().where(drifted).values(likes=recount_likes))
+
+    logger.info("Reconciled like counts for %s posts", fixed)
+    return fixed
+
+
+async def main() -> None:
+    await database.connect()
+    try:
+        fixed = await reconcile_like_counts()
+    finally:
+        await database.disconnect()
+    print(f"Reconciled like counts for {fixed} posts")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,64 @@
+import itertools
+import logging
+from contextvars import ContextVar
+from functools import lru_cache
+
+from storeapi.app_conf import get_config
+from storeapi.database.database import Database, database
+
+logger = logging.getLogger(__name__)
+
+# set for the requests of a client that wrote recently, so it reads its own writes
+_pinned_to_primary: ContextVar[bool] = ContextVar("pinned_to_primary", default=False)
+
+
+class ReplicaSet:
+    """
+    Read replicas of the primary database, handed out round-robin.
+    """
+
+    def __init__(self, urls: list[str]):
+        self.databases = [Database(url, single_writer=False) for url in urls]
+        self._cycle = itertools.cycle(self.databases)
+
+    def __len__(self) -> int:
+        return len(self.databases)
+
+    def next(self) -> Database:
+        return next(self._cycle)
+
+    async def connect(self) -> None:
+        for replica in self.databases:
+            await replica.connect()
+
+    async def disconnect(self) -> None:
+        for replica in self.databases:
+            await replica.disconnect()
+
+
+@lru_cache()
+def get_replicas() -> ReplicaSet:
+    return ReplicaSet(get_config().DATABASE_REPLICA_URLS or [])
+
+
+def pin_to_primary(pinned: bool = True):
+    return _pinned_to_primary.set(pinned)
+
+
+def unpin(token) -> None:
+    _pinned_to_primary.reset(token)
+
+
+def pinned_to_primary() -> bool:
+    return _pinned_to_primary.get()
+
+
+def read_database() -> Database:
+    """
+    Database for a read-only query: the next replica, or the primary when no
+    replicas are configured or the client is inside its read-your-writes window.
+    """
+    replicas = get_replicas()
+    if not replicas or pinned_to_primary():
+        return database
+    return replicas.next()
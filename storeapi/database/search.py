@@ -0,0 +1,88 @@
+import re
+
+import sqlalchemy
+from sqlalchemy.dialects.postgresql import TSVECTOR
+
+from storeapi.database.database import Database, post_table
+
+# words searched at once; more would only make a query slower, not better
+MAX_SEARCH_TERMS = 16
+# shortest prefix a "term*" query may use, the FTS5 index holds 2 and 3 letter prefixes
+MIN_PREFIX_LENGTH = 2
+
+# the search documents created by migration 0004: an FTS5 table keyed by post id
+# on SQLite, a table of tsvectors on PostgreSQL
+sqlite_search = sqlalchemy.table(
+    "post_search", sqlalchemy.column("rowid", sqlalchemy.Integer), sqlalchemy.column("rank", sqlalchemy.Float)
+)
+postgres_search = sqlalchemy.table(
+    "post_search", sqlalchemy.column("post_id", sqlalchemy.Integer), sqlalchemy.column("document", TSVECTOR)
+)
+
+_TERM = re.compile(r"(\w+)(\*?)")
+
+
+def search_terms(q: str) -> list[tuple[str, bool]]:
+    """
+    The words of a search as (word, is prefix) pairs; a word ending in * matches
+    every word it starts. Anything but letters, digits and * is ignored, so no
+    user input reaches the MATCH or tsquery syntax.
+    """
+    terms = [(word.lower(), bool(star)) for word, star in _TERM.findall(q)][:MAX_SEARCH_TERMS]
+    if not terms:
+        raise ValueError("Search query has no words")
+    if any(prefix and len(word) < MIN_PREFIX_LENGTH for word, prefix in terms):
+        raise ValueError(f"Prefix searches need at least {MIN_PREFIX_LENGTH} characters")
+    return terms
+
+
+def match_expression(terms: list[tuple[str, bool]], dialect: str) -> str:
+    """
+    Every term must match: an FTS5 query on SQLite, a tsquery on PostgreSQL.
+    """
+    if dialect == "postgresql":
+        return " & ".join(f"'{word}':*" if prefix else f"'{word}'" for word, prefix in terms)
+    return " ".join(f'"{word}"*' if prefix else f'"{word}"' for word, prefix in terms)
+
+
+def select_matching_posts(dialect: str, terms: list[tuple[str, bool]], by_relevance: bool, cursor: dict | None):
+    """
+    Posts matching every term, best first (by_relevance) or newest first, with a
+    score column where lower is better, continuing after the cursor position.
+    """
+    match = match_expression(terms, dialect)
+    if dialect == "postgresql":
+        tsquery = sqlalchemy.func.to_tsquery("simple", match)
+        search = postgres_search
+        key = postgres_search.c.post_id
+        score = -sqlalchemy.func.ts_rank(postgres_search.c.document, tsquery)
+        condition = postgres_search.c.document.op("@@")(tsquery)
+    else:
+        search = sqlite_search
+        key = sqlite_search.c.rowid
+        score = sqlite_search.c.rank
+        condition = sqlalchemy.literal_column("post_search").op("MATCH")(match)
+
+    query = (
+        sqlalchemy.select(post_table, score.label("score"))
+        .select_from(search.join(post_table, post_table.c.id == key))
+        .where(condition)
+    )
+
+    if not by_relevance:
+        # ordered by the search table's own key, so FTS5 walks its doclists newest first
+        query = query.order_by(key.desc())
+        if cursor:
+            query = query.where(key < cursor["id"])
+        return query
+
+    query = query.order_by(score, post_table.c.id)
+    if cursor:
+        query = query.where(
+            sqlalchemy.or_(score > cursor["score"], sqlalchemy.and_(score == cursor["score"], post_table.c.id > cursor["id"]))
+        )
+    return query
+
+
+def dialect_of(db: Database) -> str:
+    return db.bind().url.dialect
@@ -0,0 +1,57 @@
+import sqlite3
+
+# negative cache_size is in KiB rather than pages
+DEFAULT_CACHE_SIZE = -64 * 1024
+DEFAULT_MMAP_SIZE = 256 * 1024 * 1024
+
+
+def is_sqlite(url: str) -> bool:
+    return url.startswith("sqlite")
+
+
+def sqlite_pragmas(config) -> dict:
+    """
+    PRAGMAs of the high-throughput SQLite profile: WAL so readers no longer wait
+    for writers, synchronous=NORMAL (safe with WAL, fsync only at checkpoints),
+    memory-mapped reads, a larger page cache and a busy timeout for the write lock.
+    """
+    if not config.SQLITE_TUNED:
+        return {}
+    pragmas = {
+        "journal_mode": "WAL",
+        "synchronous": "NORMAL",
+        "mmap_size": config.SQLITE_MMAP_SIZE,
+        "cache_size": config.SQLITE_CACHE_SIZE,
+    }
+    # busy_timeout=0 would fail every writer that meets the lock at once, so with
+    # no DB_STATEMENT_TIMEOUT leave sqlite3's own default wait in place, as pool_options does
+    if config.DB_STATEMENT_TIMEOUT:
+        pragmas["busy_timeout"] = int(config.DB_STATEMENT_TIMEOUT * 1000)
+    return pragmas
+
+
+def apply_pragmas(connection: sqlite3.Connection, pragmas: dict) -> None:
+    for name, value in pragmas.items():
+        connection.execute(f"PRAGMA {name}={value}").close()
+
+
+def connection_factory(pragmas: dict) -> type[sqlite3.Connection]:
+    """
+    sqlite3.Connection subclass that applies pragmas as it opens. Passed as
+    `factory`, it reaches every connection whether aiosqlite or SQLAlchemy opens it.
+    """
+
+    class TunedConnection(sqlite3.Connection):
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, **kwargs)
+            apply_pragmas(self, pragmas)
+
+    return TunedConnection
+
+
+def sqlite_connect_args(url: str, config) -> dict:
+    """
+    connect_args for a sync SQLAlchemy engine on url.
+    """
+    pragmas = sqlite_pragmas(config) if is_sqlite(url) else {}
+    return {"factory": connection_factory(pragmas)} if pragmas else {}
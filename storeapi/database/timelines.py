@@ -0,0 +1,357 @@
+"""
+Precomputed home timelines.
+
+A user's home timeline holds the latest posts of the people they follow and
+their own. Creating a post copies its id into the timeline of each of the
+author's followers (fan-out on write), so reading a page is one range scan of
+the timelines primary key. Authors with more than TIMELINE_FANOUT_MAX_FOLLOWERS
+followers are not copied, which would cost a row per follower per post; their
+posts are merged in when a follower reads (fan-out on read).
+
+Which side of that line an author is on is kept in users.fans_out. Going over
+the limit switches it off, which loses nothing: posts already copied stay, and
+reads merge in the rest. It is only switched back on once the author is down to
+TIMELINE_FANOUT_RESUME_FOLLOWERS, lower than the limit, so an author hovering at
+the limit does not switch back and forth. Posts made while it was off were never
+copied, so switching it back on queues a backfill in timeline_backfills. A
+background task copies the author's latest posts to TIMELINE_BACKFILL_BATCH
+followers per transaction, and reads keep merging the author in until it is done.
+Timelines are trimmed back to TIMELINE_MAX_LENGTH posts by a background task
+rather than on every write.
+"""
+
+import asyncio
+import logging
+from functools import lru_cache
+from typing import Iterable
+
+import sqlalchemy
+
+from storeapi.app_conf import get_config
+from storeapi.database.database import (
+    database,
+    follow_table,
+    post_table,
+    timeline_backfill_table,
+    timeline_table,
+    user_table,
+)
+
+logger = logging.getLogger(__name__)
+
+
+def stops_fanning_out(followers: int) -> bool:
+    """
+    Whether an author fanned out with this many followers is over the limit.
+    """
+    return followers > get_config().TIMELINE_FANOUT_MAX_FOLLOWERS
+
+
+def resumes_fanning_out(followers: int) -> bool:
+    """
+    Whether an author not fanned out with this many followers is far enough under the limit to be again.
+    """
+    return followers <= get_config().TIMELINE_FANOUT_RESUME_FOLLOWERS
+
+
+async def stop_fan_out(author_id: int) -> None:
+    """
+    Merge an author's posts in on read from now on. Call it in the transaction that took them over the limit.
+    """
+    await database.execute(user_table.update().where(user_table.c.id == author_id).values(fans_out=False))
+    await database.execute(timeline_backfill_table.delete().where(timeline_backfill_table.c.followee_id == author_id))
+
+
+async def resume_fan_out(author_id: int) -> None:
+    """
+    Copy an author's new posts to their followers' timelines again, and queue
+    the backfill of the ones made while they were not.
+    """
+    await database.execute(user_table.update().where(user_table.c.id == author_id).values(fans_out=True))
+    await database.execute(timeline_backfill_table.insert().values(followee_id=author_id))
+
+
+def select_fan_out(post_ids: Iterable[int]):
+    """
+    (user_id, post_id) timeline rows for new posts: one for every follower of an
+    author who fans out, and one for the author.
+    """
+    post_ids = list(post_ids)
+    followers = (
+        sqlalchemy.select(follow_table.c.follower_id, post_table.c.id)
+        .select_from(
+            post_table.join(follow_table, follow_table.c.followee_id == post_table.c.user_id).join(
+                user_table, user_table.c.id == post_table.c.user_id
+            )
+        )
+        .where(post_table.c.id.in_(post_ids), user_table.c.fans_out)
+    )
+    authors = sqlalchemy.select(post_table.c.user_id, post_table.c.id).where(post_table.c.id.in_(post_ids))
+    return sqlalchemy.union_all(followers, authors)
+
+
+async def fan_out_posts(post_ids: Iterable[int]) -> None:
+    """
+    Add new posts to their authors' and followers' timelines in a single INSERT.
+    Call it in the transaction that inserts the posts.
+    """
+    await database.execute(
+        timeline_table.insert().from_select(["user_id", "post_id"], select_fan_out(post_ids))
+    )
+
+
+def select_followed_celebrities(user_id: int):
+    """
+    Ids of the authors user_id follows whose posts are merged in on read: those
+    not fanned out, and those whose older posts are still being backfilled.
+    """
+    return (
+        sqlalchemy.select(follow_table.c.followee_id)
+        .select_from(follow_table.join(user_table, user_table.c.id == follow_table.c.followee_id))
+        .where(
+            follow_table.c.follower_id == user_id,
+            sqlalchemy.or_(
+                sqlalchemy.not_(user_table.c.fans_out),
+                user_table.c.id.in_(sqlalchemy.select(timeline_backfill_table.c.followee_id)),
+            ),
+        )
+    )
+
+
+def select_timeline_page(user_id: int, celebrity_ids: list[int], before: int | None, limit: int):
+    """
+    Up to limit posts of user_id's home timeline, newest first, older than the
+    post before. Without celebrities that is the timeline rows alone; with them,
+    the latest limit posts of each are merged in.
+    """
+    if not celebrity_ids:
+        query = (
+            sqlalchemy.select(post_table)
+            .select_from(timeline_table.join(post_table, post_table.c.id == timeline_table.c.post_id))
+            .where(timeline_table.c.user_id == user_id)
+            .order_by(timeline_table.c.post_id.desc())
+        )
+        if before is not None:
+            query = query.where(timeline_table.c.post_id < before)
+        return query.limit(limit)
+
+    def newest(key, condition):
+        query = sqlalchemy.select(key.label("id")).where(condition).order_by(key.desc())
+        return query.where(key < before) if before is not None else query
+
+    sources = [newest(timeline_table.c.post_id, timeline_table.c.user_id == user_id)] + [
+        newest(post_table.c.id, post_table.c.user_id == author_id) for author_id in celebrity_ids
+    ]
+    # each source is limited on its own, so a page reads at most limit rows of each
+    merged = sqlalchemy.union(*(sqlalchemy.select(source.limit(limit).subquery()) for source in sources))
+    return sqlalchemy.select(post_table).where(post_table.c.id.in_(merged)).order_by(post_table.c.id.desc()).limit(limit)
+
+
+async def backfill_timeline(follower_id: int, followee_id: int) -> None:
+    """
+    Copy the latest posts of a newly followed author into the follower's timeline.
+    """
+    latest = (
+        sqlalchemy.select(sqlalchemy.literal(follower_id), post_table.c.id)
+        .where(post_table.c.user_id == followee_id)
+        .order_by(post_table.c.id.desc())
+        .limit(get_config().TIMELINE_MAX_LENGTH)
+    )
+    await database.execute(timeline_table.insert().from_select(["user_id", "post_id"], latest))
+
+
+def select_backfill(followee_id: int, follower_ids: list[int]):
+    """
+    (user_id, post_id) timeline rows for the latest posts of followee_id that
+    the given followers' timelines do not have yet.
+    """
+    latest = (
+        sqlalchemy.select(post_table.c.id)
+        .where(post_table.c.user_id == followee_id)
+        .order_by(post_table.c.id.desc())
+        .limit(get_config().TIMELINE_MAX_LENGTH)
+        .subquery()
+    )
+    copied = sqlalchemy.exists().where(
+        timeline_table.c.user_id == follow_table.c.follower_id, timeline_table.c.post_id == latest.c.id
+    )
+    return (
+        sqlalchemy.select(follow_table.c.follower_id, latest.c.id)
+        .select_from(follow_table.join(latest, sqlalchemy.true()))
+        .where(
+            follow_table.c.followee_id == followee_id,
+            follow_table.c.follower_id.in_(follower_ids),
+            sqlalchemy.not_(copied),
+        )
+    )
+
+
+async def backfill_next_followers(batch: int | None = None) -> bool:
+    """
+    Take one queued backfill a batch of followers further, in a transaction of
+    its own, and finish it once no followers are left. Returns False when no
+    backfill is queued.
+    """
+    batch = batch or get_config().TIMELINE_BACKFILL_BATCH
+    async with database.transaction():
+        backfill = await database.fetch_one(
+            timeline_backfill_table.select()
+            .order_by(timeline_backfill_table.c.followee_id)
+            .limit(1)
+            .with_for_update(skip_locked=True)
+        )
+        if backfill is None:
+            return False
+
+        followee_id = backfill["followee_id"]
+        followers = await database.fetch_all(
+            sqlalchemy.select(follow_table.c.follower_id)
+            .where(
+                follow_table.c.followee_id == followee_id,
+                follow_table.c.follower_id > backfill["last_follower_id"],
+            )
+            .order_by(follow_table.c.follower_id)
+            .limit(batch)
+        )
+        in_queue = timeline_backfill_table.c.followee_id == followee_id
+        if not followers:
+            await database.execute(timeline_backfill_table.delete().where(in_queue))
+            logger.info("Backfilled the timelines of the followers of user %s", followee_id)
+            return True
+
+        follower_ids = [row["follower_id"] for row in followers]
+        await database.execute(
+            timeline_table.insert().from_select(["user_id", "post_id"], select_backfill(followee_id, follower_ids))
+        )
+        await database.execute(
+            timeline_backfill_table.update().where(in_queue).values(last_follower_id=follower_ids[-1])
+        )
+    return True
+
+
+async def backfill_timelines(batch: int | None = None) -> int:
+    """
+    Run the queued backfills to the end and return how many transactions that took.
+    """
+    transactions = 0
+    while await backfill_next_followers(batch):
+        transactions += 1
+    return transactions
+
+
+async def remove_from_timeline(follower_id: int, followee_id: int) -> None:
+    """
+    Drop an unfollowed author's posts from the follower's timeline.
+    """
+    await database.execute(
+        timeline_table.delete().where(
+            timeline_table.c.user_id == follower_id,
+            timeline_table.c.post_id.in_(sqlalchemy.select(post_table.c.id).where(post_table.c.user_id == followee_id)),
+        )
+    )
+
+
+def select_overflow(max_length: int):
+    """
+    Timeline rows past the newest max_length of their user's timeline.
+    """
+    ranked = sqlalchemy.select(
+        timeline_table.c.user_id,
+        timeline_table.c.post_id,
+        sqlalchemy.func.row_number()
+        .over(partition_by=timeline_table.c.user_id, order_by=timeline_table.c.post_id.desc())
+        .label("position"),
+    ).subquery()
+    return sqlalchemy.select(ranked.c.user_id, ranked.c.post_id).where(ranked.c.position > max_length)
+
+
+async def trim_timelines(max_length: int | None = None) -> int:
+    """
+    Cut every timeline back to its newest max_length posts and return how many rows were removed.
+    """
+    overflow = select_overflow(max_length or get_config().TIMELINE_MAX_LENGTH)
+    async with database.transaction():
+        trimmed = await database.fetch_val(sqlalchemy.select(sqlalchemy.func.count()).select_from(overflow.subquery()))
+        if trimmed:
+            await database.execute(
+                timeline_table.delete().where(
+                    sqlalchemy.tuple_(timeline_table.c.user_id, timeline_table.c.post_id).in_(overflow)
+                )
+            )
+    logger.debug("Trimmed %s timeline rows", trimmed)
+    return trimmed
+
+
+class TimelineTrimmer:
+    """
+    Background task owned by the lifespan that trims the timelines every interval
+    seconds, so a timeline outgrows TIMELINE_MAX_LENGTH by at most an interval's posts.
+    """
+
+    def __init__(self, interval: float = 600.0):
+        self.interval = interval
+        self._task: asyncio.Task | None = None
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await trim_timelines()
+            except Exception:
+                logger.exception("Failed to trim timelines")
+
+    def start(self) -> None:
+        if self._task is None and self.interval:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+@lru_cache()
+def get_timeline_trimmer() -> TimelineTrimmer:
+    return TimelineTrimmer(interval=get_config().TIMELINE_TRIM_INTERVAL)
+
+
+class TimelineBackfiller:
+    """
+    Background task owned by the lifespan that runs the queued backfills every
+    interval seconds, one batch of followers per transaction, so no request
+    waits on them.
+    """
+
+    def __init__(self, interval: float = 5.0):
+        self.interval = interval
+        self._task: asyncio.Task | None = None
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await backfill_timelines()
+            except Exception:
+                logger.exception("Failed to backfill timelines")
+
+    def start(self) -> None:
+        if self._task is None and self.interval:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+@lru_cache()
+def get_timeline_backfiller() -> TimelineBackfiller:
+    return TimelineBackfiller(interval=get_config().TIMELINE_BACKFILL_INTERVAL)
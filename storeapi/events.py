@@ -0,0 +1,212 @@
+"""
+In-process publish/subscribe for post, comment and like events, streamed to
+clients over SSE and WebSocket by storeapi/routers/events.py.
+
+Writes publish after they commit. An event is encoded once and handed to every
+matching subscriber's queue without awaiting anything, so a write never waits
+on a client. Subscribers filtering by post id are indexed by post id, so an
+event only visits the subscribers that want it. A subscriber whose queue fills
+up is a slow consumer: it is dropped rather than allowed to hold memory, and
+its client is told to reconnect and catch up with GET /post.
+
+The bus lives in one worker, so with several workers a client only sees the
+events of writes served by the worker it is connected to.
+"""
+
+import asyncio
+import json
+import logging
+from collections import Counter, deque
+from functools import lru_cache
+from typing import Iterable, NamedTuple
+
+from storeapi.app_conf import get_config
+
+logger = logging.getLogger(__name__)
+
+OVERFLOW = "overflow"
+SHUTDOWN = "shutdown"
+
+
+class Event(NamedTuple):
+    id: int
+    type: str
+    post_id: int
+    # the JSON payload and its Server-Sent Events framing, built once per event
+    json: str
+    sse: bytes
+
+
+class SubscriptionClosed(Exception):
+    def __init__(self, reason: str):
+        super().__init__(reason)
+        self.reason = reason
+
+
+class Subscription:
+    """
+    One client's bounded queue of events for the posts in post_ids, or for all
+    posts when post_ids is None. An empty post_ids gets no events.
+    """
+
+    __slots__ = ("post_ids", "max_queue", "closed", "_queue", "_ready")
+
+    def __init__(self, post_ids: frozenset[int] | None, max_queue: int):
+        self.post_ids = post_ids
+        self.max_queue = max_queue
+        self.closed: str | None = None
+        self._queue: deque[Event] = deque()
+        self._ready = asyncio.Event()
+
+    def __len__(self) -> int:
+        return len(self._queue)
+
+    def deliver(self, event: Event) -> bool:
+        """
+        Queue an event, returning False when the queue is full.
+        """
+        if len(self._queue) >= self.max_queue:
+            return False
+        self._queue.append(event)
+        self._ready.set()
+        return True
+
+    def close(self, reason: str) -> None:
+        if self.closed is None:
+            self.closed = reason
+            self._queue.clear()
+            self._ready.set()
+
+    async def get(self, timeout: float | None = None) -> Event | None:
+        """
+        The next event, or None after timeout seconds without one. Raises
+        SubscriptionClosed once the subscription was closed.
+        """
+        if not self._queue and self.closed is None:
+            self._ready.clear()
+            try:
+                await asyncio.wait_for(self._ready.wait(), timeout)
+            except asyncio.TimeoutError:
+                return None
+        if self.closed is not None:
+            raise SubscriptionClosed(self.closed)
+        return self._queue.popleft()
+
+
+class EventBus:
+    def __init__(self, max_queue: int = 100, max_subscribers: int = 10_000):
+        self.max_queue = max_queue
+        self.max_subscribers = max_subscribers
+        self.published = 0
+        self.dropped = 0
+        self._last_id = 0
+        self._subscriptions: set[Subscription] = set()
+        self._all: set[Subscription] = set()
+        self._by_post: dict[int, set[Subscription]] = {}
+
+    def __len__(self) -> int:
+        return len(self._subscriptions)
+
+    @property
+    def full(self) -> bool:
+        return len(self._subscriptions) >= self.max_subscribers
+
+    def subscribe(self, post_ids: Iterable[int] | None = None) -> Subscription:
+        """
+        Subscribe to the events of post_ids, or of all posts when it is None.
+        """
+        subscription = Subscription(None if post_ids is None else frozenset(post_ids), self.max_queue)
+        self._subscriptions.add(subscription)
+        self._index(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        if subscription in self._subscriptions:
+            self._subscriptions.discard(subscription)
+            self._unindex(subscription)
+
+    def update(self, subscription: Subscription, post_ids: Iterable[int] | None) -> None:
+        """
+        Change which posts a live subscription receives events for, all of them when post_ids is None.
+        """
+        if subscription in self._subscriptions:
+            self._unindex(subscription)
+            subscription.post_ids = None if post_ids is None else frozenset(post_ids)
+            self._index(subscription)
+
+    def _index(self, subscription: Subscription) -> None:
+        if subscription.post_ids is None:
+            self._all.add(subscription)
+        for post_id in subscription.post_ids or ():
+            self._by_post.setdefault(post_id, set()).add(subscription)
+
+    def _unindex(self, subscription: Subscription) -> None:
+        if subscription.post_ids is None:
+            self._all.discard(subscription)
+        for post_id in subscription.post_ids or ():
+            subscribers = self._by_post.get(post_id)
+            if subscribers is not None:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._by_post[post_id]
+
+    def publish(self, type: str, post_id: int, **data) -> int:
+        """
+        Hand an event to every subscriber of post_id and to the unfiltered ones,
+        returning how many got it.
+        """
+        by_post = self._by_post.get(post_id)
+        if not self._all and not by_post:
+            return 0
+
+        self._last_id += 1
+        self.published += 1
+        payload = json.dumps({"type": type, "post_id": post_id, **data}, separators=(",", ":"))
+        event = Event(
+            self._last_id, type, post_id, payload, f"id: {self._last_id}\nevent: {type}\ndata: {payload}\n\n".encode()
+        )
+
+        delivered = 0
+        for subscription in (*self._all, *(by_post or ())):
+            if subscription.deliver(event):
+                delivered += 1
+            else:
+                self.unsubscribe(subscription)
+                subscription.close(OVERFLOW)
+                self.dropped += 1
+                logger.debug("Dropped a subscriber %s events behind", subscription.max_queue)
+        return delivered
+
+    def close_all(self) -> None:
+        """
+        End every subscription, so open streams finish before the worker shuts down.
+        """
+        for subscription in self._subscriptions:
+            subscription.close(SHUTDOWN)
+        self._subscriptions.clear()
+        self._all.clear()
+        self._by_post.clear()
+
+
+@lru_cache()
+def get_event_bus() -> EventBus:
+    config = get_config()
+    return EventBus(max_queue=config.EVENTS_QUEUE_SIZE, max_subscribers=config.EVENTS_MAX_SUBSCRIBERS)
+
+
+def publish_posts(posts: Iterable[dict]) -> None:
+    bus = get_event_bus()
+    for post in posts:
+        bus.publish("post", post["id"], user_id=post["user_id"], body=post["body"])
+
+
+def publish_comments(comments: Iterable[dict]) -> None:
+    bus = get_event_bus()
+    for comment in comments:
+        bus.publish("comment", comment["post_id"], id=comment["id"], user_id=comment["user_id"], body=comment["body"])
+
+
+def publish_likes(likes_per_post: Counter) -> None:
+    bus = get_event_bus()
+    for post_id, added in likes_per_post.items():
+        bus.publish("like", post_id, added=added)
@@ -1,4 +1,5 @@
 # storeapi/main.py
+import asyncio
 import logging
 from contextlib import asynccontextmanager
 
@@ -7,9 +8,23 @@ from fastapi import FastAPI, HTTPException
 from starlette.responses import JSONResponse
 
 from storeapi.app_conf import get_config
-from storeapi.configs.logging_conf import configure_logging
+from storeapi.configs.logging_conf import configure_logging, shutdown_logging
+from storeapi.configs.security_conf import get_password_hasher
 from storeapi.database.database import database
+from storeapi.database.hot import get_hot_score_rebaser
+from storeapi.database.like_buffer import get_like_buffer
+from storeapi.database.migrate import upgrade
+from storeapi.database.replicas import get_replicas
+from storeapi.database.timelines import get_timeline_backfiller, get_timeline_trimmer
+from storeapi.events import get_event_bus
+from storeapi.middleware.metrics import MetricsMiddleware
+from storeapi.middleware.query_accounting import QueryAccountingMiddleware
+from storeapi.middleware.rate_limit import ConfiguredRateLimitMiddleware
+from storeapi.middleware.read_your_writes import ReadYourWritesMiddleware
+from storeapi.routers.events import router as events_router
+from storeapi.routers.metrics import router as metrics_router
 from storeapi.routers.post import router as post_router
+from storeapi.routers.timeline import router as timeline_router
 from storeapi.routers.user import router as user_router
 
 logger = logging.getLogger(__name__)
@@ -19,9 +34,28 @@ logger = logging.getLogger(__name__)
 async def lifespan(app: FastAPI):
     configure_logging()
     # logger.debug("Hello World")
+    config = get_config()
+    if config.DB_MIGRATE_ON_STARTUP:
+        await asyncio.to_thread(upgrade)
+    database.bind(config.DATABASE_URL)
     await database.connect()
+    await get_replicas().connect()
+    if config.LIKE_WRITE_BEHIND:
+        get_like_buffer().start()
+    get_hot_score_rebaser().start()
+    get_timeline_trimmer().start()
+    get_timeline_backfiller().start()
     yield
+    # end the event streams first, or the server would wait on them to shut down
+    get_event_bus().close_all()
+    await get_timeline_backfiller().stop()
+    await get_timeline_trimmer().stop()
+    await get_hot_score_rebaser().stop()
+    await get_like_buffer().stop()
+    await get_replicas().disconnect()
     await database.disconnect()
+    get_password_hasher().shutdown()
+    shutdown_logging()
 
 
 app = FastAPI(lifespan=lifespan)
@@ -33,6 +67,15 @@ If the client does not include this header, the CorrelationIdMiddleware will gen
 This correlation ID will then be available for logging and other purposes throughout the request lifecycle.
 """
 
+# the middlewares read their settings on the first request, not when this module is imported
+app.add_middleware(ReadYourWritesMiddleware)
+
+# inside CorrelationIdMiddleware, so the N+1 warning carries the request's correlation id
+app.add_middleware(QueryAccountingMiddleware)
+
+# inside CorrelationIdMiddleware too, so refused requests still get a correlation id
+app.add_middleware(ConfiguredRateLimitMiddleware)
+
 app.add_middleware(
     CorrelationIdMiddleware,
     header_name="X-Correlation-ID",  # Set your custom header name here
@@ -40,6 +83,11 @@ app.add_middleware(
 
 app.include_router(post_router)
 app.include_router(user_router)
+app.include_router(timeline_router)
+app.include_router(events_router)
+app.include_router(metrics_router)
+
+app.add_middleware(MetricsMiddleware)
 
 
 @app.exception_handler(HTTPException)
@@ -0,0 +1,217 @@
+"""
+Minimal Prometheus metrics, rendered in the text exposition format by GET /metrics.
+
+Every update happens on the event loop thread, so counters are plain integers
+and floats without locks. Labelled children are created on first use and then
+looked up by their label tuple, so recording a value allocates nothing new.
+"""
+
+from abc import ABC, abstractmethod
+from bisect import bisect_left
+from typing import Callable, Iterable
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+DB_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+HASH_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: tuple[str, ...], values: tuple, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Metric(ABC):
+    type = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+
+    def header(self) -> list[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type}"]
+
+    @abstractmethod
+    def samples(self) -> list[str]: ...
+
+    def render(self) -> list[str]:
+        return self.header() + self.samples()
+
+
+class Counter(Metric):
+    type = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self.values: dict[tuple, float] = {}
+
+    def inc(self, *labels, amount: float = 1) -> None:
+        self.values[labels] = self.values.get(labels, 0) + amount
+
+    def get(self, *labels) -> float:
+        return self.values.get(labels, 0)
+
+    def samples(self) -> list[str]:
+        return [
+            f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}"
+            for labels, value in self.values.items()
+        ]
+
+
+class Gauge(Counter):
+    type = "gauge"
+
+    def set(self, *labels, value: float) -> None:
+        self.values[labels] = value
+
+    def dec(self, *labels, amount: float = 1) -> None:
+        self.values[labels] = self.values.get(labels, 0) - amount
+
+
+class CallbackGauge(Metric):
+    """
+    Gauge whose values are read when the metrics are scraped, from a callback
+    returning {label values: value}.
+    """
+
+    type = "gauge"
+
+    def __init__(self, name: str, documentation: str, callback: Callable[[], dict], labelnames: Iterable[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self.callback = callback
+
+    def samples(self) -> list[str]:
+        return [
+            f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}"
+            for labels, value in self.callback().items()
+        ]
+
+
+class CallbackCounter(CallbackGauge):
+    type = "counter"
+
+
+class HistogramChild:
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets: tuple[float, ...]):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class Histogram(Metric):
+    type = "histogram"
+
+    def __init__(
+        self, name: str, documentation: str, labelnames: Iterable[str] = (), buckets: tuple[float, ...] = LATENCY_BUCKETS
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self.children: dict[tuple, HistogramChild] = {}
+
+    def labels(self, *labels) -> HistogramChild:
+        child = self.children.get(labels)
+        if child is None:
+            child = self.children[labels] = HistogramChild(self.buckets)
+        return child
+
+    def observe(self, *labels, value: float) -> None:
+        self.labels(*labels).observe(value)
+
+    def samples(self) -> list[str]:
+        lines = []
+        for labels, child in self.children.items():
+            cumulative = 0
+            for bound, count in zip((*self.buckets, float("inf")), child.counts):
+                cumulative += count
+                le = _format_labels(self.labelnames, labels, f'le="{_format_value(bound)}"')
+                lines.append(f"{self.name}_bucket{le} {cumulative}")
+            label_text = _format_labels(self.labelnames, labels)
+            lines.append(f"{self.name}_sum{label_text} {_format_value(child.sum)}")
+            lines.append(f"{self.name}_count{label_text} {child.count}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self.metrics: dict[str, Metric] = {}
+
+    def register(self, metric: Metric) -> Metric:
+        self.metrics[metric.name] = metric
+        return metric
+
+    def render(self) -> str:
+        lines = []
+        for metric in self.metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+http_request_duration = registry.register(
+    Histogram("http_request_duration_seconds", "HTTP request latency by route.", ("method", "route"))
+)
+http_requests = registry.register(
+    Counter("http_requests_total", "HTTP responses by route and status code.", ("method", "route", "status"))
+)
+http_requests_in_flight = registry.register(
+    Gauge("http_requests_in_flight", "HTTP requests currently being served.")
+)
+http_requests_rejected = registry.register(
+    Counter("http_requests_rejected_total", "Requests refused before routing, by reason.", ("reason",))
+)
+http_request_db_queries = registry.register(
+    Histogram(
+        "http_request_db_queries",
+        "Database queries run per request.",
+        ("method", "route"),
+        (1, 2, 3, 5, 10, 20, 50, 100),
+    )
+)
+db_query_duration = registry.register(
+    Histogram("db_query_duration_seconds", "Database call latency by kind of statement.", ("kind",), DB_BUCKETS)
+)
+password_hash_duration = registry.register(
+    Histogram(
+        "password_hash_duration_seconds",
+        "Time spent hashing or verifying a password, including waiting for a worker.",
+        ("operation",),
+        HASH_BUCKETS,
+    )
+)
+
+
+QUERY_KINDS = ("select", "insert", "update", "delete")
+
+
+def query_kind(query) -> str:
+    """
+    select, insert, update, delete or text, for labelling database timings.
+    """
+    if isinstance(query, str):
+        kind = query.lstrip()[:6].lower()
+        return kind if kind in QUERY_KINDS else "text"
+    for kind in QUERY_KINDS:
+        if getattr(query, f"is_{kind}", False):
+            return kind
+    return "other"
@@ -0,0 +1,57 @@
+import time
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from storeapi.app_conf import get_config
+from storeapi.metrics import http_request_duration, http_requests, http_requests_in_flight
+
+# label for requests that matched no route, so scanners cannot blow up the label set
+UNMATCHED_ROUTE = "<unmatched>"
+
+
+class MetricsMiddleware:
+    """
+    Records latency, status codes and in-flight requests per route template.
+    Plain ASGI, like ReadYourWritesMiddleware, so the route keeps the request task.
+    Unless enabled is given, METRICS_ENABLED is read when the first request arrives.
+    Requests to long_lived_paths, such as event streams, are counted but left out
+    of the in-flight gauge and the latency histogram, which they would swamp.
+    """
+
+    def __init__(
+        self, app: ASGIApp, enabled: bool | None = None, long_lived_paths: tuple[str, ...] = ("/events",)
+    ):
+        self.app = app
+        self.enabled = enabled
+        self.long_lived_paths = frozenset(long_lived_paths)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if self.enabled is None:
+            self.enabled = get_config().METRICS_ENABLED
+        if scope["type"] != "http" or not self.enabled:
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+
+        async def send_with_status(message: Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        timed = scope["path"] not in self.long_lived_paths
+        if timed:
+            http_requests_in_flight.inc()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            elapsed = time.perf_counter() - start
+            # the router leaves the matched route in the scope
+            route = scope.get("route")
+            path = route.path if route is not None else UNMATCHED_ROUTE
+            if timed:
+                http_requests_in_flight.dec()
+                http_request_duration.observe(scope["method"], path, value=elapsed)
+            http_requests.inc(scope["method"], path, status)
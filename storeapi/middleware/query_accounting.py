@@ -0,0 +1,54 @@
+import logging
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from storeapi.app_conf import get_config
+from storeapi.database.query_log import end_request, start_request
+from storeapi.metrics import http_request_db_queries
+from storeapi.middleware.metrics import UNMATCHED_ROUTE
+
+logger = logging.getLogger(__name__)
+
+
+class QueryAccountingMiddleware:
+    """
+    Counts the queries each request runs and the time spent in them. The totals
+    go out in a Server-Timing header and the http_request_db_queries histogram,
+    and a request running more than QUERY_COUNT_WARNING queries logs a warning.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        queries, token = start_request()
+
+        async def send_with_timing(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                timing = f'db;dur={queries.seconds * 1000:.1f};desc="{queries.count} queries"'
+                message["headers"] = [*message.get("headers", []), (b"server-timing", timing.encode("latin-1"))]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            end_request(token)
+            route = scope.get("route")
+            path = route.path if route is not None else UNMATCHED_ROUTE
+            http_request_db_queries.observe(scope["method"], path, value=queries.count)
+
+            logger.debug("%s %s ran %s queries in %.1f ms", scope["method"], path, queries.count, queries.seconds * 1000)
+            warn_after = get_config().QUERY_COUNT_WARNING
+            if warn_after is not None and queries.count > warn_after:
+                logger.warning(
+                    "%s %s ran %s queries, more than %s: possible N+1",
+                    scope["method"],
+                    path,
+                    queries.count,
+                    warn_after,
+                    extra={"query_count": queries.count, "db_ms": round(queries.seconds * 1000, 3)},
+                )
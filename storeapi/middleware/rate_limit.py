@@ -0,0 +1,236 @@
+import importlib
+import logging
+import math
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from functools import lru_cache
+
+from jose import JWTError, jwt
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from storeapi.app_conf import get_config
+from storeapi.configs.jwt_conf import ALGORITHM, SECRET_KEY
+from storeapi.metrics import http_requests_rejected
+
+logger = logging.getLogger(__name__)
+
+# (bucket key, tokens added per second, bucket size)
+Limit = tuple[str, float, float]
+
+
+class BucketStore(ABC):
+    """
+    Where the token buckets live. acquire takes a token from every bucket in
+    limits, or from none of them, and returns 0 when it did, otherwise the
+    seconds until all of them will have one. A store shared by several workers
+    (e.g. one backed by Redis) must do this atomically.
+    """
+
+    @abstractmethod
+    async def acquire(self, limits: list[Limit]) -> float: ...
+
+
+class MemoryBucketStore(BucketStore):
+    """
+    Buckets held in this worker, at most max_size of them. Beyond that the least
+    recently used bucket is evicted: one idle long enough to have refilled is no
+    different from a new, full one, so eviction only ever forgives a client.
+    """
+
+    def __init__(self, max_size: int = 100_000, clock=time.monotonic):
+        self.max_size = max_size
+        self.clock = clock
+        self.evictions = 0
+        # key -> [tokens, last refill time]
+        self._buckets: OrderedDict[str, list[float]] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._buckets)
+
+    def _bucket(self, key: str, burst: float, now: float) -> list[float]:
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = self._buckets[key] = [burst, now]
+            if len(self._buckets) > self.max_size:
+                self._buckets.popitem(last=False)
+                self.evictions += 1
+        else:
+            self._buckets.move_to_end(key)
+        return bucket
+
+    async def acquire(self, limits: list[Limit]) -> float:
+        now = self.clock()
+        buckets = []
+        wait = 0.0
+        for key, rate, burst in limits:
+            bucket = self._bucket(key, burst, now)
+            bucket[0] = min(burst, bucket[0] + (now - bucket[1]) * rate)
+            bucket[1] = now
+            if bucket[0] < 1:
+                wait = max(wait, (1 - bucket[0]) / rate)
+            buckets.append(bucket)
+        if wait:
+            return wait
+        for bucket in buckets:
+            bucket[0] -= 1
+        return 0.0
+
+
+@lru_cache()
+def get_bucket_store() -> BucketStore:
+    """
+    The configured RATE_LIMIT_STORE, a "module:factory" called with the config,
+    or buckets kept in memory by this worker.
+    """
+    config = get_config()
+    if config.RATE_LIMIT_STORE:
+        module, _, factory = config.RATE_LIMIT_STORE.partition(":")
+        return getattr(importlib.import_module(module), factory)(config)
+    return MemoryBucketStore(max_size=config.RATE_LIMIT_MAX_BUCKETS)
+
+
+def client_ip(scope: Scope) -> str:
+    # behind a proxy, run uvicorn with --proxy-headers so this is the real client
+    client = scope.get("client")
+    return client[0] if client else "unknown"
+
+
+def token_subject(scope: Scope) -> str | None:
+    """
+    Subject of a valid bearer access token on the request, if any. A token that
+    does not verify is left to the route to reject, and limited by IP only.
+    """
+    for name, value in scope["headers"]:
+        if name == b"authorization":
+            scheme, _, token = value.decode("latin-1").partition(" ")
+            if scheme.lower() != "bearer" or not token:
+                return None
+            try:
+                payload = jwt.decode(token, key=SECRET_KEY, algorithms=[ALGORITHM])
+            except JWTError:
+                return None
+            return payload.get("sub") if payload.get("type") == "access" else None
+    return None
+
+
+class RateLimitMiddleware:
+    """
+    Token buckets per client IP, per authenticated user and, for the routes in
+    route_limits, per client on that route: a request over any of them gets a 429
+    with Retry-After. Past max_in_flight concurrent requests, new ones get a 503,
+    so overload is shed at the door instead of queueing behind everyone else.
+    Requests to long_lived_paths, such as event streams that stay open while
+    idle, are rate limited but not counted in flight.
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        store: BucketStore | None = None,
+        ip_limit: tuple[float, float] | None = None,
+        user_limit: tuple[float, float] | None = None,
+        route_limits: dict[str, tuple[float, float]] | None = None,
+        max_in_flight: int = 0,
+        exempt_paths: tuple[str, ...] = ("/metrics",),
+        long_lived_paths: tuple[str, ...] = ("/events",),
+    ):
+        self.app = app
+        self.store = store or get_bucket_store()
+        self.ip_limit = ip_limit if ip_limit and ip_limit[0] > 0 else None
+        self.user_limit = user_limit if user_limit and user_limit[0] > 0 else None
+        self.route_limits = {route: limit for route, limit in (route_limits or {}).items() if limit[0] > 0}
+        self.max_in_flight = max_in_flight
+        self.exempt_paths = frozenset(exempt_paths)
+        self.long_lived_paths = frozenset(long_lived_paths)
+        self.in_flight = 0
+
+    def limits_for(self, scope: Scope) -> list[Limit]:
+        ip = client_ip(scope)
+        limits = []
+        if self.ip_limit:
+            limits.append((f"ip:{ip}", *self.ip_limit))
+
+        route = f"{scope['method']} {scope['path']}"
+        route_limit = self.route_limits.get(route)
+        if self.user_limit or route_limit:
+            subject = token_subject(scope)
+            client = f"user:{subject}" if subject else f"ip:{ip}"
+            if self.user_limit and subject:
+                limits.append((client, *self.user_limit))
+            if route_limit:
+                limits.append((f"{route} {client}", *route_limit))
+        return limits
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or scope["path"] in self.exempt_paths:
+            await self.app(scope, receive, send)
+            return
+
+        limits = self.limits_for(scope)
+        wait = await self.store.acquire(limits) if limits else 0.0
+        if wait:
+            http_requests_rejected.inc("rate_limited")
+            logger.debug("Rate limited %s %s from %s", scope["method"], scope["path"], client_ip(scope))
+            response = JSONResponse(
+                status_code=429,
+                content={"detail": "Too many requests"},
+                headers={"Retry-After": str(max(1, math.ceil(wait)))},
+            )
+            await response(scope, receive, send)
+            return
+
+        if scope["path"] in self.long_lived_paths:
+            await self.app(scope, receive, send)
+            return
+
+        if self.max_in_flight and self.in_flight >= self.max_in_flight:
+            http_requests_rejected.inc("overloaded")
+            logger.debug("%s requests in flight, shedding %s %s", self.in_flight, scope["method"], scope["path"])
+            response = JSONResponse(
+                status_code=503,
+                content={"detail": "Server is busy, please retry"},
+                headers={"Retry-After": "1"},
+            )
+            await response(scope, receive, send)
+            return
+
+        self.in_flight += 1
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.in_flight -= 1
+
+
+def rate_limit_options(config) -> dict:
+    """
+    RateLimitMiddleware arguments from the RATE_LIMIT_* settings.
+    """
+    return {
+        "ip_limit": (config.RATE_LIMIT_IP_RATE, config.RATE_LIMIT_IP_BURST),
+        "user_limit": (config.RATE_LIMIT_USER_RATE, config.RATE_LIMIT_USER_BURST),
+        "route_limits": config.RATE_LIMIT_ROUTES,
+        "max_in_flight": config.RATE_LIMIT_MAX_IN_FLIGHT,
+    }
+
+
+class ConfiguredRateLimitMiddleware:
+    """
+    RateLimitMiddleware set up from the RATE_LIMIT_* settings when the first
+    request arrives rather than when the app is built, so storeapi.main can be
+    imported before its environment is in place. With RATE_LIMIT_ENABLED off,
+    requests pass straight through.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+        self.handler: ASGIApp | None = None
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if self.handler is None:
+            config = get_config()
+            self.handler = (
+                RateLimitMiddleware(self.app, **rate_limit_options(config)) if config.RATE_LIMIT_ENABLED else self.app
+            )
+        await self.handler(scope, receive, send)
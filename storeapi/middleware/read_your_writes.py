@@ -0,0 +1,58 @@
+import time
+
+from starlette.requests import cookie_parser
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from storeapi.app_conf import get_config
+from storeapi.database.replicas import pin_to_primary, unpin
+
+SAFE_METHODS = frozenset({"GET", "HEAD", "OPTIONS"})
+
+LAST_WRITE_COOKIE = "last_write"
+
+
+class ReadYourWritesMiddleware:
+    """
+    Marks clients that just wrote with a cookie holding the time of the write.
+    For `window` seconds after it, their reads go to the primary instead of a
+    replica that may not have caught up yet. Without a window, READ_YOUR_WRITES_WINDOW
+    is read when the first request arrives.
+
+    Plain ASGI rather than BaseHTTPMiddleware, so the route runs in the same
+    task and keeps its database connection.
+    """
+
+    def __init__(self, app: ASGIApp, window: float | None = None):
+        self.app = app
+        self.window = window
+
+    def wrote_recently(self, scope: Scope) -> bool:
+        for name, value in scope["headers"]:
+            if name == b"cookie":
+                last_write = cookie_parser(value.decode("latin-1")).get(LAST_WRITE_COOKIE)
+                try:
+                    return time.time() - float(last_write) < self.window
+                except (TypeError, ValueError):
+                    return False
+        return False
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if self.window is None:
+            self.window = get_config().READ_YOUR_WRITES_WINDOW
+        if scope["type"] != "http" or self.window <= 0:
+            await self.app(scope, receive, send)
+            return
+
+        is_write = scope["method"] not in SAFE_METHODS
+
+        async def send_with_cookie(message: Message) -> None:
+            if message["type"] == "http.response.start" and message["status"] < 400:
+                cookie = f"{LAST_WRITE_COOKIE}={time.time():.3f}; Max-Age={int(self.window) + 1}; Path=/; HttpOnly; SameSite=Lax"
+                message["headers"] = [*message.get("headers", []), (b"set-cookie", cookie.encode("latin-1"))]
+            await send(message)
+
+        token = pin_to_primary(is_write or self.wrote_recently(scope))
+        try:
+            await self.app(scope, receive, send_with_cookie if is_write else send)
+        finally:
+            unpin(token)
@@ -43,4 +43,10 @@ class PostLike(PostLikeIn):
     id: int
     user_id: int
 
-    model_config = {"from_attributes": True}
\ No newline at end of file
+    model_config = {"from_attributes": True}
+
+
+class BatchItemResult(BaseModel):
+    index: int
+    id: int | None = None
+    error: str | None = None
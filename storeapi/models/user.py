@@ -10,3 +10,12 @@ class User(BaseModel):
 
 class UserIn(User):
     password: str
+
+
+class FollowIn(BaseModel):
+    user_id: int
+
+
+class Follow(BaseModel):
+    follower_id: int
+    followee_id: int
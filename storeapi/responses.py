@@ -0,0 +1,231 @@
+import hashlib
+import logging
+import time
+from functools import lru_cache
+from types import NoneType, UnionType
+from typing import Any, AsyncIterator, Callable, Union, get_args, get_origin
+from urllib.parse import urlencode
+
+from fastapi import Request
+from pydantic import BaseModel, TypeAdapter
+from pydantic_core import PydanticUndefined
+from starlette.responses import Response, StreamingResponse
+
+from storeapi.app_conf import get_config
+from storeapi.configs.cache_conf import CachedResponse
+from storeapi.database.database import Database, database
+from storeapi.database.query_log import record_query
+from storeapi.metrics import db_query_duration, query_kind
+
+try:
+    import orjson
+except ImportError:  # without orjson every response is validated and encoded by pydantic
+    orjson = None
+
+logger = logging.getLogger(__name__)
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+
+# rows are written out in chunks of about this many bytes
+STREAM_CHUNK_SIZE = 64 * 1024
+
+
+def wants_ndjson(request: Request) -> bool:
+    return NDJSON_MEDIA_TYPE in request.headers.get("accept", "")
+
+
+async def encode_rows(rows: AsyncIterator, model: type[BaseModel], ndjson: bool = False) -> AsyncIterator[bytes]:
+    """
+    Encode rows one at a time, as a JSON array or as NDJSON.
+    Only the current chunk is held in memory, whatever the number of rows.
+    """
+    separator = b"\n" if ndjson else b","
+    chunk = bytearray() if ndjson else bytearray(b"[")
+    first = True
+    encode = row_encoder(model)
+
+    async for row in rows:
+        if not first:
+            chunk += separator
+        first = False
+        chunk += encode(row)
+
+        if len(chunk) >= STREAM_CHUNK_SIZE:
+            yield bytes(chunk)
+            chunk.clear()
+
+    if ndjson:
+        if not first:
+            chunk += b"\n"
+    else:
+        chunk += b"]"
+    if chunk:
+        yield bytes(chunk)
+
+
+def stream_rows(request: Request, query, model: type[BaseModel], db: Database = database) -> StreamingResponse:
+    """
+    Stream the rows of query with database.iterate instead of fetching them all.
+    The connection is taken in the handler's task, so the stream sees the same
+    connection (and transaction) as the rest of the request.
+    """
+    connection = db.connection()
+    # counted here, so the Server-Timing header sent before the rows includes it
+    record_query(query, 0.0)
+
+    async def rows():
+        # timed from the first fetch until the rows run out, which includes the
+        # time the client takes to read them, since rows are fetched as it reads
+        async with connection:
+            start = time.perf_counter()
+            try:
+                async for row in connection.iterate(query):
+                    yield row
+            finally:
+                elapsed = time.perf_counter() - start
+                db_query_duration.observe(query_kind(query), value=elapsed)
+                record_query(query, elapsed, count=False)
+
+    ndjson = wants_ndjson(request)
+    logger.debug("Streaming %s rows as %s", model.__name__, "ndjson" if ndjson else "json")
+    return StreamingResponse(
+        encode_rows(rows(), model, ndjson),
+        media_type=NDJSON_MEDIA_TYPE if ndjson else "application/json",
+    )
+
+
+@lru_cache()
+def get_type_adapter(annotation: Any) -> TypeAdapter:
+    return TypeAdapter(annotation)
+
+
+SCALAR_TYPES = (int, float, str, bool, NoneType)
+
+
+def _is_model(annotation: Any) -> bool:
+    return isinstance(annotation, type) and issubclass(annotation, BaseModel)
+
+
+def _union_args(annotation: Any) -> tuple:
+    return get_args(annotation) if get_origin(annotation) in (Union, UnionType) else (annotation,)
+
+
+@lru_cache()
+def field_plan(model: type[BaseModel]) -> tuple | None:
+    """
+    (name, default, nested model, is list) for every field of model, or None when
+    the model needs pydantic to serialize it: a field that is not a scalar, a model
+    or a list of models, an alias, or a custom serializer.
+    """
+    decorators = model.__pydantic_decorators__
+    if model.model_computed_fields or decorators.field_serializers or decorators.model_serializers:
+        return None
+
+    plan = []
+    for name, field in model.model_fields.items():
+        if field.serialization_alias not in (None, name) or field.alias not in (None, name):
+            return None
+        annotation, many = field.annotation, False
+        if get_origin(annotation) is list:
+            (annotation,), many = get_args(annotation), True
+        if _is_model(annotation):
+            if field_plan(annotation) is None:
+                return None
+            nested = annotation
+        elif not many and all(arg in SCALAR_TYPES for arg in _union_args(annotation)):
+            nested = None
+        else:
+            return None
+        default = field.get_default(call_default_factory=True) if not field.is_required() else PydanticUndefined
+        plan.append((name, default, nested, many))
+    return tuple(plan)
+
+
+def to_plain(model: type[BaseModel], data) -> dict:
+    """
+    The dict model would dump for data, a Record or mapping from our own tables,
+    read field by field without validating it.
+    """
+    # a databases Record looks each column up through its result processor; the
+    # driver row underneath holds the same plain values for our columns, faster
+    data = getattr(data, "_mapping", data)
+    plain = {}
+    for name, default, nested, many in field_plan(model):
+        if default is PydanticUndefined:
+            value = data[name]
+        else:
+            try:
+                value = data[name]
+            except KeyError:
+                value = default
+        if nested is not None and value is not None:
+            value = [to_plain(nested, item) for item in value] if many else to_plain(nested, value)
+        plain[name] = value
+    return plain
+
+
+def fast_json_model(annotation: Any) -> tuple[type[BaseModel] | None, bool]:
+    """
+    The model (and whether a list of it) to encode annotation with orjson, or
+    (None, False) when pydantic has to validate and encode it.
+    """
+    if orjson is None or not get_config().RESPONSE_FAST_JSON:
+        return None, False
+    many = get_origin(annotation) is list
+    model = get_args(annotation)[0] if many else annotation
+    if _is_model(model) and field_plan(model) is not None:
+        return model, many
+    return None, False
+
+
+def row_encoder(model: type[BaseModel]) -> Callable[[Any], bytes]:
+    fast_model, _ = fast_json_model(model)
+    if fast_model is not None:
+        return lambda row: orjson.dumps(to_plain(model, row))
+    return lambda row: model.model_validate(dict(row)).model_dump_json().encode("utf-8")
+
+
+def dump_json(data: Any, annotation: Any) -> bytes:
+    """
+    Encode data as the response annotation, a model or a list of models, straight
+    to bytes. Rows are read into plain dicts and encoded by orjson when the models
+    allow it; otherwise, or with RESPONSE_FAST_JSON off, they are validated against
+    the annotation and encoded the way FastAPI would for a response_model.
+    """
+    model, many = fast_json_model(annotation)
+    if model is not None:
+        return orjson.dumps([to_plain(model, item) for item in data] if many else to_plain(model, data))
+    adapter = get_type_adapter(annotation)
+    return adapter.dump_json(adapter.validate_python(data, from_attributes=True))
+
+
+def make_etag(body: bytes) -> str:
+    return '"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"'
+
+
+def cache_key(request: Request) -> str:
+    return f"{request.url.path}?{urlencode(sorted(request.query_params.multi_items()))}"
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    if_none_match = request.headers.get("if-none-match")
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    candidates = (candidate.strip() for candidate in if_none_match.split(","))
+    return etag in (candidate.removeprefix("W/") for candidate in candidates)
+
+
+def build_cached_response(body: bytes, headers: dict | None = None) -> CachedResponse:
+    return CachedResponse(body=body, etag=make_etag(body), headers=headers)
+
+
+def conditional_response(request: Request, cached: CachedResponse) -> Response:
+    """
+    Answer with 304 Not Modified when the client already holds this ETag, otherwise with the body.
+    """
+    headers = {**(cached.headers or {}), "ETag": cached.etag}
+    if etag_matches(request, cached.etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=cached.body, media_type=cached.media_type, headers=headers)
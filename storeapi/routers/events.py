@@ -0,0 +1,120 @@
+import asyncio
+import logging
+from typing import Annotated, AsyncIterator
+
+from fastapi import APIRouter, HTTPException, Query, WebSocket, WebSocketDisconnect
+from starlette.responses import StreamingResponse
+
+from storeapi.app_conf import get_config
+from storeapi.events import OVERFLOW, Subscription, SubscriptionClosed, get_event_bus
+
+router = APIRouter()
+
+logger = logging.getLogger(__name__)
+
+# posts one connection may filter on
+MAX_POST_FILTERS = 100
+
+# WebSocket close codes: the server is going away, or the client should reconnect later
+GOING_AWAY = 1001
+TRY_AGAIN_LATER = 1013
+
+
+async def sse_events(post_ids: list[int] | None, keepalive: float) -> AsyncIterator[bytes]:
+    """
+    Server-Sent Events for a new subscription, with a comment line every keepalive
+    seconds so proxies keep idle connections open. Ends with an overflow or
+    shutdown event when the bus drops the subscription.
+    """
+    bus = get_event_bus()
+    subscription = bus.subscribe(post_ids)
+    try:
+        yield b": subscribed\n\n"
+        while True:
+            try:
+                event = await subscription.get(keepalive)
+            except SubscriptionClosed as e:
+                yield f"event: {e.reason}\ndata: {{}}\n\n".encode()
+                return
+            yield event.sse if event is not None else b": keepalive\n\n"
+    finally:
+        bus.unsubscribe(subscription)
+
+
+@router.get("/events")
+async def stream_events(post_id: Annotated[list[int] | None, Query(max_length=MAX_POST_FILTERS)] = None):
+    """
+    Stream post, comment and like events as Server-Sent Events, for the posts
+    given as `post_id` (repeatable) or for all posts. A client that falls too
+    far behind gets an `overflow` event and is disconnected; it should reload
+    what it shows with GET /post and reconnect.
+    """
+    if get_event_bus().full:
+        raise HTTPException(status_code=503, detail="Too many event subscribers", headers={"Retry-After": "5"})
+
+    logger.debug("Streaming events for posts %s", post_id or "all")
+    return StreamingResponse(
+        sse_events(post_id, get_config().EVENTS_KEEPALIVE),
+        media_type="text/event-stream",
+        # keep proxies from caching or buffering the stream
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+async def receive_filters(websocket: WebSocket, subscription: Subscription) -> None:
+    """
+    Apply {"post_ids": [...]} messages (null for all posts, [] for none) to the
+    subscription until the client disconnects. Any other message leaves the
+    filter as it is.
+    """
+    bus = get_event_bus()
+    try:
+        while True:
+            message = await websocket.receive_json()
+            if not isinstance(message, dict) or "post_ids" not in message:
+                logger.debug("Ignoring malformed event filter %r", message)
+                continue
+            post_ids = message["post_ids"]
+            if post_ids is None:
+                bus.update(subscription, None)
+            elif isinstance(post_ids, list) and all(isinstance(post_id, int) for post_id in post_ids):
+                bus.update(subscription, post_ids[:MAX_POST_FILTERS])
+            else:
+                logger.debug("Ignoring malformed event filter %r", message)
+    except (WebSocketDisconnect, ValueError):
+        pass
+    finally:
+        subscription.close("disconnected")
+
+
+@router.websocket("/events/ws")
+async def events_websocket(
+    websocket: WebSocket, post_id: Annotated[list[int] | None, Query(max_length=MAX_POST_FILTERS)] = None
+):
+    """
+    The events of GET /events as one JSON text message each. The client may
+    change its filter at any time by sending {"post_ids": [...]}.
+    """
+    bus = get_event_bus()
+    if bus.full:
+        await websocket.close(code=TRY_AGAIN_LATER)
+        return
+
+    await websocket.accept()
+    subscription = bus.subscribe(post_id)
+    receiver = asyncio.create_task(receive_filters(websocket, subscription))
+    try:
+        while True:
+            # no keepalive needed, the server pings WebSocket connections itself
+            event = await subscription.get()
+            await websocket.send_text(event.json)
+    except SubscriptionClosed as e:
+        if e.reason == OVERFLOW:
+            await websocket.close(code=TRY_AGAIN_LATER, reason=OVERFLOW)
+        elif e.reason != "disconnected":
+            await websocket.close(code=GOING_AWAY, reason=e.reason)
+    except WebSocketDisconnect:
+        pass
+    finally:
+        receiver.cancel()
+        bus.unsubscribe(subscription)
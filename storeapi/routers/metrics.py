@@ -0,0 +1,129 @@
+from fastapi import APIRouter, HTTPException
+from starlette.responses import Response
+
+from storeapi.app_conf import get_config
+from storeapi.configs.cache_conf import get_response_cache, get_user_cache
+from storeapi.configs.logging_conf import log_records_dropped
+from storeapi.configs.security_conf import get_password_hasher
+from storeapi.database.database import database
+from storeapi.database.like_buffer import get_like_buffer
+from storeapi.database.replicas import get_replicas
+from storeapi.events import get_event_bus
+from storeapi.metrics import CallbackCounter, CallbackGauge, registry
+from storeapi.middleware.rate_limit import MemoryBucketStore, get_bucket_store
+
+router = APIRouter()
+
+PROMETHEUS_MEDIA_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def connected_pools() -> dict[str, dict]:
+    pools = {}
+    if database.is_connected:
+        stats = database.pool_stats()
+        writer = stats.pop("writer", None)
+        pools["primary"] = stats
+        if writer is not None:
+            pools["writer"] = writer
+    for index, replica in enumerate(get_replicas().databases):
+        if replica.is_connected:
+            pools[f"replica-{index}"] = replica.pool_stats()
+    return pools
+
+
+def pool_connections() -> dict:
+    values = {}
+    for name, stats in connected_pools().items():
+        for state in ("in_use", "idle", "waiters"):
+            values[(name, state)] = stats[state]
+    return values
+
+
+def rate_limit_buckets() -> dict:
+    store = get_bucket_store()
+    return {(): len(store)} if isinstance(store, MemoryBucketStore) else {}
+
+
+def cache_stats() -> dict[str, dict]:
+    return {"user": get_user_cache().stats(), "response": get_response_cache().stats()}
+
+
+for metric in (
+    CallbackGauge(
+        "cache_hit_ratio",
+        "Share of cache lookups that were hits since startup.",
+        lambda: {(name,): stats["hit_ratio"] for name, stats in cache_stats().items()},
+        ("cache",),
+    ),
+    CallbackGauge(
+        "cache_entries",
+        "Entries currently held by each cache.",
+        lambda: {(name,): stats["size"] for name, stats in cache_stats().items()},
+        ("cache",),
+    ),
+    CallbackGauge(
+        "response_cache_bytes",
+        "Bytes of response bodies held by the response cache.",
+        lambda: {(): get_response_cache().size_bytes},
+    ),
+    CallbackGauge(
+        "db_pool_connections",
+        "Database connections checked out, idle, or being waited for.",
+        pool_connections,
+        ("pool", "state"),
+    ),
+    CallbackCounter(
+        "db_pool_acquire_timeouts_total",
+        "Requests answered 503 because no database connection became free in time.",
+        lambda: {(name,): stats["acquire_timeouts"] for name, stats in connected_pools().items()},
+        ("pool",),
+    ),
+    CallbackGauge(
+        "password_hash_pending",
+        "Password hashing calls running or waiting for a worker.",
+        lambda: {(): get_password_hasher().pending},
+    ),
+    CallbackCounter(
+        "password_hash_rejected_total",
+        "Password hashing calls rejected with 503 because the queue was full.",
+        lambda: {(): get_password_hasher().rejected},
+    ),
+    CallbackGauge(
+        "like_buffer_pending",
+        "Likes accepted but not yet written to the database.",
+        lambda: {(): len(get_like_buffer())},
+    ),
+    CallbackGauge(
+        "rate_limit_buckets",
+        "Token buckets held in this worker by the rate limiter.",
+        rate_limit_buckets,
+    ),
+    CallbackGauge(
+        "event_subscribers",
+        "Open event stream connections in this worker.",
+        lambda: {(): len(get_event_bus())},
+    ),
+    CallbackCounter(
+        "events_published_total",
+        "Events handed to at least one subscriber.",
+        lambda: {(): get_event_bus().published},
+    ),
+    CallbackCounter(
+        "event_subscribers_dropped_total",
+        "Event subscribers disconnected for falling too far behind.",
+        lambda: {(): get_event_bus().dropped},
+    ),
+    CallbackCounter(
+        "log_records_dropped_total",
+        "Log records dropped because the log queue was full.",
+        lambda: {(): log_records_dropped()},
+    ),
+):
+    registry.register(metric)
+
+
+@router.get("/metrics", include_in_schema=False)
+async def metrics():
+    if not get_config().METRICS_ENABLED:
+        raise HTTPException(status_code=404, detail="Not Found")
+    return Response(content=registry.render(), media_type=PROMETHEUS_MEDIA_TYPE)
@@ -1,16 +1,40 @@
 import logging
+from collections import Counter
 from enum import Enum
 from typing import Annotated
 
 import sqlalchemy
-from fastapi import APIRouter, Depends, HTTPException, Request
-
+from fastapi import APIRouter, Body, Depends, HTTPException, Query, Request
+from starlette.responses import JSONResponse, Response
+
+from storeapi.app_conf import get_config
+from storeapi.configs.cache_conf import (
+    HOT_POSTS_TAG,
+    NEW_POSTS_TAG,
+    POST_RANKING_TAG,
+    comments_tag,
+    get_response_cache,
+    invalidate_posts_commented,
+    invalidate_posts_created,
+    invalidate_posts_liked,
+    post_tag,
+)
 from storeapi.configs.jwt_conf import oauth2_scheme
 from storeapi.configs.security_conf import get_current_user
+from storeapi.database.bulk import bulk_insert, find_existing_post_ids, increment_like_counts
 from storeapi.database.database import comment_table, database, post_table, like_table
-from storeapi.models.post import (Comment, CommentIn, PostLike, PostLikeIn,
+from storeapi.database.hot import add_comment_scores, current_epoch, hot_weight, rescale_cursor
+from storeapi.database.like_buffer import get_like_buffer
+from storeapi.database.loaders import CommentLoader
+from storeapi.database.pagination import decode_cursor, encode_cursor
+from storeapi.database.replicas import get_replicas, pinned_to_primary, read_database
+from storeapi.database.search import dialect_of, search_terms, select_matching_posts
+from storeapi.database.timelines import fan_out_posts
+from storeapi.events import publish_comments, publish_likes, publish_posts
+from storeapi.models.post import (BatchItemResult, Comment, CommentIn, PostLike, PostLikeIn,
                                   UserPost, UserPostIn, UserPostWithComments, UserPostWithLikes)
 from storeapi.models.user import User
+from storeapi.responses import build_cached_response, cache_key, conditional_response, dump_json, stream_rows
 
 router = APIRouter()
 
@@ -18,11 +42,12 @@ router = APIRouter()
 logger = logging.getLogger(__name__)
 
 
-select_post_and_likes = (
-    sqlalchemy.select(post_table, sqlalchemy.func.count(like_table.c.id).label("likes"))
-    .select_from(post_table.outerjoin(like_table))
-    .group_by(post_table.c.id)
-)
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+MAX_BATCH_SIZE = 1000
+
+# likes is a maintained counter on posts, so reads no longer join or group the likes table
+select_post_and_likes = sqlalchemy.select(post_table)
 
 
 async def find_post(post_id: int):
@@ -43,8 +68,12 @@ async def create_post(post: UserPostIn, current_user: Annotated[User, Depends(ge
     # current_user = await get_current_user(await oauth2_scheme(request))
 
     data = {**post.model_dump(), "user_id": current_user.id}
-    query = post_table.insert().values(**data)
-    last_record_id = await database.execute(query)
+    async with database.transaction():
+        hot_score = await hot_weight(get_config().HOT_POST_WEIGHT)
+        last_record_id = await database.execute(post_table.insert().values(**data, hot_score=hot_score))
+        await fan_out_posts([last_record_id])
+    invalidate_posts_created()
+    publish_posts([{**data, "id": last_record_id}])
     return {**data, "id": last_record_id}
 
 
@@ -52,24 +81,256 @@ class PostSorting(str, Enum):
     new = "new"
     old = "old"
     most_likes = "most_likes"
+    hot = "hot"
 
 
-@router.get("/post", response_model=list[UserPostWithLikes], status_code=200)
-async def get_all_posts(sorting: PostSorting = PostSorting.new):
-
-    logger.info("Fetching all posts with sorting: %s", sorting)
-
+def paginate_posts(query, sorting: PostSorting, cursor: dict | None):
+    """
+    Apply keyset ordering for the given sorting, continuing after the cursor position.
+    Every mode breaks ties on id so pages never overlap or skip rows.
+    """
     if sorting == PostSorting.new:
-        query = select_post_and_likes.order_by(post_table.c.id.desc())
+        query = query.order_by(post_table.c.id.desc())
+        if cursor:
+            query = query.where(post_table.c.id < cursor["id"])
 
     elif sorting == PostSorting.old:
-        query = select_post_and_likes.order_by(post_table.c.id.asc())
+        query = query.order_by(post_table.c.id.asc())
+        if cursor:
+            query = query.where(post_table.c.id > cursor["id"])
 
     elif sorting == PostSorting.most_likes:
-        query = select_post_and_likes.order_by(sqlalchemy.desc("likes"))
+        query = query.order_by(post_table.c.likes.desc(), post_table.c.id.desc())
+        if cursor:
+            query = query.where(
+                sqlalchemy.or_(
+                    post_table.c.likes < cursor["likes"],
+                    sqlalchemy.and_(post_table.c.likes == cursor["likes"], post_table.c.id < cursor["id"]),
+                )
+            )
+
+    elif sorting == PostSorting.hot:
+        # the cursor's score has already been moved to the current epoch by the caller
+        query = query.order_by(post_table.c.hot_score.desc(), post_table.c.id.desc())
+        if cursor:
+            query = query.where(
+                sqlalchemy.or_(
+                    post_table.c.hot_score < cursor["score"],
+                    sqlalchemy.and_(post_table.c.hot_score == cursor["score"], post_table.c.id < cursor["id"]),
+                )
+            )
+
+    return query
+
+
+async def posts_page_query(db, sorting: PostSorting, cursor: dict | None):
+    """
+    paginate_posts over select_post_and_likes, and for hot sorting the current epoch,
+    with the cursor's score moved to it in case the scores were rebased since.
+    """
+    hot_epoch = None
+    if sorting == PostSorting.hot:
+        hot_epoch = await current_epoch(db)
+        if cursor:
+            cursor = {**cursor, "score": rescale_cursor(cursor, hot_epoch)}
+    return paginate_posts(select_post_and_likes, sorting, cursor), hot_epoch
+
+
+def cursor_for_post(post, sorting: PostSorting, hot_epoch: float | None = None) -> str:
+    if sorting == PostSorting.most_likes:
+        return encode_cursor(sorting=sorting.value, id=post["id"], likes=post["likes"])
+    if sorting == PostSorting.hot:
+        # scores are only comparable within an epoch, so the cursor says which one it is in
+        return encode_cursor(sorting=sorting.value, id=post["id"], score=post["hot_score"], epoch=hot_epoch)
+    return encode_cursor(sorting=sorting.value, id=post["id"])
+
+
+def parse_post_cursor(cursor: str | None, sorting: PostSorting) -> dict | None:
+    if cursor is None:
+        return None
+    try:
+        values = decode_cursor(cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail="Invalid cursor") from e
+
+    if values.get("sorting") != sorting.value:
+        raise HTTPException(status_code=400, detail="Cursor does not match sorting")
+
+    expected = ("id", "likes") if sorting == PostSorting.most_likes else ("id",)
+    if not all(isinstance(values.get(key), int) for key in expected):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if sorting == PostSorting.hot and not (
+        isinstance(values.get("score"), (int, float)) and isinstance(values.get("epoch"), (int, float, type(None)))
+    ):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return values
+
+
+class PostInclude(str, Enum):
+    comments = "comments"
+
+
+def with_comments(post, comments) -> dict:
+    # the UserPostWithComments shape, left for dump_json to encode (and validate, if it does)
+    return {**post, "post": post, "comments": comments}
+
+
+def lookup_cached(key: str):
+    """
+    Cached response for key, skipped for clients in their read-your-writes window:
+    the entry may have been built from a replica that had not seen their write.
+    """
+    if pinned_to_primary() and get_replicas():
+        return None
+    return get_response_cache().get(key)
+
+
+def post_list_tags(posts, sorting: PostSorting, first_page: bool, last_page: bool) -> set[str]:
+    """
+    Cache tags for a page of posts: the posts on it, plus the list tag of any
+    write that can change which posts the page holds.
+    """
+    tags = {post_tag(post["id"]) for post in posts}
+    if sorting == PostSorting.most_likes:
+        tags.add(POST_RANKING_TAG)
+    elif sorting == PostSorting.hot:
+        tags.add(HOT_POSTS_TAG)
+    elif (sorting == PostSorting.new and first_page) or (sorting == PostSorting.old and last_page):
+        tags.add(NEW_POSTS_TAG)
+    return tags
+
+
+@router.get(
+    "/post",
+    response_model=list[UserPostWithLikes] | list[UserPostWithComments],
+    status_code=200,
+)
+async def get_all_posts(
+    request: Request,
+    sorting: PostSorting = PostSorting.new,
+    limit: Annotated[int | None, Query(ge=1, le=MAX_PAGE_SIZE)] = None,
+    cursor: str | None = None,
+    stream: bool = False,
+    include: PostInclude | None = None,
+):
+    """
+    Return one page of posts. When more posts are available, the X-Next-Cursor
+    response header carries the token to pass as `cursor` for the next page.
+
+    With `include=comments` every post comes in the UserPostWithComments shape,
+    with the comments for the whole page loaded in a single query.
+
+    With `stream=true` every post after `cursor` (up to `limit`, if given) is
+    streamed as a JSON array, or as NDJSON when the client accepts application/x-ndjson.
+    """
+
+    logger.info("Fetching all posts with sorting: %s", sorting)
+
+    position = parse_post_cursor(cursor, sorting)
+    db = read_database()
+
+    if stream:
+        if include is not None:
+            raise HTTPException(status_code=400, detail="include is not supported when streaming")
+        query, _ = await posts_page_query(db, sorting, position)
+        if limit is not None:
+            query = query.limit(limit)
+        logger.debug(query)
+        return stream_rows(request, query, UserPostWithLikes, db)
+
+    response_cache = get_response_cache()
+    key = cache_key(request)
+    cached = lookup_cached(key)
+    if cached is None:
+        generation = response_cache.generation
+        limit = limit or DEFAULT_PAGE_SIZE
+        query, hot_epoch = await posts_page_query(db, sorting, position)
+        query = query.limit(limit + 1)
+
+        logger.debug(query)
+        posts = await db.fetch_all(query)
+
+        headers = {}
+        if len(posts) > limit:
+            posts = posts[:limit]
+            headers["X-Next-Cursor"] = cursor_for_post(posts[-1], sorting, hot_epoch)
+
+        tags = post_list_tags(posts, sorting, position is None, not headers)
+        if include == PostInclude.comments:
+            post_ids = [post["id"] for post in posts]
+            comments = await CommentLoader(db).load_many(post_ids)
+            body = dump_json(list(map(with_comments, posts, comments)), list[UserPostWithComments])
+            tags.update(comments_tag(post_id) for post_id in post_ids)
+        else:
+            body = dump_json(posts, list[UserPostWithLikes])
+
+        cached = build_cached_response(body, headers)
+        response_cache.set(key, cached, tags, since=generation)
+    return conditional_response(request, cached)
+
+
+class SearchSorting(str, Enum):
+    relevance = "relevance"
+    new = "new"
+
+
+def cursor_for_search(post, sorting: SearchSorting) -> str:
+    if sorting == SearchSorting.relevance:
+        return encode_cursor(sorting=sorting.value, id=post["id"], score=post["score"])
+    return encode_cursor(sorting=sorting.value, id=post["id"])
+
+
+def parse_search_cursor(cursor: str | None, sorting: SearchSorting) -> dict | None:
+    if cursor is None:
+        return None
+    try:
+        values = decode_cursor(cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail="Invalid cursor") from e
+
+    if values.get("sorting") != sorting.value or not isinstance(values.get("id"), int):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if sorting == SearchSorting.relevance and not isinstance(values.get("score"), (int, float)):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return values
+
+
+# declared before /post/{post_id}, which would otherwise take "search" for a post id
+@router.get("/post/search", response_model=list[UserPostWithLikes], status_code=200)
+async def search_posts(
+    q: Annotated[str, Query(min_length=1, max_length=200)],
+    sorting: SearchSorting = SearchSorting.relevance,
+    limit: Annotated[int | None, Query(ge=1, le=MAX_PAGE_SIZE)] = None,
+    cursor: str | None = None,
+):
+    """
+    Return posts whose body or comments contain every word of `q`, best match
+    first or, with `sorting=new`, newest first. A word ending in `*` is a prefix:
+    `q=data*` also finds "database". As with GET /post, the X-Next-Cursor
+    response header carries the token for the next page.
+    """
+
+    logger.info("Searching posts for: %s", q)
+
+    try:
+        terms = search_terms(q)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e)) from e
+
+    position = parse_search_cursor(cursor, sorting)
+    db = read_database()
+    limit = limit or DEFAULT_PAGE_SIZE
+    query = select_matching_posts(dialect_of(db), terms, sorting == SearchSorting.relevance, position)
+    query = query.limit(limit + 1)
 
     logger.debug(query)
-    return await database.fetch_all(query)
+    posts = await db.fetch_all(query)
+
+    headers = {}
+    if len(posts) > limit:
+        posts = posts[:limit]
+        headers["X-Next-Cursor"] = cursor_for_search(posts[-1], sorting)
+    return Response(content=dump_json(posts, list[UserPostWithLikes]), media_type="application/json", headers=headers)
 
 
 @router.post("/comment", response_model=Comment)
@@ -84,32 +345,63 @@ async def create_comment(comment: CommentIn, current_user: Annotated[User, Depen
 
     data = {**comment.model_dump(), "user_id": current_user.id}
     query = comment_table.insert().values(**data)
-    last_record_id = await database.execute(query)
+    async with database.transaction():
+        last_record_id = await database.execute(query)
+        await add_comment_scores(Counter({comment.post_id: 1}))
+    invalidate_posts_commented([comment.post_id])
+    publish_comments([{**data, "id": last_record_id}])
     return {**data, "id": last_record_id}
 
 
+def select_comments_on_post(post_id: int):
+    return comment_table.select().where(comment_table.c.post_id == post_id).order_by(comment_table.c.id)
+
+
 @router.get("/post/{post_id}/comment", response_model=list[Comment])
-async def get_comments_on_post(post_id: int):
-    query = comment_table.select().where(comment_table.c.post_id == post_id)
-    return await database.fetch_all(query)
+async def get_comments_on_post(post_id: int, request: Request, stream: bool = False):
+    """
+    Return the comments on a post, streamed as a JSON array (or NDJSON) with `stream=true`.
+    """
+    query = select_comments_on_post(post_id)
+    db = read_database()
+    if stream:
+        return stream_rows(request, query, Comment, db)
+
+    response_cache = get_response_cache()
+    key = cache_key(request)
+    cached = lookup_cached(key)
+    if cached is None:
+        generation = response_cache.generation
+        comments = await db.fetch_all(query)
+        cached = build_cached_response(dump_json(comments, list[Comment]))
+        response_cache.set(key, cached, {comments_tag(post_id)}, since=generation)
+    return conditional_response(request, cached)
 
 
 @router.get("/post/{post_id}", response_model=UserPostWithComments)
-async def get_post_with_comments(post_id: int):
+async def get_post_with_comments(post_id: int, request: Request):
 
     logger.info("Fetching post with id: %s", post_id)
 
-    query = select_post_and_likes.where(post_table.c.id == post_id)
+    response_cache = get_response_cache()
+    key = cache_key(request)
+    cached = lookup_cached(key)
+    if cached is None:
+        generation = response_cache.generation
+        db = read_database()
+        query = select_post_and_likes.where(post_table.c.id == post_id)
 
-    logger.debug(query)
+        logger.debug(query)
 
-    post = await database.fetch_one(query)
+        post = await db.fetch_one(query)
 
-    if not post:
-        raise HTTPException(status_code=404, detail="Post not found")
+        if not post:
+            raise HTTPException(status_code=404, detail="Post not found")
 
-    comments = await get_comments_on_post(post_id)
-    return UserPostWithComments(**post, comments=comments)
+        comments = await CommentLoader(db).load(post_id)
+        cached = build_cached_response(dump_json(with_comments(post, comments), UserPostWithComments))
+        response_cache.set(key, cached, {post_tag(post_id), comments_tag(post_id)}, since=generation)
+    return conditional_response(request, cached)
 
 
 
@@ -119,6 +411,12 @@ async def like_post(post_like: PostLikeIn, current_user: Annotated[User, Depends
     logger.info("Liking post with id: %s", post_like.post_id)
     # current_user = await get_current_user(await oauth2_scheme(request))
 
+    if get_config().LIKE_WRITE_BEHIND:
+        # the post is checked when the buffer is flushed, together with the rest of the batch
+        if not get_like_buffer().add(post_like.post_id, current_user.id):
+            raise HTTPException(status_code=503, detail="Too many pending likes", headers={"Retry-After": "1"})
+        return JSONResponse(status_code=202, content={**post_like.model_dump(), "user_id": current_user.id})
+
     post = await find_post(post_like.post_id)
     if not post:
         raise HTTPException(status_code=404, detail="Post not found")
@@ -126,5 +424,85 @@ async def like_post(post_like: PostLikeIn, current_user: Annotated[User, Depends
     data = {**post_like.model_dump(), "user_id": current_user.id}
     query = like_table.insert().values(**data)
     logger.debug(query)
-    last_record_id = await database.execute(query)
-    return {**data, "id": last_record_id}
\ No newline at end of file
+
+    async with database.transaction():
+        last_record_id = await database.execute(query)
+        await increment_like_counts(Counter({post_like.post_id: 1}))
+    invalidate_posts_liked([post_like.post_id])
+    publish_likes(Counter({post_like.post_id: 1}))
+    return {**data, "id": last_record_id}
+
+
+async def insert_children(table: sqlalchemy.Table, items: list[dict]) -> tuple[list[BatchItemResult], Counter]:
+    """
+    Insert comments or likes for a batch in one statement, skipping items whose post
+    does not exist. Returns the per-item results and how many rows went to each post.
+    """
+    existing = await find_existing_post_ids(item["post_id"] for item in items)
+    valid = [(index, item) for index, item in enumerate(items) if item["post_id"] in existing]
+
+    ids = await bulk_insert(table, [item for _, item in valid])
+    results = [BatchItemResult(index=index, error="Post not found") for index in range(len(items))]
+    for (index, _), record_id in zip(valid, ids):
+        results[index] = BatchItemResult(index=index, id=record_id)
+
+    return results, Counter(item["post_id"] for _, item in valid)
+
+
+@router.post("/post/batch", response_model=list[BatchItemResult], status_code=201)
+async def create_posts_batch(
+    posts: Annotated[list[UserPostIn], Body(max_length=MAX_BATCH_SIZE)],
+    current_user: Annotated[User, Depends(get_current_user)],
+):
+    """
+    Create many posts with a single multi-row INSERT.
+    """
+    logger.info("Creating %s posts in a batch", len(posts))
+
+    rows = [{**post.model_dump(), "user_id": current_user.id} for post in posts]
+    async with database.transaction():
+        hot_score = await hot_weight(get_config().HOT_POST_WEIGHT)
+        ids = await bulk_insert(post_table, [{**row, "hot_score": hot_score} for row in rows])
+        await fan_out_posts(ids)
+    invalidate_posts_created()
+    publish_posts({**row, "id": record_id} for row, record_id in zip(rows, ids))
+    return [BatchItemResult(index=index, id=record_id) for index, record_id in enumerate(ids)]
+
+
+@router.post("/comment/batch", response_model=list[BatchItemResult], status_code=201)
+async def create_comments_batch(
+    comments: Annotated[list[CommentIn], Body(max_length=MAX_BATCH_SIZE)],
+    current_user: Annotated[User, Depends(get_current_user)],
+):
+    """
+    Create many comments in one transaction. Comments on missing posts are
+    reported per item instead of failing the whole batch.
+    """
+    logger.info("Creating %s comments in a batch", len(comments))
+
+    items = [{**comment.model_dump(), "user_id": current_user.id} for comment in comments]
+    async with database.transaction():
+        results, comments_per_post = await insert_children(comment_table, items)
+        await add_comment_scores(comments_per_post)
+    invalidate_posts_commented(comments_per_post)
+    publish_comments({**item, "id": result.id} for item, result in zip(items, results) if result.id is not None)
+    return results
+
+
+@router.post("/like/batch", response_model=list[BatchItemResult], status_code=201)
+async def like_posts_batch(
+    post_likes: Annotated[list[PostLikeIn], Body(max_length=MAX_BATCH_SIZE)],
+    current_user: Annotated[User, Depends(get_current_user)],
+):
+    """
+    Like many posts in one transaction, updating each post's likes counter once.
+    """
+    logger.info("Liking %s posts in a batch", len(post_likes))
+
+    items = [{**post_like.model_dump(), "user_id": current_user.id} for post_like in post_likes]
+    async with database.transaction():
+        results, likes_per_post = await insert_children(like_table, items)
+        await increment_like_counts(likes_per_post)
+    invalidate_posts_liked(likes_per_post)
+    publish_likes(likes_per_post)
+    return results
@@ -0,0 +1,151 @@
+import logging
+from typing import Annotated
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from starlette.responses import Response
+
+from storeapi.configs.security_conf import get_current_user
+from storeapi.database.database import database, follow_table, user_table
+from storeapi.database.pagination import decode_cursor, encode_cursor
+from storeapi.database.replicas import read_database
+from storeapi.database.timelines import (
+    backfill_timeline,
+    remove_from_timeline,
+    resume_fan_out,
+    resumes_fanning_out,
+    select_followed_celebrities,
+    select_timeline_page,
+    stop_fan_out,
+    stops_fanning_out,
+)
+from storeapi.models.post import UserPostWithLikes
+from storeapi.models.user import Follow, FollowIn, User
+from storeapi.responses import dump_json
+from storeapi.routers.post import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
+
+router = APIRouter()
+
+logger = logging.getLogger(__name__)
+
+
+def select_follow(follower_id: int, followee_id: int):
+    return follow_table.select().where(
+        follow_table.c.follower_id == follower_id, follow_table.c.followee_id == followee_id
+    )
+
+
+def change_followers(user_id: int, by: int):
+    return user_table.update().where(user_table.c.id == user_id).values(followers=user_table.c.followers + by)
+
+
+def is_unique_violation(error: Exception) -> bool:
+    # sqlite3 names the violated constraint, asyncpg reports the SQLSTATE
+    return getattr(error, "sqlite_errorname", None) in (
+        "SQLITE_CONSTRAINT_PRIMARYKEY",
+        "SQLITE_CONSTRAINT_UNIQUE",
+    ) or getattr(error, "sqlstate", None) == "23505"
+
+
+@router.post("/follow", response_model=Follow, status_code=201)
+async def follow_user(follow: FollowIn, current_user: Annotated[User, Depends(get_current_user)]):
+    """
+    Follow a user: their latest posts join the home timeline, and so will their new ones.
+    """
+    logger.info("User %s following user %s", current_user.id, follow.user_id)
+
+    if follow.user_id == current_user.id:
+        raise HTTPException(status_code=400, detail="Cannot follow yourself")
+
+    data = {"follower_id": current_user.id, "followee_id": follow.user_id}
+    try:
+        async with database.transaction():
+            # writing first takes the followee's row lock (or SQLite's write lock) before
+            # the check below, so concurrent follows of the same user are serialized
+            followee = await database.fetch_one(
+                change_followers(follow.user_id, 1).returning(user_table.c.followers, user_table.c.fans_out)
+            )
+            if followee is None:
+                raise HTTPException(status_code=404, detail="User not found")
+            if await database.fetch_one(select_follow(current_user.id, follow.user_id)):
+                raise HTTPException(status_code=400, detail="Already following")
+            await database.execute(follow_table.insert().values(**data))
+            # a celebrity's posts are merged in on read, so there is nothing to copy
+            if followee["fans_out"] and stops_fanning_out(followee["followers"]):
+                await stop_fan_out(follow.user_id)
+            elif followee["fans_out"]:
+                await backfill_timeline(current_user.id, follow.user_id)
+    except HTTPException:
+        raise
+    except Exception as e:
+        if not is_unique_violation(e):
+            raise
+        raise HTTPException(status_code=400, detail="Already following") from e
+    return data
+
+
+@router.delete("/follow/{user_id}", status_code=204)
+async def unfollow_user(user_id: int, current_user: Annotated[User, Depends(get_current_user)]):
+    """
+    Stop following a user and drop their posts from the home timeline.
+    """
+    logger.info("User %s unfollowing user %s", current_user.id, user_id)
+
+    async with database.transaction():
+        deleted = await database.fetch_all(
+            follow_table.delete()
+            .where(follow_table.c.follower_id == current_user.id, follow_table.c.followee_id == user_id)
+            .returning(follow_table.c.followee_id)
+        )
+        # a concurrent unfollow that got here first leaves nothing to delete
+        if not deleted:
+            raise HTTPException(status_code=404, detail="Not following")
+        followee = await database.fetch_one(
+            change_followers(user_id, -len(deleted)).returning(user_table.c.followers, user_table.c.fans_out)
+        )
+        await remove_from_timeline(current_user.id, user_id)
+        # only queued here: the backfill copies posts to every follower, far too much for one request
+        if not followee["fans_out"] and resumes_fanning_out(followee["followers"]):
+            await resume_fan_out(user_id)
+    return Response(status_code=204)
+
+
+def parse_timeline_cursor(cursor: str | None) -> int | None:
+    if cursor is None:
+        return None
+    try:
+        values = decode_cursor(cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail="Invalid cursor") from e
+
+    if values.get("timeline") is not True or not isinstance(values.get("id"), int):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return values["id"]
+
+
+@router.get("/timeline", response_model=list[UserPostWithLikes], status_code=200)
+async def get_home_timeline(
+    current_user: Annotated[User, Depends(get_current_user)],
+    limit: Annotated[int | None, Query(ge=1, le=MAX_PAGE_SIZE)] = None,
+    cursor: str | None = None,
+):
+    """
+    Return one page of the current user's home timeline: their own posts and those
+    of the users they follow, newest first. As with GET /post, the X-Next-Cursor
+    response header carries the token for the next page.
+    """
+    logger.info("Fetching home timeline of user %s", current_user.id)
+
+    before = parse_timeline_cursor(cursor)
+    db = read_database()
+    limit = limit or DEFAULT_PAGE_SIZE
+
+    celebrity_ids = [row["followee_id"] for row in await db.fetch_all(select_followed_celebrities(current_user.id))]
+    query = select_timeline_page(current_user.id, celebrity_ids, before, limit + 1)
+    logger.debug(query)
+    posts = await db.fetch_all(query)
+
+    headers = {}
+    if len(posts) > limit:
+        posts = posts[:limit]
+        headers["X-Next-Cursor"] = encode_cursor(timeline=True, id=posts[-1]["id"])
+    return Response(content=dump_json(posts, list[UserPostWithLikes]), media_type="application/json", headers=headers)
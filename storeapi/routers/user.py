@@ -5,10 +5,11 @@ from fastapi import APIRouter, Depends, HTTPException, status, Request
 from fastapi.security import OAuth2PasswordRequestForm
 from starlette.responses import JSONResponse
 
+from storeapi.configs.cache_conf import get_user_cache
 from storeapi.configs.jwt_conf import create_access_token, create_confirmation_token
 from storeapi.configs.security_conf import (
     authenticate_user,
-    get_password_hash,
+    get_password_hash_async,
     get_user,
     get_subject_for_token_type,
 )
@@ -35,7 +36,7 @@ async def register(user: UserIn, request: Request):
     except HTTPException as e:
         return JSONResponse(status_code=e.status_code, content={"detail": e.detail})
 
-    hashed_password = get_password_hash(user.password)
+    hashed_password = await get_password_hash_async(user.password)
 
     query = user_table.insert().values(
         username=user.username, email=user.email, password=hashed_password
@@ -44,11 +45,12 @@ async def register(user: UserIn, request: Request):
     logger.debug(query)
 
     await database.execute(query)
+    get_user_cache().invalidate(user.email)
     return {"detail": "User created, Please confirm your email",
-            "confirmation_url": request.url_for(
+            "confirmation_url": str(request.url_for(
                 "confirm_email",
                 token=create_confirmation_token(user.email),
-            )
+            ))
             }
 
 
@@ -59,7 +61,12 @@ async def login(form_data: OAuth2PasswordRequestForm = Depends()):
     """
     # Here you would typically verify the password and return a token
     db_user = await authenticate_user(form_data.username, form_data.password)
-    access_token = create_access_token(db_user.email)
+    access_token = create_access_token(
+        db_user.email,
+        user_id=db_user.id,
+        username=db_user.username,
+        confirmed=db_user.confirmed,
+    )
     return {
         "access_token": access_token,
         "token_type": "bearer",
@@ -82,6 +89,7 @@ async def confirm_email(token: str):
     logger.debug(query)
 
     await database.execute(query)
+    get_user_cache().invalidate(email)
 
     return {"detail": "User confirmed successfully"}
 
@@ -7,10 +7,16 @@
 
 
 import pytest
+import pytest_mock
 from fastapi.testclient import TestClient
 from httpx import ASGITransport, AsyncClient
 
-from storeapi.database.database import database
+from storeapi.app_conf import get_config
+from storeapi.configs.cache_conf import get_response_cache, get_user_cache
+from storeapi.configs.jwt_conf import create_access_token
+from storeapi.database.database import Database, database, user_table
+from storeapi.database.like_buffer import get_like_buffer
+from storeapi.database.migrate import upgrade
 from storeapi.main import app
 from storeapi.tests.user_fixtures import registered_user, confirmed_user  # noqa: F401
 
@@ -33,6 +39,12 @@ async def async_client(client) -> AsyncClient:
         yield ac
 
 
+@pytest.fixture(scope="session", autouse=True)
+def migrated_database():
+    # migrate once, before any test opens a connection, instead of on every app startup
+    upgrade()
+
+
 @pytest.fixture(autouse=True)
 async def db_transaction():
     # Ensure DB is connected
@@ -44,6 +56,36 @@ async def db_transaction():
 
     # All changes in test rolled back automatically
 
+
+@pytest.fixture
+async def single_writer_database(client, tmp_path, mocker: pytest_mock.MockerFixture) -> Database:
+    # the rest of the suite shares one rolled back transaction with the single writer off;
+    # this points the app at a migrated file of its own with the writer on, as outside tests
+    url = f"sqlite:///{tmp_path / 'single_writer.db'}"
+    upgrade(url)
+    writer_database = Database(url, config=get_config().model_copy(update={"SQLITE_SINGLE_WRITER": True}))
+    await writer_database.connect()
+    mocker.patch.object(database, "_database", writer_database.bind())
+    mocker.patch.object(database, "_writer", writer_database._writer)
+    yield database
+    await writer_database.disconnect()
+
+
+@pytest.fixture
+async def single_writer_token(single_writer_database: Database) -> str:
+    await single_writer_database.execute(
+        user_table.insert().values(username="writer", email="writer@example.net", password="", confirmed=True)
+    )
+    return create_access_token("writer@example.net")
+
+
+@pytest.fixture(autouse=True)
+def clear_in_process_state():
+    # cached rows and buffered writes would outlive the rolled back transaction
+    get_user_cache().clear()
+    get_response_cache().clear()
+    get_like_buffer().clear()
+
 @pytest.fixture(scope="function")
 async def logged_in_token(async_client: AsyncClient, confirmed_user: dict) -> str:  # noqa: F811
     response = await async_client.post(
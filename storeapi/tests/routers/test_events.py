@@ -0,0 +1,119 @@
+import time
+
+import pytest
+import pytest_mock
+from fastapi import WebSocketDisconnect
+from fastapi.testclient import TestClient
+from httpx import AsyncClient
+
+from storeapi.events import get_event_bus
+from storeapi.routers.events import receive_filters, sse_events
+from storeapi.tests.routers.test_post import create_comment, create_post, like_post
+
+
+def wait_until(client: TestClient, condition, timeout: float = 5.0) -> None:
+    """
+    Poll condition on the app's event loop until it holds, failing after timeout seconds.
+    """
+    deadline = time.monotonic() + timeout
+    while not client.portal.call(condition):
+        assert time.monotonic() < deadline, "timed out waiting for the event bus"
+        time.sleep(0.01)
+
+
+@pytest.fixture(autouse=True)
+def event_bus():
+    bus = get_event_bus()
+    yield bus
+    bus.close_all()
+
+
+@pytest.mark.anyio
+async def test_writes_publish_events(async_client: AsyncClient, logged_in_token: str, event_bus):
+    subscription = event_bus.subscribe()
+
+    post = await create_post("Test Post", async_client, logged_in_token)
+    comment = await create_comment("Test Comment", post["id"], async_client, logged_in_token)
+    await like_post(post["id"], async_client, logged_in_token)
+
+    events = [await subscription.get(0) for _ in range(3)]
+    assert [(event.type, event.post_id) for event in events] == [
+        ("post", post["id"]),
+        ("comment", post["id"]),
+        ("like", post["id"]),
+    ]
+    assert f'"id":{comment["id"]}' in events[1].json
+
+
+@pytest.mark.anyio
+async def test_sse_stream_frames_events(event_bus):
+    stream = sse_events([1], keepalive=0.01)
+
+    assert await anext(stream) == b": subscribed\n\n"
+    assert await anext(stream) == b": keepalive\n\n"
+    event_bus.publish("like", 1, added=1)
+    frame = await anext(stream)
+    assert frame.startswith(b"id: ")
+    assert frame.endswith(b'\nevent: like\ndata: {"type":"like","post_id":1,"added":1}\n\n')
+
+    event_bus.close_all()
+    assert await anext(stream) == b"event: shutdown\ndata: {}\n\n"
+    await stream.aclose()
+    assert len(event_bus) == 0
+
+
+@pytest.mark.anyio
+async def test_events_refused_when_full(async_client: AsyncClient, event_bus, mocker: pytest_mock.MockerFixture):
+    mocker.patch.object(event_bus, "max_subscribers", 0)
+
+    response = await async_client.get("/events")
+
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "5"
+
+
+def test_events_websocket_filters_by_post(client: TestClient, event_bus):
+    with client.websocket_connect("/events/ws?post_id=1") as websocket:
+        wait_until(client, lambda: len(event_bus) == 1)
+        client.portal.call(lambda: event_bus.publish("like", 2, added=1))
+        client.portal.call(lambda: event_bus.publish("like", 1, added=1))
+        assert websocket.receive_json() == {"type": "like", "post_id": 1, "added": 1}
+
+        websocket.send_json({"post_ids": [2]})
+        # delivered once the new filter is applied
+        wait_until(client, lambda: event_bus.publish("comment", 2, id=5))
+        assert websocket.receive_json() == {"type": "comment", "post_id": 2, "id": 5}
+
+
+
+class ScriptedWebSocket:
+    """
+    Hands receive_filters the given messages, then disconnects.
+    """
+
+    def __init__(self, *messages):
+        self.messages = list(messages)
+
+    async def receive_json(self):
+        if not self.messages:
+            raise WebSocketDisconnect()
+        return self.messages.pop(0)
+
+
+@pytest.mark.anyio
+@pytest.mark.parametrize("message", [{}, [2], None, {"post_ids": "2"}, {"post_ids": [2, "x"]}])
+async def test_malformed_filter_keeps_subscription(event_bus, message):
+    subscription = event_bus.subscribe([1])
+
+    await receive_filters(ScriptedWebSocket(message), subscription)
+
+    assert subscription.post_ids == frozenset({1})
+
+
+@pytest.mark.anyio
+async def test_null_filter_subscribes_to_all_posts(event_bus):
+    subscription = event_bus.subscribe([1])
+
+    await receive_filters(ScriptedWebSocket({"post_ids": None}), subscription)
+
+    assert subscription.post_ids is None
@@ -0,0 +1,100 @@
+import pytest
+import pytest_mock
+from httpx import ASGITransport, AsyncClient
+from starlette.applications import Starlette
+from starlette.responses import PlainTextResponse
+from starlette.routing import Route
+
+from storeapi.app_conf import get_config
+from storeapi.metrics import (
+    Counter,
+    Histogram,
+    db_query_duration,
+    http_request_duration,
+    http_requests,
+    query_kind,
+)
+from storeapi.middleware.metrics import MetricsMiddleware
+
+
+def test_histogram_buckets_are_cumulative():
+    histogram = Histogram("test_seconds", "Test histogram.", ("route",), buckets=(0.1, 1.0))
+    for value in (0.05, 0.1, 0.5, 2.0):
+        histogram.observe("/post", value=value)
+
+    assert histogram.samples() == [
+        'test_seconds_bucket{route="/post",le="0.1"} 2',
+        'test_seconds_bucket{route="/post",le="1.0"} 3',
+        'test_seconds_bucket{route="/post",le="+Inf"} 4',
+        'test_seconds_sum{route="/post"} 2.65',
+        'test_seconds_count{route="/post"} 4',
+    ]
+
+
+def test_counter_escapes_label_values():
+    counter = Counter("test_total", "Test counter.", ("path",))
+    counter.inc('a"b')
+
+    assert counter.render() == ["# HELP test_total Test counter.", "# TYPE test_total counter", 'test_total{path="a\\"b"} 1']
+
+
+def test_query_kind():
+    from storeapi.database.database import post_table
+
+    assert query_kind(post_table.select()) == "select"
+    assert query_kind(post_table.insert()) == "insert"
+    assert query_kind(post_table.update()) == "update"
+    assert query_kind("PRAGMA journal_mode") == "text"
+
+
+@pytest.mark.anyio
+async def test_metrics_endpoint(async_client: AsyncClient):
+    before = http_requests.get("GET", "/post", 200)
+    selects = db_query_duration.labels("select").count
+
+    await async_client.get("/post")
+    await async_client.get("/does-not-exist")
+    response = await async_client.get("/metrics")
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+    assert http_requests.get("GET", "/post", 200) == before + 1
+    assert db_query_duration.labels("select").count > selects
+
+    body = response.text
+    assert 'http_request_duration_seconds_bucket{method="GET",route="/post",le="+Inf"}' in body
+    assert 'http_requests_total{method="GET",route="<unmatched>",status="404"}' in body
+    assert "http_requests_in_flight 1" in body
+    assert 'cache_hit_ratio{cache="response"}' in body
+    assert 'db_pool_connections{pool="primary",state="in_use"}' in body
+
+
+@pytest.mark.anyio
+async def test_password_hashing_is_timed(async_client: AsyncClient, registered_user: dict):
+    response = await async_client.get("/metrics")
+
+    assert 'password_hash_duration_seconds_count{operation="get_password_hash"}' in response.text
+
+
+@pytest.mark.anyio
+async def test_metrics_disabled(async_client: AsyncClient, mocker: pytest_mock.MockerFixture):
+    mocker.patch.object(get_config(), "METRICS_ENABLED", False)
+
+    response = await async_client.get("/metrics")
+
+    assert response.status_code == 404
+
+
+@pytest.mark.anyio
+async def test_long_lived_requests_are_counted_but_not_timed():
+    async def ok(request):
+        return PlainTextResponse("ok")
+
+    app = MetricsMiddleware(Starlette(routes=[Route("/events", ok)]), enabled=True)
+    before = http_requests.get("GET", "/events", 200)
+
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+        await client.get("/events")
+
+    assert http_requests.get("GET", "/events", 200) == before + 1
+    assert http_request_duration.labels("GET", "/events").count == 0
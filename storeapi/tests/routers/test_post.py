@@ -1,8 +1,19 @@
+import asyncio
+import json
+import time
+
 import pytest
 import pytest_mock
 from httpx import AsyncClient
 
+from storeapi.app_conf import get_config
 from storeapi.configs import jwt_conf, security_conf
+from storeapi.configs.cache_conf import CachedResponse, ResponseCache, get_response_cache, invalidate_posts_liked
+from storeapi.database.database import database, hot_epoch_table, like_table
+from storeapi.database import hot
+from storeapi.database.hot import current_epoch, rebase_hot_scores
+from storeapi.database.like_buffer import get_like_buffer
+from storeapi.database.reconcile import reconcile_like_counts
 
 
 async def create_post(body: str, async_client: AsyncClient, logged_in_token: str) -> dict:
@@ -82,6 +93,61 @@ async def test_get_all_posts_sort_likes(
     assert [post["id"] for post in data] == [post1["id"], post2["id"]]
 
 
+@pytest.mark.anyio
+async def test_get_all_posts_sort_hot(async_client: AsyncClient, logged_in_token: str):
+    liked = await create_post("Test Post 1", async_client, logged_in_token)
+    commented = await create_post("Test Post 2", async_client, logged_in_token)
+    newest = await create_post("Test Post 3", async_client, logged_in_token)
+    await like_post(liked["id"], async_client, logged_in_token)
+    await create_comment("Test Comment", commented["id"], async_client, logged_in_token)
+
+    response = await async_client.get("/post", params={"sorting": "hot"})
+    assert response.status_code == 200
+
+    # a comment weighs two likes; with no interactions the newest post is hottest
+    assert [post["id"] for post in response.json()] == [commented["id"], liked["id"], newest["id"]]
+
+
+@pytest.mark.anyio
+async def test_get_all_posts_hot_cursor_survives_rebase(async_client: AsyncClient, logged_in_token: str):
+    posts = [await create_post(f"Test Post {i}", async_client, logged_in_token) for i in range(4)]
+    await like_post(posts[0]["id"], async_client, logged_in_token)
+
+    first = await async_client.get("/post", params={"sorting": "hot", "limit": 2})
+    assert await rebase_hot_scores(now=time.time() + 3600)
+    second = await async_client.get(
+        "/post", params={"sorting": "hot", "limit": 2, "cursor": first.headers["X-Next-Cursor"]}
+    )
+
+    seen = [post["id"] for post in first.json() + second.json()]
+    assert seen == [posts[0]["id"], posts[3]["id"], posts[2]["id"], posts[1]["id"]]
+
+
+@pytest.mark.anyio
+async def test_hot_weight_reads_epoch_once(mocker: pytest_mock.MockerFixture):
+    spy = mocker.spy(hot, "current_epoch")
+
+    await hot.hot_weight(1.0)
+
+    spy.assert_called_once_with(lock="share")
+
+
+@pytest.mark.anyio
+async def test_stale_hot_epoch_rebased_on_write(
+    async_client: AsyncClient, logged_in_token: str, mocker: pytest_mock.MockerFixture
+):
+    # with the background rebase off, the epoch can fall any number of half-lives behind
+    mocker.patch.object(get_config(), "HOT_HALF_LIFE", 1.0)
+    await database.execute(hot_epoch_table.update().values(epoch=time.time() - 2000))
+
+    post = await create_post("Test Post", async_client, logged_in_token)
+    await like_post(post["id"], async_client, logged_in_token)
+
+    assert time.time() - await current_epoch() < 60
+    response = await async_client.get("/post", params={"sorting": "hot"})
+    assert [row["id"] for row in response.json()] == [post["id"]]
+
+
 @pytest.mark.anyio
 async def test_get_all_posts_wrong_sorting(
     async_client: AsyncClient, logged_in_token: str
@@ -93,6 +159,49 @@ async def test_get_all_posts_wrong_sorting(
     assert response.status_code == 422
 
 
+@pytest.mark.anyio
+@pytest.mark.parametrize("sorting", ["new", "old", "most_likes", "hot"])
+async def test_get_all_posts_pagination(async_client: AsyncClient, logged_in_token: str, sorting: str):
+    posts = [await create_post(f"Test Post {i}", async_client, logged_in_token) for i in range(5)]
+    await like_post(posts[1]["id"], async_client, logged_in_token)
+    await like_post(posts[3]["id"], async_client, logged_in_token)
+
+    full = await async_client.get("/post", params={"sorting": sorting})
+    expected = [post["id"] for post in full.json()]
+
+    seen = []
+    params = {"sorting": sorting, "limit": 2}
+    while True:
+        response = await async_client.get("/post", params=params)
+        assert response.status_code == 200
+        seen += [post["id"] for post in response.json()]
+        next_cursor = response.headers.get("X-Next-Cursor")
+        if next_cursor is None:
+            break
+        params["cursor"] = next_cursor
+
+    assert seen == expected
+    assert len(seen) == 5
+
+
+@pytest.mark.anyio
+async def test_get_all_posts_limit(async_client: AsyncClient, logged_in_token: str):
+    await create_post("Test Post 1", async_client, logged_in_token)
+    await create_post("Test Post 2", async_client, logged_in_token)
+    response = await async_client.get("/post", params={"limit": 1})
+
+    assert response.status_code == 200
+    assert len(response.json()) == 1
+    assert "X-Next-Cursor" in response.headers
+
+
+@pytest.mark.anyio
+@pytest.mark.parametrize("cursor", ["not-a-cursor", "eyJzb3J0aW5nIjoib2xkIiwiaWQiOjF9"])
+async def test_get_all_posts_invalid_cursor(async_client: AsyncClient, cursor: str):
+    response = await async_client.get("/post", params={"sorting": "new", "cursor": cursor})
+    assert response.status_code == 400
+
+
 @pytest.mark.anyio
 async def test_like_post(
     async_client: AsyncClient, created_post: dict, logged_in_token: str
@@ -101,6 +210,61 @@ async def test_like_post(
     assert response.status_code == 201
 
 
+@pytest.mark.anyio
+async def test_like_post_increments_counter(
+    async_client: AsyncClient, created_post: dict, logged_in_token: str
+):
+    await like_post(created_post["id"], async_client, logged_in_token)
+    await like_post(created_post["id"], async_client, logged_in_token)
+    response = await async_client.get("/post")
+
+    assert response.json()[0]["likes"] == 2
+
+
+@pytest.mark.anyio
+async def test_like_post_write_behind(
+    async_client: AsyncClient, created_post: dict, logged_in_token: str, mocker: pytest_mock.MockerFixture
+):
+    mocker.patch.object(get_config(), "LIKE_WRITE_BEHIND", True)
+
+    response = await like_post(created_post["id"], async_client, logged_in_token)
+    await like_post(created_post["id"], async_client, logged_in_token)
+    await like_post(999, async_client, logged_in_token)
+
+    assert response.status_code == 202
+    assert (await async_client.get("/post")).json()[0]["likes"] == 0
+
+    buffer = get_like_buffer()
+    assert await buffer.flush() == 2
+    assert len(buffer) == 0
+    assert (await async_client.get("/post")).json()[0]["likes"] == 2
+
+
+@pytest.mark.anyio
+async def test_like_post_write_behind_buffer_full(
+    async_client: AsyncClient, created_post: dict, logged_in_token: str, mocker: pytest_mock.MockerFixture
+):
+    mocker.patch.object(get_config(), "LIKE_WRITE_BEHIND", True)
+    mocker.patch.object(get_like_buffer(), "max_size", 0)
+
+    response = await like_post(created_post["id"], async_client, logged_in_token)
+    assert response.status_code == 503
+
+
+@pytest.mark.anyio
+async def test_reconcile_like_counts(
+    async_client: AsyncClient, created_post: dict, logged_in_token: str, confirmed_user: dict
+):
+    await like_post(created_post["id"], async_client, logged_in_token)
+    # a like written behind the counter's back, e.g. by a bulk import
+    await database.execute(like_table.insert().values(post_id=created_post["id"], user_id=confirmed_user["id"]))
+
+    assert await reconcile_like_counts() == 1
+    response = await async_client.get("/post")
+    assert response.json()[0]["likes"] == 2
+    assert await reconcile_like_counts() == 0
+
+
 @pytest.mark.anyio
 async def test_get_post_with_comments(
     async_client: AsyncClient, created_post: dict, created_comment: dict
@@ -208,4 +372,352 @@ async def test_get_comments_on_post_empty(
     assert response.json() == []
 
 
+@pytest.mark.anyio
+async def test_get_all_posts_stream(async_client: AsyncClient, logged_in_token: str):
+    for i in range(3):
+        await create_post(f"Test Post {i}", async_client, logged_in_token)
+
+    response = await async_client.get("/post", params={"stream": True, "sorting": "old"})
+
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/json"
+    assert [post["id"] for post in response.json()] == [1, 2, 3]
+    assert response.json()[0] == {"id": 1, "body": "Test Post 0", "user_id": 1, "likes": 0}
+
+
+@pytest.mark.anyio
+async def test_get_all_posts_stream_empty(async_client: AsyncClient):
+    response = await async_client.get("/post", params={"stream": True})
+
+    assert response.status_code == 200
+    assert response.json() == []
+
+
+@pytest.mark.anyio
+async def test_get_comments_on_post_stream_ndjson(
+    async_client: AsyncClient, created_post: dict, created_comment: dict, logged_in_token: str
+):
+    await create_comment("Second Comment", created_post["id"], async_client, logged_in_token)
+
+    response = await async_client.get(
+        f"/post/{created_post['id']}/comment",
+        params={"stream": True},
+        headers={"Accept": "application/x-ndjson"},
+    )
+
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/x-ndjson"
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert lines[0] == created_comment
+    assert [comment["body"] for comment in lines] == ["Test Comment", "Second Comment"]
+
+
+@pytest.mark.anyio
+async def test_create_posts_batch(async_client: AsyncClient, logged_in_token: str, confirmed_user: dict):
+    response = await async_client.post(
+        "/post/batch",
+        json=[{"body": "Batch Post 1"}, {"body": "Batch Post 2"}],
+        headers={"Authorization": f"Bearer {logged_in_token}"},
+    )
+
+    assert response.status_code == 201
+    assert response.json() == [{"index": 0, "id": 1, "error": None}, {"index": 1, "id": 2, "error": None}]
+
+    posts = (await async_client.get("/post", params={"sorting": "old"})).json()
+    assert [(post["body"], post["user_id"]) for post in posts] == [
+        ("Batch Post 1", confirmed_user["id"]),
+        ("Batch Post 2", confirmed_user["id"]),
+    ]
+
+
+@pytest.mark.anyio
+async def test_create_comments_batch_missing_post(
+    async_client: AsyncClient, created_post: dict, logged_in_token: str
+):
+    response = await async_client.post(
+        "/comment/batch",
+        json=[
+            {"body": "Comment 1", "post_id": created_post["id"]},
+            {"body": "Comment 2", "post_id": 999},
+            {"body": "Comment 3", "post_id": created_post["id"]},
+        ],
+        headers={"Authorization": f"Bearer {logged_in_token}"},
+    )
+
+    assert response.status_code == 201
+    assert response.json() == [
+        {"index": 0, "id": 1, "error": None},
+        {"index": 1, "id": None, "error": "Post not found"},
+        {"index": 2, "id": 2, "error": None},
+    ]
+    comments = (await async_client.get(f"/post/{created_post['id']}/comment")).json()
+    assert [comment["body"] for comment in comments] == ["Comment 1", "Comment 3"]
+
+
+@pytest.mark.anyio
+async def test_like_posts_batch_updates_counters(async_client: AsyncClient, logged_in_token: str):
+    post1 = await create_post("Test Post 1", async_client, logged_in_token)
+    post2 = await create_post("Test Post 2", async_client, logged_in_token)
+
+    response = await async_client.post(
+        "/like/batch",
+        json=[{"post_id": post1["id"]}, {"post_id": post2["id"]}, {"post_id": post2["id"]}],
+        headers={"Authorization": f"Bearer {logged_in_token}"},
+    )
+
+    assert response.status_code == 201
+    assert [item["error"] for item in response.json()] == [None, None, None]
+    posts = (await async_client.get("/post", params={"sorting": "most_likes"})).json()
+    assert [(post["id"], post["likes"]) for post in posts] == [(post2["id"], 2), (post1["id"], 1)]
+
+
+@pytest.mark.anyio
+async def test_create_posts_batch_too_large(async_client: AsyncClient, logged_in_token: str):
+    response = await async_client.post(
+        "/post/batch",
+        json=[{"body": "Batch Post"}] * 1001,
+        headers={"Authorization": f"Bearer {logged_in_token}"},
+    )
+    assert response.status_code == 422
+
+
+@pytest.mark.anyio
+async def test_get_post_with_comments_single(
+    async_client: AsyncClient, created_post: dict, created_comment: dict
+):
+    response = await async_client.get(f"/post/{created_post['id']}")
+
+    assert response.status_code == 200
+    assert response.json()["post"] == created_post
+    assert response.json()["comments"] == [created_comment]
+
+
+@pytest.mark.anyio
+async def test_get_post_not_found(async_client: AsyncClient):
+    response = await async_client.get("/post/999")
+    assert response.status_code == 404
+
+
+@pytest.mark.anyio
+async def test_get_all_posts_etag_not_modified(async_client: AsyncClient, created_post: dict):
+    response = await async_client.get("/post")
+    etag = response.headers["ETag"]
+
+    cached = await async_client.get("/post", headers={"If-None-Match": etag})
+
+    assert cached.status_code == 304
+    assert cached.content == b""
+    assert cached.headers["ETag"] == etag
+
+
+@pytest.mark.anyio
+async def test_get_all_posts_cache_invalidated_by_like(
+    async_client: AsyncClient, created_post: dict, logged_in_token: str
+):
+    first = await async_client.get("/post")
+    await like_post(created_post["id"], async_client, logged_in_token)
+    second = await async_client.get("/post", headers={"If-None-Match": first.headers["ETag"]})
+
+    assert second.status_code == 200
+    assert second.json()[0]["likes"] == 1
+    assert second.headers["ETag"] != first.headers["ETag"]
+
+
+@pytest.mark.anyio
+async def test_get_all_posts_cache_invalidated_by_new_post(
+    async_client: AsyncClient, created_post: dict, logged_in_token: str
+):
+    await async_client.get("/post")
+    await create_post("Test Post 2", async_client, logged_in_token)
+    response = await async_client.get("/post")
+
+    assert [post["id"] for post in response.json()] == [2, 1]
+
+
+@pytest.mark.anyio
+async def test_get_post_cache_invalidated_by_comment(
+    async_client: AsyncClient, created_post: dict, logged_in_token: str
+):
+    await async_client.get(f"/post/{created_post['id']}")
+    await async_client.get(f"/post/{created_post['id']}/comment")
+    comment = await create_comment("Test Comment", created_post["id"], async_client, logged_in_token)
+
+    post = await async_client.get(f"/post/{created_post['id']}")
+    comments = await async_client.get(f"/post/{created_post['id']}/comment")
+
+    assert post.json()["comments"] == [comment]
+    assert comments.json() == [comment]
+
+
+@pytest.mark.anyio
+async def test_get_all_posts_served_from_cache(
+    async_client: AsyncClient, created_post: dict, mocker: pytest_mock.MockerFixture
+):
+    await async_client.get("/post")
+    spy = mocker.spy(database, "fetch_all")
+    response = await async_client.get("/post")
+
+    assert response.status_code == 200
+    assert spy.call_count == 0
+
+
+def test_response_cache_evicts_by_size_and_tag():
+    cache = ResponseCache(max_bytes=10)
+    cache.set("a", CachedResponse(body=b"12345", etag='"a"'), {"post:1"})
+    cache.set("b", CachedResponse(body=b"12345", etag='"b"'), {"post:2"})
+    cache.set("c", CachedResponse(body=b"12345", etag='"c"'), {"post:2"})
+
+    assert cache.get("a") is None
+    assert cache.size_bytes == 10
+
+    cache.invalidate_tags("post:2")
+    assert cache.get("b") is None
+    assert cache.get("c") is None
+    assert cache.size_bytes == 0
+
+
+def test_response_cache_skips_responses_invalidated_while_read():
+    cache = ResponseCache(max_tombstones=1)
+    before = cache.generation
+    cache.invalidate_tags("post:1")
+
+    cache.set("a", CachedResponse(body=b"old", etag='"a"'), {"post:1"}, since=before)
+    cache.set("b", CachedResponse(body=b"new", etag='"b"'), {"post:2"}, since=before)
+    assert cache.get("a") is None
+    assert cache.get("b") is not None
+
+    # once its tombstone is dropped, the invalidation can no longer be ruled out
+    cache.invalidate_tags("post:3")
+    cache.set("c", CachedResponse(body=b"old", etag='"c"'), {"post:2"}, since=before)
+    assert cache.get("c") is None
+
+
+@pytest.mark.anyio
+async def test_get_post_not_cached_when_liked_during_read(
+    async_client: AsyncClient, created_post: dict, mocker: pytest_mock.MockerFixture
+):
+    fetch_one = database.fetch_one
+
+    async def like_during_read(query, values=None):
+        row = await fetch_one(query, values)
+        invalidate_posts_liked([created_post["id"]])
+        return row
+
+    mocker.patch.object(database, "fetch_one", side_effect=like_during_read)
+    response = await async_client.get(f"/post/{created_post['id']}")
 
+    assert response.status_code == 200
+    assert len(get_response_cache()) == 0
+
+
+@pytest.mark.anyio
+async def test_get_all_posts_include_comments(
+    async_client: AsyncClient, logged_in_token: str, mocker: pytest_mock.MockerFixture
+):
+    posts = [await create_post(f"Test Post {i}", async_client, logged_in_token) for i in range(5)]
+    comment1 = await create_comment("Comment 1", posts[0]["id"], async_client, logged_in_token)
+    comment2 = await create_comment("Comment 2", posts[3]["id"], async_client, logged_in_token)
+    comment3 = await create_comment("Comment 3", posts[0]["id"], async_client, logged_in_token)
+
+    spy = mocker.spy(database, "fetch_all")
+    response = await async_client.get("/post", params={"include": "comments", "sorting": "old"})
+
+    assert response.status_code == 200
+    data = response.json()
+    assert [post["id"] for post in data] == [post["id"] for post in posts]
+    assert data[0]["post"] == {**posts[0], "likes": 0}
+    assert data[0]["comments"] == [comment1, comment3]
+    assert data[3]["comments"] == [comment2]
+    assert data[1]["comments"] == []
+    assert spy.call_count == 2
+
+
+@pytest.mark.anyio
+async def test_get_all_posts_include_comments_invalidated_by_comment(
+    async_client: AsyncClient, created_post: dict, logged_in_token: str
+):
+    await async_client.get("/post", params={"include": "comments"})
+    comment = await create_comment("Test Comment", created_post["id"], async_client, logged_in_token)
+    response = await async_client.get("/post", params={"include": "comments"})
+
+    assert response.json()[0]["comments"] == [comment]
+
+
+@pytest.mark.anyio
+async def test_search_posts_matches_body_and_comments(async_client: AsyncClient, logged_in_token: str):
+    in_body = await create_post("Tuning sqlite for writes", async_client, logged_in_token)
+    in_comment = await create_post("Storage notes", async_client, logged_in_token)
+    await create_comment("have you tried SQLite in WAL mode?", in_comment["id"], async_client, logged_in_token)
+    await create_post("Something else", async_client, logged_in_token)
+
+    response = await async_client.get("/post/search", params={"q": "sqlite"})
+
+    assert response.status_code == 200
+    # a match in the post's own body ranks above one in its comments
+    assert [post["id"] for post in response.json()] == [in_body["id"], in_comment["id"]]
+    assert response.json()[0] == {**in_body, "likes": 0}
+
+
+@pytest.mark.anyio
+async def test_search_posts_prefix_and_all_terms(async_client: AsyncClient, logged_in_token: str):
+    database_post = await create_post("database migrations", async_client, logged_in_token)
+    await create_post("data pipelines", async_client, logged_in_token)
+
+    prefix = await async_client.get("/post/search", params={"q": "datab*"})
+    both = await async_client.get("/post/search", params={"q": "data* migrations"})
+
+    assert [post["id"] for post in prefix.json()] == [database_post["id"]]
+    assert [post["id"] for post in both.json()] == [database_post["id"]]
+
+
+@pytest.mark.anyio
+@pytest.mark.parametrize("sorting", ["relevance", "new"])
+async def test_search_posts_pagination(async_client: AsyncClient, logged_in_token: str, sorting: str):
+    for i in range(5):
+        await create_post(f"search term {'term ' * i}post {i}", async_client, logged_in_token)
+
+    full = await async_client.get("/post/search", params={"q": "term", "sorting": sorting})
+    expected = [post["id"] for post in full.json()]
+
+    seen = []
+    params = {"q": "term", "sorting": sorting, "limit": 2}
+    while True:
+        response = await async_client.get("/post/search", params=params)
+        assert response.status_code == 200
+        seen += [post["id"] for post in response.json()]
+        next_cursor = response.headers.get("X-Next-Cursor")
+        if next_cursor is None:
+            break
+        params["cursor"] = next_cursor
+
+    assert seen == expected
+    assert len(seen) == 5
+    if sorting == "new":
+        assert seen == sorted(seen, reverse=True)
+
+
+@pytest.mark.anyio
+@pytest.mark.parametrize("q", ["***", "a*"])
+async def test_search_posts_rejects_unusable_query(async_client: AsyncClient, q: str):
+    response = await async_client.get("/post/search", params={"q": q})
+    assert response.status_code == 400
+
+
+@pytest.mark.anyio
+async def test_search_posts_ignores_query_syntax(async_client: AsyncClient, created_post: dict):
+    response = await async_client.get("/post/search", params={"q": '"test (post*'})
+
+    assert response.status_code == 200
+    assert [post["id"] for post in response.json()] == [created_post["id"]]
+
+
+@pytest.mark.anyio
+async def test_writes_through_single_writer(async_client: AsyncClient, single_writer_token: str):
+    assert "writer" in database.pool_stats()
+    posts = await asyncio.gather(*(create_post(f"Test Post {i}", async_client, single_writer_token) for i in range(5)))
+    responses = await asyncio.gather(*(like_post(post["id"], async_client, single_writer_token) for post in posts))
+
+    assert [response.status_code for response in responses] == [201] * 5
+    listed = (await async_client.get("/post", params={"sorting": "most_likes"})).json()
+    assert sorted(post["id"] for post in listed) == sorted(post["id"] for post in posts)
+    assert {post["likes"] for post in listed} == {1}
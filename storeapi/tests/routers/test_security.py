@@ -2,7 +2,9 @@ import pytest
 import pytest_mock
 from fastapi import HTTPException
 from jose import jwt
+from pydantic import ValidationError
 
+from storeapi.configs.cache_conf import LRUCache, get_user_cache
 from storeapi.configs.jwt_conf import (
     ALGORITHM,
     SECRET_KEY,
@@ -11,12 +13,17 @@ from storeapi.configs.jwt_conf import (
     confirm_token_expires,
     create_confirmation_token,
 )
+from storeapi.app_conf import GlobalConfig, get_config
+from storeapi.configs import security_conf
 from storeapi.configs.security_conf import (
     authenticate_user,
     get_current_user,
+    PasswordHasher,
     get_password_hash,
+    get_password_hash_async,
     get_user,
     verify_password,
+    verify_password_async,
     get_subject_for_token_type,
 )
 
@@ -27,6 +34,27 @@ def test_password_hash():
     assert hashed_password != password
     assert verify_password(password, hashed_password)
 
+@pytest.mark.anyio
+async def test_password_hash_async():
+    password = "1234"
+    hashed_password = await get_password_hash_async(password)
+    assert hashed_password != password
+    assert await verify_password_async(password, hashed_password)
+    assert not await verify_password_async("wrong", hashed_password)
+
+
+@pytest.mark.anyio
+async def test_password_hasher_rejects_when_queue_full():
+    hasher = PasswordHasher(workers=1, max_queue=0)
+    hasher.pending = 1
+    with pytest.raises(HTTPException) as exc_info:
+        await hasher.run(get_password_hash, "1234")
+
+    assert exc_info.value.status_code == 503
+    assert exc_info.value.headers["Retry-After"] == "1"
+    assert hasher.rejected == 1
+
+
 @pytest.mark.anyio
 async def test_get_user(registered_user: dict):
     user = await get_user(registered_user["email"])
@@ -55,6 +83,15 @@ def test_create_access_token():
     assert {"sub": "123", "type": "access"}.items() <= jwt.decode(token, key=SECRET_KEY, algorithms=[ALGORITHM]).items()
 
 
+def test_create_access_token_with_claims():
+
+    token = create_access_token("123", user_id=7, username="mark", confirmed=True)
+
+    assert {"sub": "123", "type": "access", "uid": 7, "username": "mark", "confirmed": True}.items() <= jwt.decode(
+        token, key=SECRET_KEY, algorithms=[ALGORITHM]
+    ).items()
+
+
 def test_create_confirmation_token():
 
     token = create_confirmation_token("123")
@@ -105,6 +142,99 @@ async def test_get_current_user(confirmed_user: dict):
     assert user.email == confirmed_user["email"]
 
 
+@pytest.mark.anyio
+async def test_get_current_user_cached(confirmed_user: dict, mocker: pytest_mock.MockerFixture):
+    token = create_access_token(confirmed_user["email"])
+    await get_current_user(token)
+
+    spy = mocker.spy(security_conf, "get_user")
+    hits = get_user_cache().hits
+    user = await get_current_user(token)
+
+    assert user.email == confirmed_user["email"]
+    assert spy.call_count == 0
+    assert get_user_cache().hits == hits + 1
+
+
+@pytest.mark.anyio
+async def test_get_current_user_claims_mode(confirmed_user: dict, mocker: pytest_mock.MockerFixture):
+    mocker.patch.object(get_config(), "AUTH_MODE", "claims")
+    token = create_access_token(
+        confirmed_user["email"], user_id=confirmed_user["id"], username=confirmed_user["username"], confirmed=True
+    )
+    get_user_spy = mocker.spy(security_conf, "get_user")
+    get_user_by_id_spy = mocker.spy(security_conf, "get_user_by_id")
+
+    user = await get_current_user(token)
+
+    assert user.id == confirmed_user["id"]
+    assert user.email == confirmed_user["email"]
+    assert user.confirmed
+    assert get_user_spy.call_count == 0
+    assert get_user_by_id_spy.call_count == 0
+
+
+@pytest.mark.anyio
+async def test_get_current_user_claims_mode_legacy_token(confirmed_user: dict, mocker: pytest_mock.MockerFixture):
+    mocker.patch.object(get_config(), "AUTH_MODE", "claims")
+    token = create_access_token(confirmed_user["email"])
+
+    user = await get_current_user(token)
+
+    assert user.id == confirmed_user["id"]
+
+
+@pytest.mark.anyio
+async def test_get_current_user_strict_mode(confirmed_user: dict, mocker: pytest_mock.MockerFixture):
+    mocker.patch.object(get_config(), "AUTH_MODE", "strict")
+    token = create_access_token(confirmed_user["email"], user_id=confirmed_user["id"], confirmed=True)
+
+    user = await get_current_user(token)
+    assert user.email == confirmed_user["email"]
+
+    mismatched = create_access_token("other@example.net", user_id=confirmed_user["id"], confirmed=True)
+    with pytest.raises(HTTPException):
+        await get_current_user(mismatched)
+
+
+def test_unknown_auth_mode_rejected():
+    with pytest.raises(ValidationError):
+        GlobalConfig(AUTH_MODE="claim")
+
+
+def test_unknown_password_hash_executor_rejected():
+    with pytest.raises(ValidationError):
+        GlobalConfig(PASSWORD_HASH_EXECUTOR="processes")
+
+
+@pytest.mark.anyio
+async def test_confirm_email_invalidates_cached_user(async_client, registered_user: dict):
+    token = create_access_token(registered_user["email"])
+    assert not (await get_current_user(token)).confirmed
+
+    confirmation_token = create_confirmation_token(registered_user["email"])
+    await async_client.get(f"/confirm/{confirmation_token}")
+
+    assert (await get_current_user(token)).confirmed
+
+
+def test_lru_cache_evicts_and_expires():
+    now = [0.0]
+    cache = LRUCache(max_size=2, ttl=10, clock=lambda: now[0])
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+
+    now[0] = 11
+    assert cache.get("a") is None
+    assert cache.stats()["hits"] == 2
+    assert cache.stats()["misses"] == 2
+
+
 @pytest.mark.anyio
 async def test_get_current_user_invalid_token():
     with pytest.raises(HTTPException):
@@ -0,0 +1,229 @@
+import asyncio
+
+import pytest
+import pytest_mock
+from httpx import AsyncClient
+
+from storeapi.app_conf import get_config
+from storeapi.configs.jwt_conf import create_access_token
+from storeapi.database.database import database, timeline_backfill_table, timeline_table, user_table
+from storeapi.database.timelines import backfill_timelines, trim_timelines
+from storeapi.tests.routers.test_post import create_post
+
+
+@pytest.fixture
+async def other_user() -> dict:
+    user_id = await database.execute(
+        user_table.insert().values(username="ada", email="other@example.net", password="", confirmed=True)
+    )
+    return {"id": user_id, "token": create_access_token("other@example.net")}
+
+
+def bearer(token: str) -> dict:
+    return {"Authorization": f"Bearer {token}"}
+
+
+async def follow(user_id: int, async_client: AsyncClient, token: str):
+    return await async_client.post("/follow", json={"user_id": user_id}, headers=bearer(token))
+
+
+async def timeline_ids(async_client: AsyncClient, token: str, **params) -> list[int]:
+    response = await async_client.get("/timeline", params=params, headers=bearer(token))
+    assert response.status_code == 200
+    return [post["id"] for post in response.json()]
+
+
+@pytest.mark.anyio
+async def test_follow_backfills_and_fans_out(
+    async_client: AsyncClient, logged_in_token: str, confirmed_user: dict, other_user: dict
+):
+    own = await create_post("Own Post", async_client, logged_in_token)
+    earlier = await create_post("Earlier Post", async_client, other_user["token"])
+
+    response = await follow(other_user["id"], async_client, logged_in_token)
+    later = await create_post("Later Post", async_client, other_user["token"])
+
+    assert response.status_code == 201
+    assert response.json() == {"follower_id": confirmed_user["id"], "followee_id": other_user["id"]}
+    assert await timeline_ids(async_client, logged_in_token) == [later["id"], earlier["id"], own["id"]]
+    # following is one way
+    assert await timeline_ids(async_client, other_user["token"]) == [later["id"], earlier["id"]]
+
+
+@pytest.mark.anyio
+async def test_unfollow_removes_posts(async_client: AsyncClient, logged_in_token: str, other_user: dict):
+    await follow(other_user["id"], async_client, logged_in_token)
+    await create_post("Followed Post", async_client, other_user["token"])
+
+    response = await async_client.delete(f"/follow/{other_user['id']}", headers=bearer(logged_in_token))
+    again = await async_client.delete(f"/follow/{other_user['id']}", headers=bearer(logged_in_token))
+
+    assert response.status_code == 204
+    assert again.status_code == 404
+    assert await timeline_ids(async_client, logged_in_token) == []
+    followee = await database.fetch_one(user_table.select().where(user_table.c.id == other_user["id"]))
+    assert followee["followers"] == 0
+
+
+@pytest.mark.anyio
+@pytest.mark.parametrize(
+    "user_id, status_code, detail",
+    [(None, 400, "Cannot follow yourself"), (999, 404, "User not found")],
+)
+async def test_follow_rejected(
+    async_client: AsyncClient, logged_in_token: str, confirmed_user: dict, user_id, status_code: int, detail: str
+):
+    response = await follow(user_id or confirmed_user["id"], async_client, logged_in_token)
+
+    assert response.status_code == status_code
+    assert response.json()["detail"] == detail
+
+
+@pytest.mark.anyio
+async def test_follow_twice_rejected(async_client: AsyncClient, logged_in_token: str, other_user: dict):
+    await follow(other_user["id"], async_client, logged_in_token)
+    response = await follow(other_user["id"], async_client, logged_in_token)
+
+    assert response.status_code == 400
+
+
+@pytest.mark.anyio
+async def test_celebrity_posts_are_merged_on_read(
+    async_client: AsyncClient, logged_in_token: str, confirmed_user: dict, other_user: dict, mocker: pytest_mock.MockerFixture
+):
+    mocker.patch.object(get_config(), "TIMELINE_FANOUT_MAX_FOLLOWERS", 0)
+    await follow(other_user["id"], async_client, logged_in_token)
+    own = [await create_post(f"Own Post {i}", async_client, logged_in_token) for i in range(2)]
+    famous = [await create_post(f"Famous Post {i}", async_client, other_user["token"]) for i in range(2)]
+
+    rows = await database.fetch_all(timeline_table.select().where(timeline_table.c.user_id == confirmed_user["id"]))
+    assert [row["post_id"] for row in rows] == [post["id"] for post in own]
+
+    first = await async_client.get("/timeline", params={"limit": 3}, headers=bearer(logged_in_token))
+    rest = await timeline_ids(async_client, logged_in_token, cursor=first.headers["X-Next-Cursor"])
+    assert [post["id"] for post in first.json()] + rest == [famous[1]["id"], famous[0]["id"], own[1]["id"], own[0]["id"]]
+
+
+@pytest.mark.anyio
+async def test_timeline_pagination(async_client: AsyncClient, logged_in_token: str):
+    posts = [await create_post(f"Test Post {i}", async_client, logged_in_token) for i in range(5)]
+
+    seen = []
+    params = {"limit": 2}
+    while True:
+        response = await async_client.get("/timeline", params=params, headers=bearer(logged_in_token))
+        seen += [post["id"] for post in response.json()]
+        next_cursor = response.headers.get("X-Next-Cursor")
+        if next_cursor is None:
+            break
+        params["cursor"] = next_cursor
+
+    assert seen == [post["id"] for post in reversed(posts)]
+
+
+@pytest.mark.anyio
+async def test_timeline_invalid_cursor(async_client: AsyncClient, logged_in_token: str):
+    response = await async_client.get("/timeline", params={"cursor": "not-a-cursor"}, headers=bearer(logged_in_token))
+    assert response.status_code == 400
+
+
+@pytest.mark.anyio
+async def test_trim_timelines_keeps_newest(async_client: AsyncClient, logged_in_token: str, other_user: dict):
+    posts = [await create_post(f"Test Post {i}", async_client, logged_in_token) for i in range(4)]
+    await create_post("Other Post", async_client, other_user["token"])
+
+    assert await trim_timelines(max_length=2) == 2
+    assert await timeline_ids(async_client, logged_in_token) == [posts[3]["id"], posts[2]["id"]]
+    assert len(await timeline_ids(async_client, other_user["token"])) == 1
+
+
+@pytest.mark.anyio
+async def test_concurrent_follows_count_once(async_client: AsyncClient, single_writer_token: str):
+    followee_id = await database.execute(
+        user_table.insert().values(username="ada", email="other@example.net", password="", confirmed=True)
+    )
+
+    async def followers() -> int:
+        return await database.fetch_val(
+            user_table.select().with_only_columns(user_table.c.followers).where(user_table.c.id == followee_id)
+        )
+
+    follows = await asyncio.gather(*(follow(followee_id, async_client, single_writer_token) for _ in range(3)))
+    assert sorted(response.status_code for response in follows) == [201, 400, 400]
+    assert await followers() == 1
+
+    unfollows = await asyncio.gather(
+        *(async_client.delete(f"/follow/{followee_id}", headers=bearer(single_writer_token)) for _ in range(3))
+    )
+    assert sorted(response.status_code for response in unfollows) == [204, 404, 404]
+    assert await followers() == 0
+
+
+async def copied_post_ids(user_id: int) -> list[int]:
+    rows = await database.fetch_all(timeline_table.select().where(timeline_table.c.user_id == user_id))
+    return [row["post_id"] for row in rows]
+
+
+@pytest.mark.anyio
+async def test_dropping_under_fan_out_limit_backfills_followers(
+    async_client: AsyncClient,
+    logged_in_token: str,
+    confirmed_user: dict,
+    other_user: dict,
+    mocker: pytest_mock.MockerFixture,
+):
+    mocker.patch.object(get_config(), "TIMELINE_FANOUT_MAX_FOLLOWERS", 1)
+    mocker.patch.object(get_config(), "TIMELINE_FANOUT_RESUME_FOLLOWERS", 1)
+    await database.execute(
+        user_table.insert().values(username="bob", email="third@example.net", password="", confirmed=True)
+    )
+    third_token = create_access_token("third@example.net")
+    await follow(other_user["id"], async_client, logged_in_token)
+    early = await create_post("Early Post", async_client, other_user["token"])
+    await follow(other_user["id"], async_client, third_token)
+    famous = await create_post("Famous Post", async_client, other_user["token"])
+
+    response = await async_client.delete(f"/follow/{other_user['id']}", headers=bearer(third_token))
+
+    assert response.status_code == 204
+    # the unfollow only queues the backfill; reads merge the author in until it is done
+    assert await copied_post_ids(confirmed_user["id"]) == [early["id"]]
+    assert await timeline_ids(async_client, logged_in_token) == [famous["id"], early["id"]]
+    assert await database.fetch_all(timeline_backfill_table.select()) != []
+
+    # one transaction per follower, and one to finish the backfill
+    assert await backfill_timelines(batch=1) == 2
+    # the post made over the limit is now copied, and the earlier one is not copied twice
+    assert await copied_post_ids(confirmed_user["id"]) == [early["id"], famous["id"]]
+    assert await database.fetch_all(timeline_backfill_table.select()) == []
+    assert await timeline_ids(async_client, logged_in_token) == [famous["id"], early["id"]]
+
+
+@pytest.mark.anyio
+async def test_fan_out_resumes_only_under_lower_threshold(
+    async_client: AsyncClient,
+    logged_in_token: str,
+    confirmed_user: dict,
+    other_user: dict,
+    mocker: pytest_mock.MockerFixture,
+):
+    mocker.patch.object(get_config(), "TIMELINE_FANOUT_MAX_FOLLOWERS", 1)
+    mocker.patch.object(get_config(), "TIMELINE_FANOUT_RESUME_FOLLOWERS", 0)
+    await database.execute(
+        user_table.insert().values(username="bob", email="third@example.net", password="", confirmed=True)
+    )
+    third_token = create_access_token("third@example.net")
+    await follow(other_user["id"], async_client, logged_in_token)
+    await follow(other_user["id"], async_client, third_token)
+
+    await async_client.delete(f"/follow/{other_user['id']}", headers=bearer(third_token))
+    post = await create_post("Hovering Post", async_client, other_user["token"])
+
+    # back at the limit but above the resume threshold: still merged in on read
+    fans_out = await database.fetch_val(
+        user_table.select().with_only_columns(user_table.c.fans_out).where(user_table.c.id == other_user["id"])
+    )
+    assert not fans_out
+    assert await database.fetch_all(timeline_backfill_table.select()) == []
+    assert await copied_post_ids(confirmed_user["id"]) == []
+    assert await timeline_ids(async_client, logged_in_token) == [post["id"]]
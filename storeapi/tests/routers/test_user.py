@@ -5,6 +5,8 @@ import pytest
 from httpx import AsyncClient, Response
 from fastapi import Request
 
+from storeapi.configs.security_conf import get_password_hasher
+
 
 async def register_user(
     async_client: AsyncClient, username: str, email: str, password: str
@@ -22,6 +24,14 @@ async def test_register_user(async_client: AsyncClient):
     assert "User created" in response.json()["detail"]
 
 
+@pytest.mark.anyio
+async def test_register_user_hash_queue_full(async_client: AsyncClient, mocker):
+    mocker.patch.object(get_password_hasher(), "max_pending", 0)
+    response = await register_user(async_client, "mark", "test@example.net", "1234")
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "1"
+
+
 @pytest.mark.anyio
 async def test_register_user_already_exists(
     async_client: AsyncClient, registered_user: dict
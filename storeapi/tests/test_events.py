@@ -0,0 +1,102 @@
+import json
+
+import pytest
+
+from storeapi.events import OVERFLOW, SHUTDOWN, EventBus, SubscriptionClosed
+
+
+@pytest.mark.anyio
+async def test_subscribers_get_events_for_their_posts():
+    bus = EventBus()
+    everything = bus.subscribe()
+    one = bus.subscribe([1])
+    other = bus.subscribe([2, 3])
+
+    assert bus.publish("like", 1, added=2) == 2
+
+    event = await one.get(0)
+    assert (event.type, event.post_id) == ("like", 1)
+    assert json.loads(event.json) == {"type": "like", "post_id": 1, "added": 2}
+    assert event.sse == f"id: {event.id}\nevent: like\ndata: {event.json}\n\n".encode()
+    assert (await everything.get(0)).id == event.id
+    assert await other.get(0) is None
+
+
+def test_publish_without_subscribers_does_nothing():
+    bus = EventBus()
+    bus.subscribe([2])
+
+    assert bus.publish("post", 1, body="Test Post") == 0
+    assert bus.published == 0
+
+
+@pytest.mark.anyio
+async def test_slow_subscriber_is_dropped():
+    bus = EventBus(max_queue=2)
+    slow = bus.subscribe()
+    fast = bus.subscribe()
+
+    for post_id in range(2):
+        bus.publish("post", post_id)
+        await fast.get(0)
+    bus.publish("post", 2)
+
+    assert len(bus) == 1
+    assert bus.dropped == 1
+    with pytest.raises(SubscriptionClosed) as closed:
+        await slow.get(0)
+    assert closed.value.reason == OVERFLOW
+    assert (await fast.get(0)).post_id == 2
+
+
+@pytest.mark.anyio
+async def test_update_moves_subscription_between_posts():
+    bus = EventBus()
+    subscription = bus.subscribe([1])
+    bus.update(subscription, [2])
+
+    bus.publish("like", 1)
+    bus.publish("like", 2)
+
+    assert (await subscription.get(0)).post_id == 2
+    assert await subscription.get(0) is None
+    bus.unsubscribe(subscription)
+    assert len(bus) == 0
+    assert bus.publish("like", 2) == 0
+
+
+def test_empty_filter_gets_no_events():
+    bus = EventBus()
+    subscription = bus.subscribe([])
+    assert len(bus) == 1
+    assert bus.publish("like", 1) == 0
+
+    bus.update(subscription, None)
+    assert bus.publish("like", 1) == 1
+    bus.update(subscription, [])
+    assert bus.publish("like", 1) == 0
+
+    bus.unsubscribe(subscription)
+    assert len(bus) == 0
+
+
+@pytest.mark.anyio
+async def test_close_all_ends_waiting_subscribers():
+    bus = EventBus()
+    subscription = bus.subscribe([1])
+
+    bus.close_all()
+
+    with pytest.raises(SubscriptionClosed) as closed:
+        await subscription.get()
+    assert closed.value.reason == SHUTDOWN
+    assert len(bus) == 0
+
+
+def test_bus_is_full_at_max_subscribers():
+    bus = EventBus(max_subscribers=1)
+    subscription = bus.subscribe()
+    assert bus.full
+
+    bus.unsubscribe(subscription)
+    assert not bus.full
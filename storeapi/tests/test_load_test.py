@@ -0,0 +1,61 @@
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+from storeapi.benchmarks.load_test import build_script, compare, parse_mix, percentile
+
+PROJECT_ROOT = Path(__file__).resolve().parents[2]
+
+
+def report(p95_ms: float = 10.0, rps: float = 100.0, errors: int = 0) -> dict:
+    row = {"count": 100, "errors": errors, "p50_ms": 5.0, "p95_ms": p95_ms, "p99_ms": 20.0, "requests_per_second": rps}
+    return {"overall": row, "operations": {"list": dict(row)}}
+
+
+def test_percentile_nearest_rank():
+    values = [float(i) for i in range(1, 101)]
+
+    assert percentile(values, 50) == 50.0
+    assert percentile(values, 99) == 99.0
+    assert percentile([3.0], 95) == 3.0
+    assert percentile([], 50) == 0.0
+
+
+def test_script_is_reproducible():
+    mix = parse_mix("list=3,like=1")
+
+    assert build_script(50, 4, mix, seed=7) == build_script(50, 4, mix, seed=7)
+    assert {operation for operation, _, _ in build_script(50, 4, mix, seed=7)} == {"list", "like"}
+
+
+def test_compare_within_tolerance():
+    assert compare(report(p95_ms=11.0, rps=95.0), report(), tolerance=0.2) == []
+
+
+def test_compare_flags_regressions():
+    regressions = compare(report(p95_ms=15.0, rps=70.0, errors=2), report(), tolerance=0.2)
+
+    assert "overall p95_ms: 15.0 > 10.0" in regressions
+    assert "list requests_per_second: 70.0 < 100.0" in regressions
+    assert "overall errors: 2 > 0" in regressions
+
+
+def test_load_test_in_process(tmp_path):
+    output = tmp_path / "report.json"
+    baseline = tmp_path / "baseline.json"
+    command = [
+        sys.executable, "-m", "storeapi.benchmarks.load_test",
+        "--requests", "30", "--users", "1", "--concurrency", "4",
+        "--mix", "list=2,read=1,comment=1,like=1,post=1",
+        "--output", str(output), "--baseline", str(baseline), "--save-baseline",
+    ]
+    subprocess.run(command, cwd=PROJECT_ROOT, env=dict(os.environ), capture_output=True, check=True)
+
+    result = json.loads(output.read_text())
+    assert result["target"] == "asgi"
+    assert result["overall"]["count"] == 30
+    assert result["overall"]["errors"] == 0
+    assert set(result["operations"]) <= {"list", "read", "comment", "like", "post"}
+    assert json.loads(baseline.read_text()) == result
@@ -0,0 +1,69 @@
+import logging
+import queue
+
+import pytest
+import pytest_mock
+from pydantic import ValidationError
+
+from storeapi.app_conf import GlobalConfig, get_config
+from storeapi.configs import logging_conf
+from storeapi.configs.logging_conf import BoundedQueueHandler, configure_logging, shutdown_logging
+
+
+def make_record(message: str) -> logging.LogRecord:
+    return logging.LogRecord("storeapi", logging.INFO, __file__, 1, message, None, None)
+
+
+def test_bounded_queue_handler_drops_when_full():
+    handler = BoundedQueueHandler(queue.Queue(maxsize=1), policy="drop")
+    for i in range(3):
+        handler.handle(make_record(f"message {i}"))
+
+    assert handler.queue.qsize() == 1
+    assert handler.dropped == 2
+
+
+def test_unknown_queue_policy_rejected():
+    with pytest.raises(ValidationError):
+        GlobalConfig(LOG_QUEUE_FULL_POLICY="wait")
+
+
+def test_configure_logging_queue_mode(mocker: pytest_mock.MockerFixture):
+    mocker.patch.object(get_config(), "LOG_QUEUE_ENABLED", True)
+    configure_logging()
+
+    captured = []
+    target = logging.Handler()
+    target.emit = captured.append
+    logging_conf._queue_listener.handlers += (target,)
+
+    storeapi_logger = logging.getLogger("storeapi")
+    assert [type(h) for h in storeapi_logger.handlers] == [BoundedQueueHandler]
+
+    storeapi_logger.info("queued message", extra={"email": "someone@example.net"})
+    shutdown_logging()
+
+    assert [record.getMessage() for record in captured] == ["queued message"]
+    assert captured[0].email == "***eone@example.net"
+    assert hasattr(captured[0], "correlation_id")
+
+
+def test_shutdown_logging_restores_direct_handlers(mocker: pytest_mock.MockerFixture):
+    mocker.patch.object(get_config(), "LOG_QUEUE_ENABLED", True)
+    configure_logging()
+    shutdown_logging()
+
+    storeapi_logger = logging.getLogger("storeapi")
+    captured = []
+    target = logging.Handler()
+    target.emit = captured.append
+    storeapi_logger.addHandler(target)
+    try:
+        assert not any(isinstance(handler, BoundedQueueHandler) for handler in storeapi_logger.handlers)
+        storeapi_logger.info("after shutdown")
+    finally:
+        storeapi_logger.removeHandler(target)
+
+    assert [record.getMessage() for record in captured] == ["after shutdown"]
+    # the direct handlers run their own filters again
+    assert all(handler.filters for handler in storeapi_logger.handlers)
@@ -0,0 +1,90 @@
+import sqlalchemy
+
+from storeapi.database.migrate import upgrade
+from storeapi.database.query_plans import check_query_plans
+
+
+def make_engine(tmp_path) -> sqlalchemy.Engine:
+    return sqlalchemy.create_engine(f"sqlite:///{tmp_path / 'migrations.db'}")
+
+
+def index_names(engine: sqlalchemy.Engine, table: str) -> set[str]:
+    return {index["name"] for index in sqlalchemy.inspect(engine).get_indexes(table)}
+
+
+def test_upgrade_creates_schema_with_indexes(tmp_path):
+    engine = make_engine(tmp_path)
+    upgrade(str(engine.url))
+
+    assert {"users", "posts", "comments", "likes", "alembic_version"} <= set(sqlalchemy.inspect(engine).get_table_names())
+    assert {"ix_posts_likes_id", "ix_posts_hot_score_id"} <= index_names(engine, "posts")
+    assert "ix_comments_post_id" in index_names(engine, "comments")
+    assert {"ix_likes_post_id", "ix_likes_user_id"} <= index_names(engine, "likes")
+
+
+def test_upgrade_evolves_database_created_by_create_all(tmp_path):
+    engine = make_engine(tmp_path)
+    with engine.begin() as conn:
+        # the schema the old import-time create_all produced, before the likes counter
+        conn.exec_driver_sql("CREATE TABLE users (id INTEGER PRIMARY KEY, username VARCHAR UNIQUE, email VARCHAR UNIQUE, password VARCHAR, confirmed BOOLEAN)")
+        conn.exec_driver_sql("CREATE TABLE posts (id INTEGER PRIMARY KEY, body VARCHAR, user_id INTEGER NOT NULL REFERENCES users (id))")
+        conn.exec_driver_sql("CREATE TABLE comments (id INTEGER PRIMARY KEY, body VARCHAR, post_id INTEGER NOT NULL REFERENCES posts (id), user_id INTEGER NOT NULL REFERENCES users (id))")
+        conn.exec_driver_sql("CREATE TABLE likes (id INTEGER PRIMARY KEY, post_id INTEGER NOT NULL REFERENCES posts (id), user_id INTEGER NOT NULL REFERENCES users (id))")
+        conn.exec_driver_sql("INSERT INTO users (id, email) VALUES (1, 'test@example.net')")
+        conn.exec_driver_sql("INSERT INTO posts (id, body, user_id) VALUES (1, 'Test Post', 1), (2, 'Other Post', 1)")
+        conn.exec_driver_sql("INSERT INTO likes (post_id, user_id) VALUES (1, 1), (1, 1)")
+
+    upgrade(str(engine.url))
+
+    with engine.connect() as conn:
+        likes = dict(conn.exec_driver_sql("SELECT id, likes FROM posts").all())
+    assert likes == {1: 2, 2: 0}
+    assert {"ix_likes_post_id", "ix_likes_user_id"} <= index_names(engine, "likes")
+
+
+def test_upgrade_is_idempotent(tmp_path):
+    engine = make_engine(tmp_path)
+    upgrade(str(engine.url))
+    upgrade(str(engine.url))
+
+    with engine.connect() as conn:
+        assert conn.exec_driver_sql("SELECT version_num FROM alembic_version").scalar() == "0007"
+
+
+def test_hot_queries_do_not_scan_tables(tmp_path):
+    engine = make_engine(tmp_path)
+    upgrade(str(engine.url))
+
+    assert check_query_plans(engine) == {}
+
+
+def test_query_plan_check_reports_missing_indexes(tmp_path):
+    engine = make_engine(tmp_path)
+    upgrade(str(engine.url))
+    with engine.begin() as conn:
+        # the indexes 0003 added; the queries select columns of later revisions, so stay at head
+        for index in ("ix_comments_post_id", "ix_likes_post_id", "ix_likes_user_id"):
+            conn.exec_driver_sql(f"DROP INDEX {index}")
+
+    problems = check_query_plans(engine)
+
+    assert "comments on post" in problems
+    assert "likes by user" in problems
+    assert "posts new next page" not in problems
+
+
+def test_upgrade_backfills_hot_scores(tmp_path):
+    engine = make_engine(tmp_path)
+    upgrade(str(engine.url), "0004")
+    with engine.begin() as conn:
+        conn.exec_driver_sql("INSERT INTO users (id, email) VALUES (1, 'test@example.net')")
+        conn.exec_driver_sql("INSERT INTO posts (id, body, user_id, likes) VALUES (1, 'Liked', 1, 3), (2, 'Commented', 1, 0)")
+        conn.exec_driver_sql("INSERT INTO comments (body, post_id, user_id) VALUES ('Comment', 2, 1)")
+
+    upgrade(str(engine.url))
+
+    with engine.connect() as conn:
+        scores = dict(conn.exec_driver_sql("SELECT id, hot_score FROM posts").all())
+        assert conn.exec_driver_sql("SELECT count(*) FROM hot_epoch").scalar() == 1
+    # one for the post, one per like, two per comment
+    assert scores == {1: 4.0, 2: 3.0}
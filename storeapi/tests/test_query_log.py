@@ -0,0 +1,113 @@
+import logging
+
+import pytest
+import pytest_mock
+from httpx import AsyncClient
+
+from storeapi.app_conf import get_config
+from storeapi.database.database import database, post_table, user_table
+from storeapi.database.query_log import REDACTED, describe_query
+from storeapi.metrics import db_query_duration
+
+
+class ListHandler(logging.Handler):
+    def __init__(self):
+        super().__init__()
+        self.records: list[logging.LogRecord] = []
+
+    def emit(self, record: logging.LogRecord) -> None:
+        self.records.append(record)
+
+
+@pytest.fixture
+async def stored_post():
+    await database.execute(post_table.insert().values(id=1, body="Test Post", user_id=1))
+
+
+@pytest.fixture
+def captured_logs():
+    # the storeapi logger does not propagate to the root logger caplog listens on
+    handler = ListHandler()
+    storeapi_logger = logging.getLogger("storeapi")
+    storeapi_logger.addHandler(handler)
+    yield handler.records
+    storeapi_logger.removeHandler(handler)
+
+
+def test_describe_query_redacts_parameters():
+    sql, parameters = describe_query(user_table.select().where(user_table.c.email == "test@example.net"))
+
+    assert "users.email = :email_1" in sql
+    assert parameters == {"email_1": REDACTED}
+    assert "test@example.net" not in sql
+
+
+@pytest.mark.anyio
+async def test_request_reports_queries_in_server_timing(async_client: AsyncClient, stored_post):
+    response = await async_client.get("/post?include=comments")
+
+    assert response.headers["server-timing"].startswith("db;dur=")
+    assert response.headers["server-timing"].endswith('desc="2 queries"')
+
+
+@pytest.mark.anyio
+async def test_slow_query_logged_with_correlation_id(
+    async_client: AsyncClient, captured_logs: list, mocker: pytest_mock.MockerFixture
+):
+    mocker.patch.object(get_config(), "SLOW_QUERY_THRESHOLD", 1e-9)
+
+    response = await async_client.get("/post/1")
+
+    slow = [record for record in captured_logs if record.getMessage().startswith("Slow query")]
+    assert slow
+    assert slow[0].correlation_id == response.headers["X-Correlation-ID"]
+    assert "FROM posts" in slow[0].sql
+    assert slow[0].parameters == {"id_1": REDACTED}
+
+
+@pytest.mark.anyio
+async def test_streamed_query_is_timed(
+    async_client: AsyncClient, stored_post, captured_logs: list, mocker: pytest_mock.MockerFixture
+):
+    mocker.patch.object(get_config(), "SLOW_QUERY_THRESHOLD", 1e-9)
+    selects = db_query_duration.labels("select").count
+
+    response = await async_client.get("/post", params={"stream": "true"})
+
+    assert response.status_code == 200
+    assert db_query_duration.labels("select").count == selects + 1
+    slow = [record for record in captured_logs if record.getMessage().startswith("Slow query")]
+    assert [record.correlation_id for record in slow] == [response.headers["X-Correlation-ID"]]
+
+
+@pytest.mark.anyio
+async def test_slow_query_outside_request_has_no_correlation_id(captured_logs: list, mocker: pytest_mock.MockerFixture):
+    mocker.patch.object(get_config(), "SLOW_QUERY_THRESHOLD", 1e-9)
+
+    await database.fetch_all(user_table.select())
+
+    assert captured_logs[-1].correlation_id is None
+
+
+@pytest.mark.anyio
+async def test_too_many_queries_warns(
+    async_client: AsyncClient, stored_post, captured_logs: list, mocker: pytest_mock.MockerFixture
+):
+    mocker.patch.object(get_config(), "QUERY_COUNT_WARNING", 1)
+
+    await async_client.get("/post?include=comments")
+
+    warnings = [record for record in captured_logs if "possible N+1" in record.getMessage()]
+    assert len(warnings) == 1
+    assert warnings[0].query_count == 2
+
+
+@pytest.mark.anyio
+async def test_query_count_within_limit_does_not_warn(
+    async_client: AsyncClient, stored_post, captured_logs: list, mocker: pytest_mock.MockerFixture
+):
+    mocker.patch.object(get_config(), "QUERY_COUNT_WARNING", 2)
+
+    await async_client.get("/post?include=comments")
+
+    assert not [record for record in captured_logs if "possible N+1" in record.getMessage()]
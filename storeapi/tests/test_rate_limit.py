@@ -0,0 +1,157 @@
+import asyncio
+
+import pytest
+from httpx import ASGITransport, AsyncClient
+from starlette.applications import Starlette
+from starlette.responses import PlainTextResponse
+from starlette.routing import Route
+
+from storeapi.app_conf import GlobalConfig
+from storeapi.configs.jwt_conf import create_access_token
+from storeapi.middleware.rate_limit import MemoryBucketStore, RateLimitMiddleware
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+async def ok(request):
+    return PlainTextResponse("ok")
+
+
+def limited_client(**options) -> AsyncClient:
+    app = Starlette(routes=[Route("/", ok), Route("/like", ok, methods=["POST"]), Route("/metrics", ok)])
+    options.setdefault("store", MemoryBucketStore())
+    return AsyncClient(transport=ASGITransport(app=RateLimitMiddleware(app, **options)), base_url="http://test")
+
+
+def bearer(email: str) -> dict:
+    return {"Authorization": f"Bearer {create_access_token(email)}"}
+
+
+@pytest.mark.anyio
+async def test_bucket_refills_at_rate():
+    clock = FakeClock()
+    store = MemoryBucketStore(clock=clock)
+    limits = [("ip:1", 2.0, 2)]
+
+    assert await store.acquire(limits) == 0
+    assert await store.acquire(limits) == 0
+    assert await store.acquire(limits) == pytest.approx(0.5)
+
+    clock.now = 0.5
+    assert await store.acquire(limits) == 0
+
+
+@pytest.mark.anyio
+async def test_bucket_takes_from_all_or_none():
+    store = MemoryBucketStore(clock=FakeClock())
+    await store.acquire([("route", 1.0, 1)])
+
+    assert await store.acquire([("ip:1", 1.0, 1), ("route", 1.0, 1)]) > 0
+    assert await store.acquire([("ip:1", 1.0, 1)]) == 0
+
+
+@pytest.mark.anyio
+async def test_least_recently_used_buckets_are_evicted():
+    store = MemoryBucketStore(max_size=2, clock=FakeClock())
+    for key in ("a", "b", "a", "c"):
+        await store.acquire([(key, 1.0, 5)])
+
+    assert len(store) == 2
+    assert store.evictions == 1
+    assert list(store._buckets) == ["a", "c"]
+
+
+@pytest.mark.anyio
+async def test_over_ip_limit_gets_429_with_retry_after():
+    async with limited_client(ip_limit=(1.0, 2)) as client:
+        statuses = [(await client.get("/")).status_code for _ in range(3)]
+        response = await client.get("/")
+
+    assert statuses == [200, 200, 429]
+    assert response.json() == {"detail": "Too many requests"}
+    assert response.headers["Retry-After"] == "1"
+
+
+@pytest.mark.anyio
+async def test_route_limit_applies_per_user():
+    async with limited_client(route_limits={"POST /like": (0.1, 1)}) as client:
+        first = await client.post("/like", headers=bearer("one@example.net"))
+        second = await client.post("/like", headers=bearer("one@example.net"))
+        other_user = await client.post("/like", headers=bearer("two@example.net"))
+        other_route = await client.get("/", headers=bearer("one@example.net"))
+
+    assert (first.status_code, second.status_code) == (200, 429)
+    assert second.headers["Retry-After"] == "10"
+    assert other_user.status_code == 200
+    assert other_route.status_code == 200
+
+
+@pytest.mark.anyio
+async def test_invalid_token_is_limited_by_ip():
+    async with limited_client(route_limits={"POST /like": (0.1, 1)}) as client:
+        await client.post("/like", headers={"Authorization": "Bearer forged"})
+        response = await client.post("/like", headers={"Authorization": "Bearer forged-again"})
+
+    assert response.status_code == 429
+
+
+@pytest.mark.anyio
+async def test_exempt_paths_are_not_limited():
+    async with limited_client(ip_limit=(0.1, 1)) as client:
+        statuses = [(await client.get("/metrics")).status_code for _ in range(3)]
+
+    assert statuses == [200, 200, 200]
+
+
+@pytest.mark.anyio
+async def test_in_flight_limit_sheds_with_503():
+    release = asyncio.Event()
+
+    async def slow(request):
+        await release.wait()
+        return PlainTextResponse("ok")
+
+    app = Starlette(routes=[Route("/slow", slow), Route("/", ok)])
+    limited = RateLimitMiddleware(app, store=MemoryBucketStore(), max_in_flight=1)
+    async with AsyncClient(transport=ASGITransport(app=limited), base_url="http://test") as client:
+        pending = asyncio.create_task(client.get("/slow"))
+        while limited.in_flight == 0:
+            await asyncio.sleep(0)
+        shed = await client.get("/")
+        release.set()
+        assert (await pending).status_code == 200
+
+    assert shed.status_code == 503
+    assert shed.headers["Retry-After"] == "1"
+    assert limited.in_flight == 0
+
+
+@pytest.mark.anyio
+async def test_long_lived_requests_are_not_in_flight():
+    release = asyncio.Event()
+
+    async def stream(request):
+        await release.wait()
+        return PlainTextResponse("done")
+
+    app = Starlette(routes=[Route("/events", stream), Route("/", ok)])
+    limited = RateLimitMiddleware(app, store=MemoryBucketStore(), max_in_flight=1)
+    async with AsyncClient(transport=ASGITransport(app=limited), base_url="http://test") as client:
+        pending = asyncio.create_task(client.get("/events"))
+        await asyncio.sleep(0.01)
+        response = await client.get("/")
+        release.set()
+        await pending
+
+    assert response.status_code == 200
+
+
+def test_rate_limit_off_by_default():
+    # keyed on the peer IP, it would throttle every client behind a proxy without --proxy-headers
+    assert GlobalConfig.model_fields["RATE_LIMIT_ENABLED"].default is False
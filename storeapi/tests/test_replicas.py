@@ -0,0 +1,89 @@
+import sqlite3
+
+import pytest
+import pytest_mock
+from httpx import AsyncClient
+
+from storeapi.app_conf import get_config
+from storeapi.database.database import database
+from storeapi.database.migrate import upgrade
+from storeapi.database.replicas import ReplicaSet, get_replicas, pin_to_primary, read_database, unpin
+from storeapi.middleware.read_your_writes import LAST_WRITE_COOKIE
+
+
+def make_replica(path, body: str) -> str:
+    """
+    A file-based SQLite copy standing in for a replica, holding a single post.
+    """
+    url = f"sqlite:///{path}"
+    upgrade(url)
+    with sqlite3.connect(path) as conn:
+        conn.execute("INSERT INTO users (id, email) VALUES (1, 'replica@example.net')")
+        conn.execute("INSERT INTO posts (id, body, user_id) VALUES (1, ?, 1)", (body,))
+    return url
+
+
+@pytest.fixture
+async def replica(tmp_path, mocker: pytest_mock.MockerFixture):
+    url = make_replica(tmp_path / "replica.db", "Replica Post")
+    mocker.patch.object(get_config(), "DATABASE_REPLICA_URLS", [url])
+    get_replicas.cache_clear()
+    await get_replicas().connect()
+    yield url
+    await get_replicas().disconnect()
+    get_replicas.cache_clear()
+
+
+def test_replica_set_round_robin():
+    replicas = ReplicaSet(["sqlite:///./one.db", "sqlite:///./two.db"])
+    first, second = replicas.databases
+
+    assert [replicas.next() for _ in range(3)] == [first, second, first]
+
+
+def test_read_database_without_replicas_uses_primary():
+    assert not get_replicas()
+    assert read_database() is database
+
+
+@pytest.mark.anyio
+async def test_read_database_pinned_to_primary(replica):
+    assert read_database() is not database
+
+    token = pin_to_primary()
+    try:
+        assert read_database() is database
+    finally:
+        unpin(token)
+
+
+@pytest.mark.anyio
+async def test_get_posts_reads_from_replica(async_client: AsyncClient, replica):
+    response = await async_client.get("/post")
+
+    assert response.status_code == 200
+    assert [post["body"] for post in response.json()] == ["Replica Post"]
+
+
+@pytest.mark.anyio
+async def test_read_your_writes_after_creating_post(async_client: AsyncClient, logged_in_token: str, replica):
+    async_client.cookies.clear()
+    assert (await async_client.get("/post")).json()[0]["body"] == "Replica Post"
+
+    response = await async_client.post(
+        "/post", json={"body": "Primary Post"}, headers={"Authorization": f"Bearer {logged_in_token}"}
+    )
+    assert LAST_WRITE_COOKIE in response.cookies
+
+    assert [post["body"] for post in (await async_client.get("/post")).json()] == ["Primary Post"]
+
+    # /post itself is now cached from the primary read, so ask for a page that is not
+    async_client.cookies.clear()
+    assert [post["body"] for post in (await async_client.get("/post?sorting=old")).json()] == ["Replica Post"]
+
+
+@pytest.mark.anyio
+async def test_expired_write_cookie_reads_from_replica(async_client: AsyncClient, replica):
+    async_client.cookies.set(LAST_WRITE_COOKIE, "0")
+
+    assert (await async_client.get("/post")).json()[0]["body"] == "Replica Post"
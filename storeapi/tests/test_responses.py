@@ -0,0 +1,56 @@
+import json
+
+import pytest
+from pydantic import BaseModel, Field
+
+from storeapi.app_conf import get_config
+from storeapi.database.database import database, post_table
+from storeapi.models.post import Comment, UserPostWithComments, UserPostWithLikes
+from storeapi.responses import dump_json, field_plan, get_type_adapter
+
+
+def validated_json(data, annotation) -> bytes:
+    adapter = get_type_adapter(annotation)
+    return adapter.dump_json(adapter.validate_python(data, from_attributes=True))
+
+
+@pytest.fixture()
+def validate_responses(mocker):
+    mocker.patch.object(get_config(), "RESPONSE_FAST_JSON", False)
+
+
+def test_field_plan_covers_post_models():
+    assert field_plan(UserPostWithLikes) is not None
+    assert field_plan(UserPostWithComments) is not None
+
+
+def test_field_plan_rejects_aliases():
+    class Aliased(BaseModel):
+        post_id: int = Field(serialization_alias="postId")
+
+    assert field_plan(Aliased) is None
+
+
+@pytest.mark.anyio
+async def test_dump_json_fast_path_matches_validation(confirmed_user):
+    await database.execute(post_table.insert().values(body="Fast path", user_id=confirmed_user["id"]))
+    posts = await database.fetch_all(post_table.select())
+    comment = {"id": 1, "body": "Comment", "post_id": posts[0]["id"], "user_id": confirmed_user["id"]}
+    post_with_comments = {**posts[0], "post": posts[0], "comments": [comment]}
+
+    assert dump_json(posts, list[UserPostWithLikes]) == validated_json(posts, list[UserPostWithLikes])
+    assert dump_json([comment], list[Comment]) == validated_json([comment], list[Comment])
+    assert dump_json(post_with_comments, UserPostWithComments) == validated_json(
+        post_with_comments, UserPostWithComments
+    )
+
+
+def test_dump_json_validates_when_fast_path_is_off(validate_responses):
+    with pytest.raises(ValueError):
+        dump_json([{"id": "not a number", "body": "Post", "user_id": 1}], list[UserPostWithLikes])
+
+
+def test_dump_json_fast_path_skips_validation():
+    body = dump_json([{"id": 1, "body": "Post", "user_id": 1}], list[UserPostWithLikes])
+
+    assert json.loads(body) == [{"id": 1, "body": "Post", "user_id": 1, "likes": 0}]
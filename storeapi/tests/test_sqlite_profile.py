@@ -0,0 +1,80 @@
+import asyncio
+
+import pytest
+import sqlalchemy
+
+from storeapi.app_conf import get_config
+from storeapi.benchmarks import sqlite_concurrency
+from storeapi.database.database import Database, post_table
+from storeapi.database.sqlite_profile import sqlite_connect_args, sqlite_pragmas
+
+
+def tuned_config(single_writer: bool = False):
+    return get_config().model_copy(update={"SQLITE_TUNED": True, "SQLITE_SINGLE_WRITER": single_writer})
+
+
+@pytest.fixture
+async def bench_database(tmp_path):
+    url = f"sqlite:///{tmp_path / 'profile.db'}"
+    sqlite_concurrency.create_schema(url, posts=0)
+    db = Database(url, config=tuned_config(single_writer=True))
+    await db.connect()
+    yield db
+    await db.disconnect()
+
+
+@pytest.mark.anyio
+async def test_pragmas_applied_to_async_connections(bench_database: Database):
+    config = get_config()
+
+    assert await bench_database.fetch_val("PRAGMA journal_mode") == "wal"
+    assert await bench_database.fetch_val("PRAGMA synchronous") == 1
+    assert await bench_database.fetch_val("PRAGMA cache_size") == config.SQLITE_CACHE_SIZE
+    assert await bench_database.fetch_val("PRAGMA busy_timeout") == int(config.DB_STATEMENT_TIMEOUT * 1000)
+
+
+def test_zero_statement_timeout_keeps_default_busy_timeout():
+    config = tuned_config().model_copy(update={"DB_STATEMENT_TIMEOUT": 0})
+
+    assert "busy_timeout" not in sqlite_pragmas(config)
+
+
+def test_pragmas_applied_to_sync_engine(tmp_path):
+    url = f"sqlite:///{tmp_path / 'profile.db'}"
+    engine = sqlalchemy.create_engine(url, connect_args=sqlite_connect_args(url, tuned_config()))
+
+    with engine.connect() as conn:
+        assert conn.exec_driver_sql("PRAGMA journal_mode").scalar() == "wal"
+        assert conn.exec_driver_sql("PRAGMA synchronous").scalar() == 1
+    engine.dispose()
+
+
+@pytest.mark.anyio
+async def test_writer_connection_serves_transactions(bench_database: Database):
+    assert "writer" in bench_database.pool_stats()
+
+    async with bench_database.transaction():
+        await bench_database.execute(post_table.insert().values(body="Post", user_id=1))
+        # reads inside the transaction go to the writer and see its uncommitted rows
+        assert await bench_database.fetch_val(sqlalchemy.select(sqlalchemy.func.count()).select_from(post_table)) == 1
+
+    assert bench_database.pool_stats()["writer"]["in_use"] == 0
+
+
+@pytest.mark.anyio
+async def test_concurrent_writes_are_serialized(bench_database: Database):
+    async def write(i: int):
+        async with bench_database.transaction():
+            await bench_database.execute(post_table.insert().values(body=f"Post {i}", user_id=1))
+
+    await asyncio.gather(*(write(i) for i in range(20)))
+
+    assert await bench_database.fetch_val(sqlalchemy.select(sqlalchemy.func.count()).select_from(post_table)) == 20
+
+
+@pytest.mark.anyio
+async def test_benchmark_runs_every_mode():
+    results = await sqlite_concurrency.run(writers=1, readers=1, ops=3)
+
+    assert [result["mode"] for result in results] == list(sqlite_concurrency.MODES)
+    assert all(result["writes_per_second"] > 0 for result in results)
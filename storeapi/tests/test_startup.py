@@ -0,0 +1,61 @@
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+# seconds allowed for `import storeapi.main` in a fresh interpreter, best of RUNS
+STARTUP_BUDGET = float(os.getenv("STARTUP_BUDGET", "1.5"))
+RUNS = 3
+
+PROJECT_ROOT = Path(__file__).resolve().parents[2]
+
+IMPORT_SCRIPT = """
+import json, sys, time
+start = time.perf_counter()
+import storeapi.main
+elapsed = time.perf_counter() - start
+from storeapi.app_conf import get_config
+from storeapi.database.database import database
+print(json.dumps({
+    "elapsed": elapsed,
+    "modules": sorted(name for name in ("sympy", "alembic") if name in sys.modules),
+    "database_bound": database._database is not None,
+    "config_read": get_config.cache_info().currsize > 0,
+}))
+"""
+
+
+def import_app(tmp_path) -> tuple[dict, str]:
+    env = {
+        **os.environ,
+        "ENV_STATE": "test",
+        "TEST_DATABASE_URL": f"sqlite:///{tmp_path / 'startup.db'}",
+    }
+    result = subprocess.run(
+        [sys.executable, "-c", IMPORT_SCRIPT],
+        cwd=PROJECT_ROOT,
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    *printed, report = result.stdout.strip().splitlines()
+    return json.loads(report), "\n".join(printed)
+
+
+def test_import_has_no_side_effects(tmp_path):
+    report, printed = import_app(tmp_path)
+
+    assert printed == ""
+    assert report["modules"] == []
+    assert not report["database_bound"]
+    # the environment may still change between importing the app and starting it
+    assert not report["config_read"]
+    assert not (tmp_path / "startup.db").exists()
+
+
+def test_import_fits_startup_budget(tmp_path):
+    best = min(import_app(tmp_path)[0]["elapsed"] for _ in range(RUNS))
+
+    assert best < STARTUP_BUDGET, f"importing storeapi.main took {best:.2f}s, budget is {STARTUP_BUDGET}s"